@@ -1,12 +1,11 @@
 from pymodbus.client import ModbusSerialClient
-from pymodbus.exceptions import ModbusException
 import time
-import struct
 
 from register_data import register_data
 from utils.tg_alarm import notify_server
 from utils.overall_work import config, logger
 from utils.DataQueueManager import DataQueueManager
+from utils.request_planner import RequestPlanner, read_planned_sync
 
 data_server = config["server_url"]
 
@@ -14,6 +13,7 @@ data_server = config["server_url"]
 qm_data = DataQueueManager(
     db_name="data.db",
     server_url=data_server,
+    retention=config.get("retention"),
 )
 
 # Настройки Modbus по последовательному интерфейсу
@@ -22,44 +22,30 @@ serial_client = ModbusSerialClient(
     baudrate=config["baud_rate"],
 )
 
-
-def convert_registers_to_float(registers):
-    """
-    Преобразует два 16-битных регистра в число с плавающей точкой (float).
-    """
-    # Объединенное 32-битное значение
-    value = (registers[1] << 16) | registers[0]
-    # Преобразуем в байты (big-endian)
-    bytes_value = value.to_bytes(4, byteorder="big")
-    # Интерпретируем байты как float
-    float_value = struct.unpack(">f", bytes_value)[0]
-    return float_value
+# План чтения: разрозненные адреса register_data (16384–16477) объединяются
+# в один-два блочных запроса вместо отдельного запроса на каждую линию
+planner = RequestPlanner(
+    [(address, 1) for lines in register_data.values() for address in lines.values()],
+    max_gap=config.get("max_register_gap", 16),
+)
 
 
 def read_modbus_data(client, slave_id):
     """Чтение данных Modbus и отправка на сервер."""
-    collected_data = {}
-
-    for group, lines in register_data.items():
-        collected_data[group] = {}
-        for line, address in lines.items():
-            try:
-                response = client.read_holding_registers(
-                    address=address, count=1, slave=slave_id
-                )
-
-                if not response.isError():
-                    collected_data[group][line] = response.registers[0]
-                else:
-                    logger.error(
-                        f"Ошибка Modbus при чтении {address}: {response.isError()}"
-                    )
-                    collected_data[group][line] = 0
-
-            except ModbusException as e:
-                logger.error(f"Ошибка Modbus при чтении {address}: {e}")
-            except ValueError as e:
-                logger.error(f"Ошибка преобразования данных: {e}")
+    registers_by_address, failed = read_planned_sync(
+        client, planner, retries=1, slave=slave_id
+    )
+    if failed:
+        logger.error(f"Ошибка Modbus при чтении адресов {failed}")
+
+    # Раскладываем значения обратно по группам и линиям (0 — значение не прочитано)
+    collected_data = {
+        group: {
+            line: registers_by_address.get(address, [0])[0]
+            for line, address in lines.items()
+        }
+        for group, lines in register_data.items()
+    }
 
     qm_data.save_to_db(collected_data)
 
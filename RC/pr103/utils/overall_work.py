@@ -1,11 +1,20 @@
 import json
 import os
+import atexit
+import itertools
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+import gzip
+import lzma
+import shutil
 import zipfile
 import glob
 import re
 from datetime import datetime
+from typing import Dict, List, Optional
 
 
 # Загрузка конфигурации из файла
@@ -19,9 +28,336 @@ def load_config(config_file="config.json"):
         return None
 
 
+# Форматы архивов логов: расширение файла архива
+ARCHIVE_CODECS = {"zip": ".zip", "gzip": ".gz", "xz": ".xz"}
+
+# Размер блока при потоковом сжатии
+ARCHIVE_CHUNK = 1024 * 1024
+
+
+class ArchivingTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """Ротация лога по времени (when/interval) и по размеру (max_bytes) с
+    архивированием старых файлов в фоновом потоке.
+
+    При ротации файл только переименовывается (имя с датой и временем:
+    modbus_data.log.2025-03-25_16-02-34) и ставится в очередь архивации;
+    сжатие идет потоково в отдельном потоке, поэтому запись лога не ждет его.
+    codec — "zip", "gzip" или "xz", compresslevel — степень сжатия (для xz —
+    preset).
+    Список архивов хранится в памяти (сканируется один раз при запуске),
+    старые архивы сверх max_archives удаляются. Файлы, переименованные, но не
+    заархивированные до перезапуска, архивируются при запуске.
+    Настройки в config.json:
+        "log_max_mb": 50                — ротация и по размеру файла, МБ
+                                          (0 — только по времени)
+        "log_archive_codec": "zip"      — формат архива
+        "log_archive_level": 6          — степень сжатия
+        "log_max_archives": 2           — сколько архивов хранить
+    """
+
+    def __init__(
+        self,
+        *args,
+        archive_dir: str,
+        max_archives: int = 2,
+        max_bytes: int = 0,
+        codec: str = "zip",
+        compresslevel: int = 6,
+        **kwargs,
+    ):
+        if codec not in ARCHIVE_CODECS:
+            raise ValueError(f"Неизвестный формат архива логов: {codec}")
+        self.archive_dir = archive_dir
+        self.max_archives = max_archives
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self.compresslevel = compresslevel
+        # Архивы сжимает сам обработчик, стандартное удаление копий не нужно
+        kwargs["backupCount"] = 0
+        super().__init__(*args, **kwargs)
+        self.rotator = self._rotate
+        self.archives = deque(self._scan_archives())  # Самые старые в начале
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._archiver = threading.Thread(target=self._archive_worker, daemon=True)
+        self._archiver.start()
+        # Оставшиеся после перезапуска переименованные, но не сжатые файлы
+        for rotated_file in sorted(glob.glob(f"{glob.escape(self.baseFilename)}.*")):
+            self._jobs.put(rotated_file)
+
+    def _scan_archives(self) -> List[str]:
+        """Архивы этого лога в archive_dir, от старых к новым (один раз при запуске)."""
+        prefix = os.path.basename(self.baseFilename)
+        archives = [
+            path
+            for path in glob.glob(
+                os.path.join(self.archive_dir, f"{glob.escape(prefix)}*")
+            )
+            if path.endswith(tuple(ARCHIVE_CODECS.values()))
+        ]
+        return sorted(archives, key=os.path.getmtime)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if super().shouldRollover(record):
+            return True
+        # Размер проверяется без повторного форматирования записи: файл может
+        # превысить max_bytes на одну запись
+        return bool(
+            self.max_bytes and self.stream and self.stream.tell() >= self.max_bytes
+        )
+
+    def _rotate(self, source: str, dest: str) -> None:
+        """Переименование текущего файла и постановка в очередь архивации."""
+        if not os.path.exists(source):
+            return
+        rotated_file = f"{self.baseFilename}.{datetime.now():%Y-%m-%d_%H-%M-%S}"
+        # Несколько ротаций по размеру за одну секунду: имя занято, пока есть
+        # файл или его архив (файл удаляется сразу после сжатия)
+        suffix = 0
+        while self._name_taken(
+            rotated_file if not suffix else f"{rotated_file}.{suffix}"
+        ):
+            suffix += 1
+        if suffix:
+            rotated_file = f"{rotated_file}.{suffix}"
+        os.rename(source, rotated_file)
+        self._jobs.put(rotated_file)
+
+    def _name_taken(self, rotated_file: str) -> bool:
+        archive_name = os.path.join(
+            self.archive_dir,
+            f"{os.path.basename(rotated_file)}{ARCHIVE_CODECS[self.codec]}",
+        )
+        return os.path.exists(rotated_file) or os.path.exists(archive_name)
+
+    def _archive_worker(self) -> None:
+        while True:
+            rotated_file = self._jobs.get()
+            if rotated_file is None:
+                return
+            self._archive(rotated_file)
+
+    def _archive(self, rotated_file: str) -> None:
+        """Потоковое сжатие файла в архив и удаление файла."""
+        base_filename = os.path.basename(self.baseFilename)
+        # Извлекаем дату из имени файла (например, tcp_server.log.2025-03-25_16-02-34)
+        date_match = re.search(r"\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}", rotated_file)
+        if date_match:
+            timestamp = date_match.group(0)
+        else:
+            # Если дата не найдена, используем текущую
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        archive_name = os.path.join(
+            self.archive_dir,
+            f"{os.path.basename(rotated_file)}{ARCHIVE_CODECS[self.codec]}",
+        )
+        # Имя файла внутри zip: tcp_server_YYYY-MM-DD_HH-MM-SS.log
+        archived_file_name = f"{base_filename.replace('.log', '')}_{timestamp}.log"
+        # Архив пишется во временный файл: при сбое не остается обрезанного
+        partial_name = f"{archive_name}.part"
+        try:
+            with open(rotated_file, "rb") as source:
+                if self.codec == "zip":
+                    with zipfile.ZipFile(
+                        partial_name,
+                        "w",
+                        compression=zipfile.ZIP_DEFLATED,
+                        compresslevel=self.compresslevel,
+                    ) as zipf, zipf.open(
+                        archived_file_name,
+                        "w",
+                        force_zip64=os.path.getsize(rotated_file)
+                        >= zipfile.ZIP64_LIMIT,
+                    ) as target:
+                        shutil.copyfileobj(source, target, ARCHIVE_CHUNK)
+                elif self.codec == "gzip":
+                    with gzip.open(
+                        partial_name, "wb", compresslevel=self.compresslevel
+                    ) as target:
+                        shutil.copyfileobj(source, target, ARCHIVE_CHUNK)
+                else:
+                    with lzma.open(
+                        partial_name, "wb", preset=self.compresslevel
+                    ) as target:
+                        shutil.copyfileobj(source, target, ARCHIVE_CHUNK)
+            os.replace(partial_name, archive_name)
+            logger.debug("Старый лог-файл архивирован: %s", archive_name)
+
+            # Удаляем оригинальный файл после архивирования
+            os.remove(rotated_file)
+            logger.debug("Старый лог-файл удален после архивирования: %s", rotated_file)
+        except Exception as e:
+            logger.error("Ошибка при архивировании лог-файла %s: %s", rotated_file, e)
+            if os.path.exists(partial_name):
+                os.remove(partial_name)
+            return
+        if archive_name in self.archives:
+            self.archives.remove(archive_name)
+        self.archives.append(archive_name)
+        # Управление количеством архивов
+        self._manage_archives()
+
+    def _manage_archives(self) -> None:
+        """Управляет количеством архивов: оставляет только max_archives самых новых."""
+        while len(self.archives) > self.max_archives:
+            oldest_archive = self.archives.popleft()
+            try:
+                os.remove(oldest_archive)
+                logger.debug("Удален старый архив: %s", oldest_archive)
+            except Exception as e:
+                logger.error(
+                    "Ошибка при удалении старого архива %s: %s", oldest_archive, e
+                )
+
+    def stop_archiver(self) -> None:
+        """Дожидается архивации поставленных файлов и останавливает поток."""
+        if self._archiver.is_alive():
+            self._jobs.put(None)
+            self._archiver.join()
+
+    def close(self) -> None:
+        """Закрытие файла; при выходе дожидается архивации поставленных файлов."""
+        self.stop_archiver()
+        super().close()
+
+
+# Уровни логирования
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
+# Начало строк с отправленными данными: по ним parser_log восстанавливает
+# данные, поэтому такие строки не прореживаются и не обрезаются
+RECOVERY_PREFIX = "Данные успешно отправлены"
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только каждое N-е сообщение с заданным началом шаблона.
+
+    Шаблон — первый аргумент вызова логгера до подстановки аргументов, поэтому
+    отбор не требует форматирования: {"Повторная попытка": 10}. Сообщения,
+    начинающиеся с RECOVERY_PREFIX, пропускаются всегда.
+    """
+
+    def __init__(self, rules: Dict[str, int]):
+        super().__init__()
+        self.rules = [
+            (prefix, max(1, int(every)), itertools.count())
+            for prefix, every in rules.items()
+        ]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        msg = record.msg
+        if type(msg) is str and not msg.startswith(RECOVERY_PREFIX):
+            for prefix, every, counter in self.rules:
+                if msg.startswith(prefix):
+                    return next(counter) % every == 0
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """Передача записей лога в поток QueueListener без форматирования.
+
+    Стандартный QueueHandler форматирует сообщение в вызывающем потоке; здесь
+    подстановка аргументов и запись откладываются до потока логирования, а
+    аргументы-словари и списки копируются (верхний уровень), чтобы их
+    последующее изменение не попало в лог. Если очередь заполнена, запись
+    отбрасывается, а число потерянных записей сообщается следующей записью.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if type(args) is tuple:
+            record.args = tuple(
+                arg.copy() if type(arg) in (dict, list) else arg for arg in args
+            )
+        elif type(args) is dict:
+            record.args = args.copy()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.dropped:
+                dropped = self.dropped
+                self.queue.put_nowait(
+                    logging.makeLogRecord(
+                        {
+                            "name": record.name,
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": "Очередь лога переполнена, потеряно записей: %d",
+                            "args": (dropped,),
+                        }
+                    )
+                )
+                self.dropped -= dropped
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TruncatingQueueListener(QueueListener):
+    """QueueListener, который форматирует сообщение один раз для всех
+    обработчиков и обрезает его до max_message символов (0 — без обрезки).
+    Строки с отправленными данными (RECOVERY_PREFIX) не обрезаются."""
+
+    def __init__(self, log_queue, *handlers, max_message: int = 0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.max_message = max_message
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        try:
+            message = record.getMessage()
+        except Exception:
+            # Ошибку подстановки покажет обработчик (handleError)
+            return record
+        if (
+            self.max_message
+            and len(message) > self.max_message
+            and not message.startswith(RECOVERY_PREFIX)
+        ):
+            message = (
+                f"{message[: self.max_message]}... "
+                f"(+{len(message) - self.max_message} символов)"
+            )
+        record.msg = message
+        record.args = None
+        return record
+
+    def enqueue_sentinel(self) -> None:
+        # Ждать места в очереди: при выходе записи не теряются
+        self.queue.put(self._sentinel)
+
+
 # Настройка логирования
 def setup_logging(log_file: str) -> logging.Logger:
-    """Настройка логгера с поддержкой ротации логов и архивированием старых логов в ZIP."""
+    """Настройка логгера с поддержкой ротации логов и архивированием старых логов в ZIP.
+
+    Вызовы логгера не пишут на диск и в консоль сами: запись ставится в
+    очередь (LazyQueueHandler), а форматирование и вывод выполняет поток
+    QueueListener. Поэтому потоки опроса и отправки не ждут диска или stdout.
+    Сообщения в горячих местах пишутся с отложенной подстановкой:
+        logger.info("Данные успешно отправлены: %s", payload)
+    Настройки в config.json:
+        "log_level": "INFO"             — уровень основного логгера
+        "log_levels": {"queue": "WARNING", "poller": "DEBUG"}
+                                        — уровни подсистем (см. get_logger)
+        "log_queue_size": 10000         — емкость очереди лога, записей
+        "log_max_message": 2000         — обрезка длинных сообщений, символов
+                                          (0 — без обрезки)
+        "log_sampling": {"Повторная попытка": 10}
+                                        — писать каждое N-е такое сообщение
+    Строки "Данные успешно отправлены: ..." нужны parser_log для
+    восстановления данных, поэтому на них не действуют ни log_sampling, ни
+    log_max_message.
+    """
     # Создаем папку для логов и архивов, если они не существуют
     log_dir = os.path.join(os.path.dirname(log_file), "logs")
     archive_dir = os.path.join(log_dir, "archive")
@@ -29,18 +365,9 @@ def setup_logging(log_file: str) -> logging.Logger:
     os.makedirs(archive_dir, exist_ok=True)
     log_file = os.path.join(log_dir, os.path.basename(log_file))
 
-    # Уровни логирования
-    log_levels = {
-        "DEBUG": logging.DEBUG,
-        "INFO": logging.INFO,
-        "WARNING": logging.WARNING,
-        "ERROR": logging.ERROR,
-        "CRITICAL": logging.CRITICAL,
-    }
-
     # Создаем основной логгер
     logger = logging.getLogger(__name__)
-    logger.setLevel(log_levels.get(config["log_level"], logging.INFO))
+    logger.setLevel(LOG_LEVELS.get(config["log_level"], logging.INFO))
 
     # Форматирование сообщений
     formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
@@ -49,90 +376,15 @@ def setup_logging(log_file: str) -> logging.Logger:
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
 
-    # Кастомный обработчик для ротации логов с архивированием
-    class ArchivingTimedRotatingFileHandler(TimedRotatingFileHandler):
-        def __init__(self, *args, **kwargs):
-            self.archive_dir = kwargs.pop("archive_dir", archive_dir)
-            self.max_archives = kwargs.pop("max_archives", 2)  # Максимум 2 архива
-            super().__init__(*args, **kwargs)
-
-        def doRollover(self):
-            """Выполняет ротацию логов и архивирует старый лог-файл в ZIP."""
-            # Выполняем стандартную ротацию
-            super().doRollover()
-
-            # После ротации ищем старые лог-файлы
-            base_filename = self.baseFilename
-            rotated_files = glob.glob(f"{base_filename}.*")
-
-            for rotated_file in rotated_files:
-                if rotated_file != self.baseFilename and os.path.exists(rotated_file):
-                    # Извлекаем дату из имени файла (например, tcp_server.log.2025-03-25_16-02-34)
-                    date_match = re.search(
-                        r"\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}", rotated_file
-                    )
-                    if date_match:
-                        timestamp = date_match.group(0)
-                    else:
-                        # Если дата не найдена, используем текущую
-                        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-
-                    # Формируем имя архива с датой
-                    archive_name = os.path.join(
-                        self.archive_dir,
-                        f"{os.path.basename(rotated_file)}.zip",
-                    )
-
-                    # Формируем имя файла внутри архива: tcp_server_YYYY-MM-DD_HH-MM-SS.log
-                    archived_file_name = f"{os.path.basename(base_filename).replace('.log', '')}_{timestamp}.log"
-
-                    try:
-                        # Архивируем файл с максимальным сжатием
-                        with zipfile.ZipFile(
-                            archive_name,
-                            "w",
-                            compression=zipfile.ZIP_DEFLATED,
-                            compresslevel=9,
-                        ) as zipf:
-                            zipf.write(rotated_file, archived_file_name)
-                        logger.debug(f"Старый лог-файл архивирован: {archive_name}")
-
-                        # Удаляем оригинальный файл после архивирования
-                        os.remove(rotated_file)
-                        logger.debug(
-                            f"Старый лог-файл удален после архивирования: {rotated_file}"
-                        )
-                    except Exception as e:
-                        logger.error(
-                            f"Ошибка при архивировании лог-файла {rotated_file}: {e}"
-                        )
-            # Управление количеством архивов
-            self._manage_archives()
-
-        def _manage_archives(self):
-            """Управляет количеством архивов: оставляет только max_archives самых новых."""
-            archives = sorted(
-                glob.glob(os.path.join(self.archive_dir, "*.zip")), key=os.path.getmtime
-            )  # Сортируем по времени изменения (самые старые в начале)
-
-            # Если архивов больше, чем max_archives, удаляем самые старые
-            while len(archives) > self.max_archives:
-                oldest_archive = archives.pop(0)  # Удаляем самый старый из списка
-                try:
-                    os.remove(oldest_archive)
-                    logger.debug(f"Удален старый архив: {oldest_archive}")
-                except Exception as e:
-                    logger.error(
-                        f"Ошибка при удалении старого архива {oldest_archive}: {e}"
-                    )
-
     # Обработчик для ротации логов с архивированием
     file_handler = ArchivingTimedRotatingFileHandler(
         filename=log_file,
         when="W0",  # Ротация каждую неделю (понедельник)
         interval=1,  # Интервал - одна неделя
-        backupCount=2,  # Хранить до 2 старых логов (до архивирования)
-        max_archives=2,  # Максимум 2 архива
+        max_bytes=int(config.get("log_max_mb", 0) * 1024 * 1024),
+        max_archives=config.get("log_max_archives", 2),  # Максимум 2 архива
+        codec=config.get("log_archive_codec", "zip"),
+        compresslevel=config.get("log_archive_level", 6),
         encoding="utf-8",
         archive_dir=archive_dir,
     )
@@ -141,14 +393,53 @@ def setup_logging(log_file: str) -> logging.Logger:
     # Очищаем предыдущие обработчики, если они есть
     logger.handlers.clear()
 
-    # Добавляем обработчики в логгер
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Консоль и файл обслуживает поток QueueListener, в логгере — только очередь
+    log_queue = queue.Queue(maxsize=max(1, int(config.get("log_queue_size", 10000))))
+    queue_handler = LazyQueueHandler(log_queue)
+    if config.get("log_sampling"):
+        queue_handler.addFilter(SamplingFilter(config["log_sampling"]))
+    listener = TruncatingQueueListener(
+        log_queue,
+        console_handler,
+        file_handler,
+        max_message=int(config.get("log_max_message", 0)),
+    )
+    listener.start()
+
+    def stop_logging() -> None:
+        # Архиватор сам пишет в лог, поэтому останавливается раньше
+        # QueueListener: иначе его сообщения при выходе теряются в очереди
+        file_handler.stop_archiver()
+        # Дописать оставшиеся в очереди записи
+        listener.stop()
+
+    atexit.register(stop_logging)
+    logger.addHandler(queue_handler)
+
+    # Уровни подсистем
+    for subsystem, level in config.get("log_levels", {}).items():
+        logger.getChild(subsystem).setLevel(LOG_LEVELS.get(level, logging.INFO))
 
     logger.info("Логирование настроено с ротацией и архивированием.")
 
     return logger
 
 
+def get_logger(subsystem: Optional[str] = None) -> logging.Logger:
+    """Логгер подсистемы ("queue", "poller", ...): уровень задается в
+    config["log_levels"], вывод — общий с основным логгером."""
+    if not subsystem:
+        return logger
+    return logger.getChild(subsystem)
+
+
+def get_device_setting(ip, key, default=None):
+    """Настройка устройства: сначала device_settings[ip][key], затем config[key]."""
+    device_settings = config.get("device_settings", {}).get(ip, {})
+    if key in device_settings:
+        return device_settings[key]
+    return config.get(key, default)
+
+
 config = load_config()
 logger = setup_logging(config["log_file"])
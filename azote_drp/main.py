@@ -1,12 +1,17 @@
-from pymodbus.client import ModbusTcpClient
 from pymodbus.exceptions import ModbusException
+import asyncio
 import time
 
 from bit import valid_addresses, register_bit_labels
 
 from utils.tg_alarm import notify_server
-from utils.overall_work import config, logger
+from utils.overall_work import config, logger, get_device_setting
 from utils.DataQueueManager import DataQueueManager
+from utils.async_poller import AsyncModbusPoller
+from utils.request_planner import read_planned
+from utils.alarm_decoder import bits_to_word
+from utils.poll_plan import build_group_plans
+from utils.change_filter import ChangeFilter
 
 
 data_server = config["server_url"]
@@ -16,14 +21,24 @@ alarm_server = config["server_url_alarm"]
 MAX_CYCLE_TIME = config["max_cycle_time"]
 
 
-# data.db и alarm.db обязательно называть таким образом для сервера приема
-qm_data = DataQueueManager(
-    db_name="data.db",
-    server_url=data_server,
-)
-qm_alarm = DataQueueManager(
-    db_name="alarm.db",
-    server_url=alarm_server,
+# Темы data и alarm обязательно называть таким образом для сервера приема.
+# Аварии уходят раньше накопленных данных и не прореживаются (без retention);
+# неотправленные записи прежних data.db и alarm.db переносятся при запуске.
+queue = DataQueueManager(
+    db_name="queue.db",
+    topics={
+        "alarm": {
+            "server_url": alarm_server,
+            "priority": 0,
+            "import_from": "alarm.db",
+        },
+        "data": {
+            "server_url": data_server,
+            "priority": 1,
+            "retention": config.get("retention"),
+            "import_from": "data.db",
+        },
+    },
 )
 
 
@@ -47,196 +62,125 @@ def validate_config(config):
         )
 
 
-def convert_to_signed(value):
-    """Преобразует беззнаковое 16-битное значение в знаковое."""
-    return value if value < 32768 else value - 65536
+# Отправка по изменению: в очередь уходят только изменившиеся значения
+# (с зоной нечувствительности), раз в keyframe_minutes — полный снимок
+data_filter = ChangeFilter.from_config(config.get("report_by_exception"))
+# Аварийные биты сравниваются без зоны нечувствительности
+alarm_filter = ChangeFilter.from_config(
+    config.get("report_by_exception"), use_deadband=False
+)
+
+
+# Планы опроса по группам запросов (поле "group") собираются один раз при запуске
+poll_plans = build_group_plans(
+    config["request_settings"],
+    bit_labels={address: register_bit_labels[address] for address in valid_addresses},
+    max_gap=config.get("max_register_gap", 8),
+)
 
 
-def read_modbus_data(client, addresses, retries=3, delay=5, ip=None):
+async def read_modbus_data(client, plan, retries=3, delay=5, ip=None):
     """Чтение данных Modbus с накоплением и отправкой в один пакет."""
     collected_data = {}  # Словарь для накопления данных
     collected_alarm = {}  # Словарь для накопления данных
-    logger.info(f"Производится чтение данных с IP-адреса {ip}")
-    for (
-        address,
-        count,
-    ) in addresses:  # Адреса и количество регистров в виде списка кортежей
-        for attempt in range(retries):
+    logger.debug("Производится чтение данных с IP-адреса %s", ip)
+
+    # Чтение объединенными блоками, ответы разрезаются по адресам из конфигурации
+    registers_by_address, failed = await read_planned(
+        client, plan.planner(ip), retries=retries, delay=delay
+    )
+    error_flag = bool(failed)  # Флаг ошибки для текущего клиента
+
+    if ip and registers_by_address:
+        collected_data["IP"] = ip
+        collected_alarm["IP"] = ip
+
+    # Источник аварийных битов: "coils" (по умолчанию) — отдельный запрос
+    # read_coils на каждое аварийное слово; "registers" — слово из уже
+    # прочитанного ответа holding-регистров, без дополнительного трафика.
+    # Сокращение трафика включается только явной настройкой
+    # "alarm_source": "registers" в config.json (глобально или в
+    # device_settings[ip]) для устройств, где регистр дублирует биты аварий.
+    alarm_source = get_device_setting(ip, "alarm_source", "coils")
+    if alarm_source == "coils":
+        for address in sorted(plan.alarm_addresses.intersection(registers_by_address)):
             try:
-                start_time = time.time()
-
-                response = client.read_holding_registers(address=address, count=count)
-
-                end_time = time.time()
-                execution_time = end_time - start_time
-                if execution_time > 5:
-                    logger.warning(
-                        f"Чтение {address} заняло {execution_time:.2f} секунд."
-                    )
-
-                if response.isError():
-                    logger.error(
-                        f"Ошибка при чтении регистров с адреса {address}: {response}"
-                    )
-                    continue  # Попробуем снова, если была ошибка
-                else:
-                    if ip:
-                        collected_data["IP"] = ip
-                        collected_alarm["IP"] = ip
-
-                    if address in valid_addresses:
-                        response_bits = client.read_coils(address=address, count=16)
-                        if not response_bits.isError():
-                            bits = response_bits.bits[:16]
-                        else:
-                            logger.error(f"Ошибка чтения битов с адреса {address}")
-                            continue
-
-                        # print(f"Значение регистра R{address:03d}: {bits:016b}")
-                        existing_alarms = {}
-                        # Парсинг битовых данных
-                        for i, bit_label in enumerate(register_bit_labels[address]):
-                            if i < len(
-                                bits
-                            ):  # Проверяем, существует ли бит с таким индексом
-                                bit_value = bits[i]
-                                # print(i, bit_label, bit_value)
-                                existing_alarms[bit_label] = (
-                                    "Сообщение" if bit_value else "ОК"
-                                )
-                        # Вывод результатов
-                        # Добавляем данные из existing_alarms в collected_alarm
-                        for label, status in existing_alarms.items():
-                            collected_alarm[label] = status
-                    else:
-                        # Чтение регистров и добавление в словарь для остальных адресов
-                        for i, reg_value in enumerate(response.registers):
-                            signed_value = convert_to_signed(reg_value)
-                            register = f"R{address + i:03d}"
-                            collected_data[register] = str(
-                                signed_value
-                            )  # Добавляем значение регистра в collected_data
-
-                    break  # Успешное чтение завершено, выходим из цикла попыток
-
+                response_bits = await client.read_coils(address=address, count=16)
             except ModbusException as e:
-                logger.error(f"Ошибка Modbus при чтении с адреса {address}: {e}")
-
-            # Если не получилось, подождем и сделаем еще одну попытку
-            if attempt < retries - 1:
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}...")
-                time.sleep(delay)
-
-        else:
-            # Если после всех попыток не получилось, сообщаем об ошибке
-            logger.error(
-                f"Не удалось получить данные с адреса {address} после {retries} попыток."
-            )
-
-        # После опроса всех адресов отправляем собранные данные
-        # print("Collected Data: ", collected_data)
-        # print("Collected Alarm: ", collected_alarm)
-        # Отправка данных на сервер
-        qm_data.save_to_db(collected_data)
-        qm_alarm.save_to_db(collected_alarm)
-
-
-# Функция для работы с каждым IP-адресом
+                logger.error(f"Ошибка Modbus при чтении битов с адреса {address}: {e}")
+                del registers_by_address[address]
+                error_flag = True
+                continue
+            if response_bits.isError():
+                logger.error(f"Ошибка чтения битов с адреса {address}")
+                del registers_by_address[address]
+                error_flag = True
+                continue
+            registers_by_address[address] = [bits_to_word(response_bits.bits[:16])]
+
+    # Раскладываем значения по заранее подготовленным ключам
+    plan.apply(registers_by_address, collected_data, collected_alarm)
+
+    # После опроса всех адресов отправляем собранные данные
+    # print("Collected Data: ", collected_data)
+    # print("Collected Alarm: ", collected_alarm)
+    # Отправка на сервер только изменившихся данных
+    changed_data = data_filter.filter(collected_data)
+    if changed_data:
+        queue.save_to_db(changed_data, topic="data")
+    changed_alarm = alarm_filter.filter(collected_alarm)
+    if changed_alarm:
+        queue.save_to_db(changed_alarm, topic="alarm")
+
+    return error_flag  # Возвращаем флаг ошибки
+
+
+async def poll_device(client, ip, group):
+    """Опрос всех адресов одного Modbus-сервера. Возвращает флаг ошибки."""
+    start_time = time.time()
+    error_flag = await read_modbus_data(
+        client,
+        poll_plans[group],
+        retries=config.get("retries", 3),
+        delay=config.get("retry_delay", 5),
+        ip=ip,
+    )
+    if time.time() - start_time > config.get("max_read_duration", 60):
+        logger.error(f"Превышено время выполнения чтения для {ip}.")
+    return error_flag
+
+
+def poll_groups():
+    """Период и фаза каждой группы запросов из config["poll_groups"]."""
+    return {group: config.get("poll_groups", {}).get(group, {}) for group in poll_plans}
+
+
+# Параллельный опрос всех IP-адресов
 def process_modbus_data():
-    clients = {}
-
-    for ip in config["modbus_servers"]:
-        client = ModbusTcpClient(ip, port=config["modbus_port"], timeout=5)
-        try:
-            connection = client.connect()
-            if connection:
-                logger.info(f"Подключение к {ip} успешно.")
-                clients[ip] = client
-            else:
-                logger.error(
-                    f"Не удалось установить соединение с сервером {ip}. Пропуск."
-                )
-                clients[ip] = None
-        except Exception as e:
-            logger.error(f"Ошибка при подключении к {ip}: {e}. Пропуск.")
-            clients[ip] = None
-
+    poller = AsyncModbusPoller(
+        config["modbus_servers"],
+        config["modbus_port"],
+        poll_device,
+        max_concurrency=config.get("max_concurrency", 10),
+        breaker=config.get("circuit_breaker"),
+        # Конвейерная отправка запросов: общее значение или в device_settings
+        pipeline_depth={
+            ip: get_device_setting(ip, "pipeline_depth", 0)
+            for ip in config["modbus_servers"]
+        },
+        timeout=5,
+    )
     try:
-        while True:
-            cycle_start_time = time.time()
-            for ip, client in clients.items():
-                if client is None:
-                    try:
-                        logger.info(f"Проверка доступности сервера {ip}...")
-                        new_client = ModbusTcpClient(
-                            ip, port=config["modbus_port"], timeout=5
-                        )
-                        connection = new_client.connect()
-                        if connection:
-                            logger.info(f"Соединение с сервером {ip} восстановлено.")
-                            clients[ip] = new_client
-                        else:
-                            logger.warning(f"Сервер {ip} по-прежнему недоступен.")
-                    except Exception as e:
-                        logger.error(f"Ошибка при повторном подключении к {ip}: {e}.")
-                else:
-                    try:
-                        addresses_to_read = []
-                        for request in config["request_settings"]:
-                            address = request.get("address")
-                            count = request.get("count")
-                            if address is None or count is None:
-                                logger.error(f"Некорректный запрос: {request}")
-                                continue
-                            addresses_to_read.append((address, count))
-
-                        if not client.is_socket_open():
-                            logger.warning(f"Соединение с {ip} потеряно. Пропуск.")
-                            client.close()
-                            continue
-
-                        start_time = time.time()
-                        read_modbus_data(
-                            client,
-                            addresses=addresses_to_read,
-                            retries=config.get("retries", 3),
-                            delay=config.get("retry_delay", 5),
-                            ip=ip,
-                        )
-                        if time.time() - start_time > config.get(
-                            "max_read_duration", 60
-                        ):
-                            logger.error(f"Превышено время выполнения чтения для {ip}.")
-                            continue
-
-                        time.sleep(config["machine_interval"])
-                    except Exception as e:
-                        logger.error(f"Ошибка при опросе {ip}: {e}.")
-                        clients[ip] = None
-
-            if time.time() - cycle_start_time > MAX_CYCLE_TIME:
-                logger.error(
-                    "Превышено максимальное время выполнения цикла. Прерывание."
-                )
-                break
-
-            logger.info("Ожидание следующего цикла...")
-            try:
-                notify_server()
-            except Exception as e:
-                logger.error(f"Ошибка при уведомлении сервера: {e}.")
-
-            time.sleep(config["polling_interval"])
-
-    except Exception as e:
-        logger.error(f"Ошибка в основном цикле: {e}")
+        asyncio.run(
+            poller.run(
+                config["polling_interval"],
+                on_cycle=notify_server,
+                max_cycle_time=MAX_CYCLE_TIME,
+                groups=poll_groups(),
+            )
+        )
     except KeyboardInterrupt:
         logger.info("Опрос остановлен пользователем.")
-    finally:
-        for ip, client in clients.items():
-            if client:
-                client.close()
-                logger.info(f"Соединение с {ip} закрыто.")
 
 
 # Основная функция
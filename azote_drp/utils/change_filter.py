@@ -0,0 +1,114 @@
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class ChangeFilter:
+    """Отправка по изменению (report by exception) перед постановкой в очередь.
+
+    Хранит последнее отправленное значение каждого регистра каждого устройства
+    (устройство определяется полем id_key, по умолчанию "IP") и пропускает
+    дальше только изменившиеся ключи. Для числовых значений применяется зона
+    нечувствительности: абсолютная (5) или в процентах от последнего
+    отправленного значения ("2%"). Раз в keyframe_interval секунд по устройству
+    уходит полный снимок всех известных значений, чтобы сервер мог восстановить
+    состояние.
+
+    Настройки в config.json:
+        "report_by_exception": {
+            "keyframe_minutes": 10,
+            "deadband": {"*": 0, "R065": 5, "R066": "2%"}
+        }
+    "*" — зона по умолчанию для регистров без своей настройки.
+
+    Использование:
+        data_filter = ChangeFilter.from_config(config.get("report_by_exception"))
+        payload = data_filter.filter(collected_data)
+        if payload:
+            qm_data.save_to_db(payload)
+    """
+
+    def __init__(
+        self,
+        deadband: Optional[Dict[str, Any]] = None,
+        keyframe_interval: float = 600.0,
+        id_key: str = "IP",
+        enabled: bool = True,
+    ):
+        deadband = dict(deadband or {})
+        self.default_deadband = self._parse_deadband(deadband.pop("*", 0))
+        self.deadband = {
+            key: self._parse_deadband(value) for key, value in deadband.items()
+        }
+        self.keyframe_interval = keyframe_interval
+        self.id_key = id_key
+        self.enabled = enabled
+        self._sent: Dict[Any, Dict[str, Any]] = {}  # Последние отправленные значения
+        self._state: Dict[Any, Dict[str, Any]] = {}  # Последние прочитанные значения
+        self._keyframe_at: Dict[Any, float] = {}  # Время последнего полного снимка
+
+    @classmethod
+    def from_config(
+        cls, settings: Optional[Dict[str, Any]], use_deadband: bool = True
+    ) -> "ChangeFilter":
+        """Создание фильтра из секции report_by_exception (None — фильтр выключен)."""
+        if not settings:
+            return cls(enabled=False)
+        return cls(
+            deadband=settings.get("deadband") if use_deadband else None,
+            keyframe_interval=settings.get("keyframe_minutes", 10) * 60,
+        )
+
+    @staticmethod
+    def _parse_deadband(value) -> Tuple[float, bool]:
+        """5 -> (5.0, False); "2%" -> (0.02, True)."""
+        if isinstance(value, str) and value.strip().endswith("%"):
+            return float(value.strip()[:-1]) / 100, True
+        return float(value), False
+
+    def _changed(self, key: str, old: Any, new: Any) -> bool:
+        if old is None:
+            return True
+        if old == new:
+            return False
+        try:
+            old_value = float(old)
+            new_value = float(new)
+        except (TypeError, ValueError):
+            return True  # Нечисловые значения сравниваются только на равенство
+        band, relative = self.deadband.get(key, self.default_deadband)
+        if relative:
+            band *= abs(old_value)
+        return abs(new_value - old_value) > band
+
+    def filter(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Возвращает данные для отправки или None, если отправлять нечего."""
+        values = {key: value for key, value in payload.items() if key != self.id_key}
+        if not values:
+            return None
+        if not self.enabled:
+            return payload
+
+        device = payload.get(self.id_key)
+        state = self._state.setdefault(device, {})
+        state.update(values)
+        sent = self._sent.setdefault(device, {})
+
+        now = time.monotonic()
+        last_keyframe = self._keyframe_at.get(device)
+        if last_keyframe is None or now - last_keyframe >= self.keyframe_interval:
+            # Полный снимок всех известных значений устройства
+            self._keyframe_at[device] = now
+            changed = dict(state)
+        else:
+            changed = {
+                key: value
+                for key, value in values.items()
+                if self._changed(key, sent.get(key), value)
+            }
+            if not changed:
+                return None
+        sent.update(changed)
+
+        if self.id_key in payload:
+            return {self.id_key: device, **changed}
+        return changed
@@ -0,0 +1,179 @@
+import struct
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .overall_work import config
+
+# Типы значений регистров (поле "type" в request_settings)
+INT16 = "int16"
+UINT16 = "uint16"
+INT32 = "int32"
+UINT32 = "uint32"
+FLOAT32 = "float32"
+BOOL = "bool"
+
+# Число регистров на одно значение
+TYPE_WIDTHS = {INT16: 1, UINT16: 1, INT32: 2, UINT32: 2, FLOAT32: 2, BOOL: 1}
+
+# Код формата struct для одного значения
+_STRUCT_CODES = {INT16: "h", UINT16: "H", INT32: "i", UINT32: "I", FLOAT32: "f"}
+
+# Значения-заглушки датчиков (нет измерения) для 32-битных типов по умолчанию
+DEFAULT_SENTINELS = (-9999, -9999999)
+
+
+class BlockDecoder:
+    """Декодер блока регистров в значения одного типа.
+
+    Весь ответ на запрос раскодируется за один проход struct: регистры
+    упаковываются в байты с нужным порядком байтов в слове, при необходимости
+    слова в парах меняются местами, и блок читается одним unpack. Настройки
+    запроса в request_settings:
+        "type": "float32"         — int16, uint16, int32, uint32, float32, bool
+        "word_order": "little"    — 32-битные значения младшим словом вперед
+                                    (по умолчанию "big" — старшим)
+        "byte_order": "little"    — байты в регистре младшим вперед
+        "scale": 0.1, "offset": 0 — значение = сырое * scale + offset
+        "sentinels": [-9999]      — сырые значения "нет измерения"; по
+                                    умолчанию -9999 и -9999999 для 32-битных
+                                    типов и ничего для 16-битных
+
+    Значения-заглушки возвращаются как None (пропуск), и PollPlan не кладет
+    их в данные. Целые без масштаба остаются int, с масштабом — float.
+    """
+
+    def __init__(
+        self,
+        value_type: str = INT16,
+        word_order: str = "big",
+        byte_order: str = "big",
+        scale: float = 1,
+        offset: float = 0,
+        sentinels: Optional[Iterable[float]] = None,
+    ):
+        if value_type not in TYPE_WIDTHS:
+            raise ValueError(f"Неизвестный тип значений: {value_type}")
+        if word_order not in ("big", "little") or byte_order not in ("big", "little"):
+            raise ValueError(
+                f"Неизвестный порядок слов или байтов: {word_order}, {byte_order}"
+            )
+        self.value_type = value_type
+        self.width = TYPE_WIDTHS[value_type]
+        self.swap_words = self.width == 2 and word_order == "little"
+        self.register_format = ">" if byte_order == "big" else "<"
+        self.scale = scale
+        self.offset = offset
+        if sentinels is None:
+            sentinels = DEFAULT_SENTINELS if self.width == 2 else ()
+        self.sentinels = frozenset(sentinels) if value_type != BOOL else frozenset()
+        # Пары struct (упаковка регистров, чтение значений) по числу регистров
+        self._structs: Dict[int, tuple] = {}
+
+    @classmethod
+    def from_settings(cls, request: Dict[str, Any]) -> "BlockDecoder":
+        """Декодер по описанию запроса из request_settings.
+
+        count блока должен делиться на число регистров значения, иначе
+        последнее значение было бы прочитано наполовину.
+        """
+        decoder = cls(
+            value_type=request.get("type", INT16),
+            word_order=request.get("word_order", "big"),
+            byte_order=request.get("byte_order", "big"),
+            scale=request.get("scale", 1),
+            offset=request.get("offset", 0),
+            sentinels=request.get("sentinels"),
+        )
+        count = request.get("count", 0)
+        if count % decoder.width:
+            raise ValueError(
+                f"Блок с адреса {request.get('address')}: count {count} не кратен "
+                f"{decoder.width} регистрам значения {decoder.value_type}"
+            )
+        return decoder
+
+    def _struct_pair(self, count: int) -> tuple:
+        pair = self._structs.get(count)
+        if pair is None:
+            values = count // self.width
+            pair = (
+                struct.Struct(f"{self.register_format}{values * self.width}H"),
+                struct.Struct(f">{values}{_STRUCT_CODES[self.value_type]}"),
+            )
+            self._structs[count] = pair
+        return pair
+
+    def __call__(self, registers: List[int]) -> List[Any]:
+        if self.value_type == BOOL:
+            return [value != 0 for value in registers]
+        if self.swap_words:
+            registers = list(registers)
+            registers[0::2], registers[1::2] = registers[1::2], registers[0::2]
+        pack, unpack = self._struct_pair(len(registers))
+        values = unpack.unpack(pack.pack(*registers[: pack.size // 2]))
+        scale, offset, sentinels = self.scale, self.offset, self.sentinels
+        if scale != 1 or offset != 0:
+            return [
+                None if value in sentinels else value * scale + offset
+                for value in values
+            ]
+        if sentinels:
+            return [None if value in sentinels else value for value in values]
+        return list(values)
+
+
+def to_wire_value(value: Any) -> Any:
+    """Значение в прежнем строковом виде: 895 -> "895", 23.5 -> "23.50", True -> "1"."""
+    if type(value) is bool:
+        return "1" if value else "0"
+    if type(value) is int:
+        return str(value)
+    if type(value) is float:
+        return f"{value:.2f}"
+    if type(value) is dict:
+        return to_wire(value)
+    return value
+
+
+def to_wire(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Словарь значений в прежнем строковом виде (вложенные словари тоже)."""
+    return {key: to_wire_value(value) for key, value in data.items()}
+
+
+def round_value(value: Any, decimals: int) -> Any:
+    """Округление float до decimals знаков: 23.399999618530273 -> 23.4."""
+    if type(value) is float:
+        return round(value, decimals)
+    if type(value) is dict:
+        return round_floats(value, decimals)
+    return value
+
+
+def round_floats(data: Dict[str, Any], decimals: int) -> Dict[str, Any]:
+    """Словарь с округленными float значениями (вложенные словари тоже)."""
+    return {
+        key: (
+            round(value, decimals)
+            if type(value) is float
+            else round_value(value, decimals)
+        )
+        for key, value in data.items()
+    }
+
+
+def wire_encoder() -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Преобразование данных перед отправкой на сервер.
+
+    Значения хранятся и передаются по очереди числами (int, float, bool) и
+    превращаются в строки только при отправке, если сервер ждет прежний формат:
+        "string_values": true — "895", "23.50", "1" вместо 895, 23.5, true
+    Иначе float округляются до знаков, как в прежнем формате, чтобы float32
+    и результаты масштабирования не уходили с "хвостом" double:
+        "float_decimals": 2       — 23.4 вместо 23.399999618530273
+                                    (null — без округления)
+    """
+    if config.get("string_values", False):
+        return to_wire
+    decimals = config.get("float_decimals", 2)
+    if decimals is None:
+        return lambda data: data
+    return lambda data: round_floats(data, decimals)
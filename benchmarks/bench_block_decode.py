@@ -0,0 +1,115 @@
+"""Разбор блока температур салатной линии: по одному float или блоком.
+
+Прежний путь (salad_line/pr103): 18 значений float32 по отдельности — сдвиг,
+to_bytes, struct.unpack и строка f"{:.2f}" на каждое значение. Новый путь:
+BlockDecoder раскодирует ответ на 36 регистров за один проход struct, а
+значения приводятся к виду для сервера (wire_encoder) только при отправке.
+Перед замером проверяется, что результаты совпадают, а для всех порядков слов
+и байтов и типов int32/uint32/float32 декодер восстанавливает исходные
+значения; отдельно — цена round_floats на отправке.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_block_decode.py
+"""
+
+import random
+import struct
+import sys
+import timeit
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.sample_types import BlockDecoder, round_floats, to_wire
+
+ADDRESS = 16384
+VALUES = 18
+
+random.seed(1)
+TEMPERATURES = [round(random.uniform(-20, 120), 1) for _ in range(VALUES)]
+TEMPERATURES[5] = -9999.0  # Датчик не подключен
+
+
+def to_registers(values, code, word_order="big", byte_order="big"):
+    """Регистры, которые отдало бы устройство с заданным порядком слов и байтов."""
+    registers = []
+    for value in values:
+        high, low = struct.unpack(">2H", struct.pack(f">{code}", value))
+        words = [high, low] if word_order == "big" else [low, high]
+        if byte_order == "little":
+            words = [((w & 0xFF) << 8) | (w >> 8) for w in words]
+        registers.extend(words)
+    return registers
+
+
+REGISTERS = to_registers(TEMPERATURES, "f", word_order="little")
+
+
+def convert_registers_to_float(registers):
+    """Прежнее преобразование из salad_line/pr103/main.py."""
+    value = (registers[1] << 16) | registers[0]
+    bytes_value = value.to_bytes(4, byteorder="big")
+    return struct.unpack(">f", bytes_value)[0]
+
+
+def legacy_cycle():
+    collected_data = {}
+    for i in range(VALUES):
+        address = ADDRESS + i * 2
+        float_value = convert_registers_to_float(REGISTERS[i * 2 : i * 2 + 2])
+        if float_value in (-9999.00, -9999999.00):
+            continue
+        collected_data[f"R{address:03d}"] = f"{float_value:.2f}"
+    return collected_data
+
+
+decoder = BlockDecoder.from_settings(
+    {"address": ADDRESS, "count": 36, "type": "float32", "word_order": "little"}
+)
+
+
+def block_cycle():
+    collected_data = {}
+    for i, value in enumerate(decoder(REGISTERS)):
+        if value is not None:
+            collected_data[f"R{ADDRESS + i * 2:03d}"] = value
+    return collected_data
+
+
+def check_orders():
+    samples = {
+        "float32": ("f", [1.5, -273.25, 3.0e6, 0.0]),
+        "int32": ("i", [1, -1, -70000, 2**31 - 1]),
+        "uint32": ("I", [1, 70000, 2**32 - 1, 0]),
+    }
+    for value_type, (code, values) in samples.items():
+        for word_order in ("big", "little"):
+            for byte_order in ("big", "little"):
+                block = BlockDecoder(
+                    value_type, word_order=word_order, byte_order=byte_order
+                )
+                registers = to_registers(values, code, word_order, byte_order)
+                assert block(registers) == values, (value_type, word_order, byte_order)
+    scaled = BlockDecoder("int16", scale=0.1, offset=-40, sentinels=[-32768])
+    assert scaled([400, 65535, 32768]) == [0.0, -40.1, None]
+
+
+def main():
+    check_orders()
+    assert legacy_cycle() == to_wire(block_cycle()), "Результаты разбора не совпадают"
+    assert f"R{ADDRESS + 10:03d}" not in block_cycle(), "Заглушка попала в данные"
+
+    data = block_cycle()
+    assert round_floats(data, 2) == {k: float(v) for k, v in legacy_cycle().items()}
+
+    number = 20000
+    for name, func in (("По одному float", legacy_cycle), ("Блоком", block_cycle)):
+        best = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f"{name:>16}: {best * 1e6:8.2f} мкс на цикл")
+    best = min(timeit.repeat(lambda: round_floats(data, 2), number=number)) / number
+    print(f"{'round_floats':>16}: {best * 1e6:8.2f} мкс при отправке")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Скорость отправки записей с общей keep-alive сессией и без нее.
+
+Поднимает локальный HTTPS-сервер (самоподписанный сертификат, нужен openssl)
+вместо eco-system.tech и отправляет RECORDS записей:
+  - requests.post: новое TCP и TLS соединение на каждую запись (прежний путь);
+  - utils.http_session.post: соединения берутся из общего пула.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_http_session.py
+"""
+
+import json
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils import http_session
+
+RECORDS = 300
+PAYLOAD = {
+    "timestamp": "2024-01-01T00:00:00",
+    "data": {"IP": "192.168.1.204", "R065": "895", "R066": "170"},
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    # Заголовки и тело ответа уходят одним сегментом, без задержек Nagle
+    disable_nagle_algorithm = True
+    wbufsize = 65536
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tmp):
+    cert, key = f"{tmp}/cert.pem", f"{tmp}/key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True,
+        capture_output=True,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"https://localhost:{server.server_port}/"
+
+
+def run(post, url):
+    body = json.dumps(PAYLOAD)
+    headers = {"Content-Type": "application/json"}
+    start = time.perf_counter()
+    for _ in range(RECORDS):
+        response = post(url, data=body, headers=headers, timeout=5, verify=False)
+        assert response.status_code == 200
+    return RECORDS / (time.perf_counter() - start)
+
+
+def main():
+    warnings.filterwarnings("ignore")  # Самоподписанный сертификат
+    with tempfile.TemporaryDirectory() as tmp:
+        url = start_server(tmp)
+        for name, post in (
+            ("requests.post", requests.post),
+            ("Общая сессия", http_session.post),
+        ):
+            print(f"{name:>14}: {run(post, url):8.1f} записей/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Задержка записи лога в момент ротации и время архивации в фоне.
+
+Файл лога размером LOG_MB МБ (строки как у "Данные успешно отправлены")
+ротируется:
+  - прежний путь: zip с compresslevel=9 в потоке, вызвавшем ротацию, затем
+    glob и сортировка архивов по времени изменения;
+  - ArchivingTimedRotatingFileHandler: переименование в потоке записи,
+    потоковое сжатие в фоновом потоке (разные форматы и степени сжатия).
+Для нового пути проверяется ротация по размеру (max_bytes), содержимое
+архива и удаление архивов сверх max_archives.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_log_rotation.py [LOG_MB]
+"""
+
+import glob
+import gzip
+import logging
+import lzma
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.overall_work import ArchivingTimedRotatingFileHandler
+
+LOG_MB = float(sys.argv[1]) if len(sys.argv) > 1 else 50
+LINE = (
+    "2024-01-01 00:00:00,000 - INFO - Данные успешно отправлены: "
+    + str({"IP": "192.168.1.204", **{f"R{i:03d}": i * 7 for i in range(65, 165)}})
+    + "\n"
+)
+
+
+def write_log(path):
+    lines = int(LOG_MB * 1024 * 1024 / len(LINE.encode()))
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines):
+            f.write(LINE)
+    return os.path.getsize(path)
+
+
+def legacy_rollover(log_file, archive_dir):
+    """Прежняя архивация после ротации (в вызывающем потоке)."""
+    rotated_file = f"{log_file}.2024-01-01"
+    os.rename(log_file, rotated_file)
+    with zipfile.ZipFile(
+        os.path.join(archive_dir, f"{os.path.basename(rotated_file)}.zip"),
+        "w",
+        compression=zipfile.ZIP_DEFLATED,
+        compresslevel=9,
+    ) as zipf:
+        zipf.write(rotated_file, "modbus_data_2024-01-01.log")
+    os.remove(rotated_file)
+    sorted(glob.glob(os.path.join(archive_dir, "*.zip")), key=os.path.getmtime)
+
+
+def make_handler(log_file, archive_dir, **kwargs):
+    handler = ArchivingTimedRotatingFileHandler(
+        filename=log_file,
+        when="W0",
+        interval=1,
+        encoding="utf-8",
+        archive_dir=archive_dir,
+        **kwargs,
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def wait_archived(handler, archives):
+    while len(handler.archives) < archives:
+        time.sleep(0.01)
+
+
+def read_archive(path):
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as zipf:
+            return zipf.read(zipf.namelist()[0])
+    opener = gzip.open if path.endswith(".gz") else lzma.open
+    with opener(path) as f:
+        return f.read()
+
+
+def record(message):
+    return logging.makeLogRecord({"msg": message, "levelno": logging.INFO})
+
+
+def check_size_rotation(tmp):
+    """Ротация по размеру и ограничение числа архивов."""
+    log_dir = os.path.join(tmp, "size")
+    archive_dir = os.path.join(log_dir, "archive")
+    os.makedirs(archive_dir)
+    handler = make_handler(
+        os.path.join(log_dir, "modbus_data.log"),
+        archive_dir,
+        max_bytes=40,  # 10 записей по 4 байта
+        max_archives=3,
+        codec="gzip",
+    )
+    for i in range(55):
+        handler.handle(record(f"{i:03d}"))
+    handler.close()
+    archives = sorted(glob.glob(os.path.join(archive_dir, "*.gz")))
+    assert len(handler.archives) == len(archives) == 3, archives
+    numbers = []
+    for path in handler.archives:
+        numbers += read_archive(path).decode().split()
+    assert numbers == sorted(numbers), "Порядок записей в архивах нарушен"
+    assert not glob.glob(os.path.join(log_dir, "modbus_data.log.*"))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_size_rotation(tmp)
+
+        log_file = os.path.join(tmp, "modbus_data.log")
+        archive_dir = os.path.join(tmp, "archive")
+        os.makedirs(archive_dir)
+        size = write_log(log_file)
+        start = time.perf_counter()
+        legacy_rollover(log_file, archive_dir)
+        elapsed = time.perf_counter() - start
+        archive = glob.glob(os.path.join(archive_dir, "*.zip"))[0]
+        print(
+            f"Лог {size / 1024 / 1024:.0f} МБ. Прежний путь (zip, 9): запись ждет "
+            f"{elapsed * 1000:.0f} мс, архив {os.path.getsize(archive) / 1024:.0f} КБ"
+        )
+
+        for codec, level in (("zip", 9), ("zip", 6), ("gzip", 6), ("xz", 1)):
+            archive_dir = os.path.join(tmp, f"archive_{codec}_{level}")
+            os.makedirs(archive_dir)
+            write_log(log_file)
+            handler = make_handler(
+                log_file, archive_dir, codec=codec, compresslevel=level
+            )
+            start = time.perf_counter()
+            handler.doRollover()
+            blocked = time.perf_counter() - start
+            wait_archived(handler, 1)
+            background = time.perf_counter() - start
+            archive = handler.archives[-1]
+            assert read_archive(archive) == LINE.encode() * (size // len(LINE.encode()))
+            handler.close()
+            print(
+                f"{codec:>4}, {level}: запись ждет {blocked * 1000:6.2f} мс, "
+                f"сжатие в фоне {background * 1000:5.0f} мс, "
+                f"архив {os.path.getsize(archive) / 1024:.0f} КБ"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Задержка вызова logger.info с полезной нагрузкой при медленном диске.
+
+Поток, как поток отправки, пишет RECORDS сообщений "Данные успешно
+отправлены" с записью на 100 регистров. Обработчик файла каждые SLOW_EVERY
+записей задерживается на SLOW_HOLD секунд (как SD-карта при сбросе кэша).
+  - прежний путь: f-строка и запись обработчиком в вызывающем потоке;
+  - очередь: LazyQueueHandler, форматирование и запись в потоке
+    TruncatingQueueListener.
+Замеряется время самого вызова логгера; в конце проверяется, что в файл
+попали все сообщения.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_logging.py
+"""
+
+import logging
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.overall_work import LazyQueueHandler, TruncatingQueueListener
+
+RECORDS = 2000
+SLOW_EVERY = 100
+SLOW_HOLD = 0.05
+PAYLOAD = {
+    "timestamp": "2024-01-01T00:00:00",
+    "data": {"IP": "192.168.1.204", **{f"R{i:03d}": i * 7 for i in range(65, 165)}},
+}
+
+
+class SlowFileHandler(logging.FileHandler):
+    """Файл, запись в который периодически задерживается."""
+
+    def emit(self, record):
+        super().emit(record)
+        self.count = getattr(self, "count", 0) + 1
+        if self.count % SLOW_EVERY == 0:
+            time.sleep(SLOW_HOLD)
+
+
+def run(name, path, use_queue):
+    logger = logging.getLogger(f"bench.{name}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    file_handler = SlowFileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    )
+    listener = None
+    if use_queue:
+        log_queue = queue.Queue(maxsize=RECORDS)
+        listener = TruncatingQueueListener(log_queue, file_handler)
+        listener.start()
+        logger.addHandler(LazyQueueHandler(log_queue))
+    else:
+        logger.addHandler(file_handler)
+
+    latencies = []
+    for _ in range(RECORDS):
+        t = time.perf_counter()
+        if use_queue:
+            logger.info("Данные успешно отправлены: %s", PAYLOAD)
+        else:
+            logger.info(f"Данные успешно отправлены: {PAYLOAD}")
+        latencies.append(time.perf_counter() - t)
+
+    if listener:
+        listener.stop()
+    file_handler.close()
+    with open(path, encoding="utf-8") as f:
+        assert sum(1 for _ in f) == RECORDS
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+        "max": latencies[-1] * 1000,
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, use_queue in (("Прежний путь", False), ("Очередь", True)):
+            result = run(name, f"{tmp}/{use_queue}.log", use_queue)
+            print(
+                f"{name:>13}: p50 {result['p50']:7.3f} мс, "
+                f"p99 {result['p99']:7.3f} мс, max {result['max']:7.3f} мс"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Восстановление данных из логов в базу: прежний путь и потоковый разбор.
+
+Генерирует FILES файлов лога по LINES строк "Данные успешно отправлены"
+(запись на 100 регистров), половину — zip-архивами, как в logs/archive.
+  - прежний путь: распаковка архивов, чтение файла целиком в список,
+    ast.literal_eval на каждую строку, INSERT по одной записи;
+  - parser_log.save_to_db: чтение архивов без распаковки, быстрый разбор,
+    пул процессов по файлам, executemany одной транзакцией.
+Проверяется, что в базах одинаковые записи, а повторный запуск не добавляет
+повторов.
+
+Запуск из корня проекта:
+    python benchmarks/bench_parser_log.py
+"""
+
+import ast
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import parser_log
+
+FILES = 4
+LINES = 5000
+
+
+def make_line(day, i):
+    data = {"IP": "192.168.1.204"}
+    for k in range(65, 165):
+        data[f"R{k:03d}"] = random.randint(-5, 5000)
+    data["R070"] = random.choice(["-9999.00", "12.50"])
+    payload = {"timestamp": f"2025-03-{day:02d}T10:00:00.{i:06d}", "data": data}
+    return f"2025-03-{day:02d} 10:00:00,000 - INFO - Данные успешно отправлены: {payload}\n"
+
+
+def make_logs(tmp):
+    random.seed(1)
+    files = []
+    for n in range(FILES):
+        day = 10 + n
+        text = "".join(make_line(day, i) for i in range(LINES))
+        path = os.path.join(tmp, f"modbus_data.log.2025-03-{day:02d}")
+        if n % 2:
+            path += ".zip"
+            with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
+                zipf.writestr(f"modbus_data_2025-03-{day:02d}.log", text)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        files.append(path)
+    return files
+
+
+def legacy(files, db_path):
+    """Прежний parser_log: распаковка, literal_eval, INSERT по одной записи."""
+    pattern = re.compile(r"Данные успешно отправлены: ({.*})")
+    entries = []
+    for path in files:
+        if path.endswith(".zip"):
+            with zipfile.ZipFile(path) as zipf:
+                name = zipf.namelist()[0]
+                zipf.extract(name, os.path.dirname(db_path))
+                path = os.path.join(os.path.dirname(db_path), name)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                match = pattern.search(line)
+                if match:
+                    entries.append(ast.literal_eval(match.group(1)))
+    parser_log.init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    for entry in entries:
+        cleaned_data = parser_log.clean_data(entry.get("data", {}))
+        conn.execute(
+            "INSERT INTO data_queue (timestamp, data) VALUES (?, ?)",
+            (entry.get("timestamp"), json.dumps(cleaned_data)),
+        )
+    conn.commit()
+    conn.close()
+
+
+def rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute("SELECT timestamp, data FROM data_queue"))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_logs(tmp)
+        legacy_db = os.path.join(tmp, "legacy.db")
+        start = time.perf_counter()
+        legacy(files, legacy_db)
+        legacy_elapsed = time.perf_counter() - start
+
+        db_path = os.path.join(tmp, "clean.db")
+        parser_log.init_db(db_path)
+        start = time.perf_counter()
+        inserted, _, _ = parser_log.save_to_db(files, db_path)
+        elapsed = time.perf_counter() - start
+        assert inserted == FILES * LINES
+        assert rows(db_path) == rows(legacy_db), "Записи в базах не совпадают"
+        assert parser_log.save_to_db(files, db_path)[:2] == (0, FILES * LINES)
+
+        total = FILES * LINES
+        print(
+            f"Прежний путь: {legacy_elapsed:.2f} с ({total / legacy_elapsed:.0f} записей/с)"
+        )
+        print(
+            f"Потоковый разбор ({os.cpu_count()} ядер): {elapsed:.2f} с "
+            f"({total / elapsed:.0f} записей/с)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Размер базы очереди при разных форматах хранения записей.
+
+В очередь ставится RECORDS записей устройства со 100 регистрами, значения
+которых медленно меняются (как счетчики и уставки на реальной линии).
+Сравниваются размеры файла базы: прежний JSON-текст, компактный формат
+PayloadCodec и компактный формат со сжатием zlib и обученным словарем.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_payload_storage.py
+"""
+
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.payload_codec import PayloadCodec
+
+RECORDS = 20000
+
+
+def make_records():
+    random.seed(1)
+    values = {f"R{i:03d}": random.randint(0, 3000) for i in range(65, 165)}
+    records = []
+    for _ in range(RECORDS):
+        for key in random.sample(list(values), 10):
+            values[key] += random.randint(-3, 3)
+        records.append(
+            {"IP": "192.168.1.204", **{k: str(v) for k, v in values.items()}}
+        )
+    return records
+
+
+def store(db_name, records, compression=None):
+    conn = sqlite3.connect(db_name)
+    conn.execute(
+        "CREATE TABLE data_queue (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "data TEXT NOT NULL, timestamp TEXT NOT NULL)"
+    )
+    codec = (
+        PayloadCodec(conn, compression=compression) if compression != "json" else None
+    )
+    with conn:
+        for record in records:
+            data = json.dumps(record) if codec is None else codec.encode(record)
+            conn.execute(
+                "INSERT INTO data_queue (data, timestamp) VALUES (?, ?)",
+                (data, "2024-01-01T00:00:00.000000"),
+            )
+        if codec is not None:
+            # Проверка, что записи раскодируются без потерь
+            stored = [row[0] for row in conn.execute("SELECT data FROM data_queue")]
+            assert [codec.decode(row) for row in stored] == records
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(db_name)
+
+
+def main():
+    records = make_records()
+    with tempfile.TemporaryDirectory() as tmp:
+        sizes = {
+            name: store(f"{tmp}/{name}.db", records, compression)
+            for name, compression in (
+                ("JSON", "json"),
+                ("Компактный", None),
+                ("Компактный + zlib", "zlib"),
+            )
+        }
+    for name, size in sizes.items():
+        print(
+            f"{name:>18}: {size / 1024 / 1024:7.2f} МБ, {size / RECORDS:7.1f} байт/запись, "
+            f"в {sizes['JSON'] / size:4.1f} раза меньше JSON"
+        )
+
+
+if __name__ == "__main__":
+    main()
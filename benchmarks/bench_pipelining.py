@@ -0,0 +1,130 @@
+"""Конвейерная отправка запросов Modbus TCP на канале с задержкой.
+
+Тестовый сервер отвечает на чтение регистров через LATENCY секунд.
+  - BLOCKS блоков последовательно (AsyncModbusTcpClient) и конвейером
+    PipelinedModbusTcpClient глубиной DEPTH;
+  - сервер, который отвечает только на первый запрос конвейера, а
+    остальные кадры молча отбрасывает: клиент должен перейти в
+    последовательный режим на первом же таймауте, а следующий цикл после
+    переподключения — пройти без ошибок.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_pipelining.py
+"""
+
+import asyncio
+import struct
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.connection_manager import ConnectionManager
+from utils.request_planner import RequestPlanner, read_planned
+
+LATENCY = 0.05
+BLOCKS = 20
+DEPTH = 8
+TIMEOUT = 0.5
+MBAP = struct.Struct(">HHHB")
+
+
+def make_server(drop_pipelined):
+    """Обработчик соединения тестового сервера."""
+
+    async def handle(reader, writer):
+        busy = 0  # Запросов, ответ на которые еще не отправлен
+
+        async def reply(tid, unit, address, count):
+            nonlocal busy
+            await asyncio.sleep(LATENCY)
+            data = struct.pack(f">{count}H", *range(address, address + count))
+            pdu = bytes([0x03, len(data)]) + data
+            writer.write(MBAP.pack(tid, 0, len(pdu) + 1, unit) + pdu)
+            busy -= 1
+
+        try:
+            while True:
+                tid, _, length, unit = MBAP.unpack(await reader.readexactly(7))
+                pdu = await reader.readexactly(length - 1)
+                if drop_pipelined and busy:
+                    continue  # Устройство не умеет конвейер: кадр теряется
+                _, address, count = struct.unpack(">BHH", pdu)
+                busy += 1
+                asyncio.create_task(reply(tid, unit, address, count))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    return handle
+
+
+def make_planner():
+    return RequestPlanner([(i * 200, 10) for i in range(BLOCKS)])
+
+
+async def poll(connections, ip):
+    """Цикл опроса как в AsyncModbusPoller: при ошибке соединение пересоздается."""
+    client = connections.get(ip)
+    start = time.perf_counter()
+    registers, failed = await read_planned(
+        client, make_planner(), retries=3, delay=0.1, slave=1
+    )
+    elapsed = time.perf_counter() - start
+    if failed:
+        connections.mark_broken(ip)
+    return registers, failed, elapsed
+
+
+async def wait_connected(connections, ip):
+    while connections.get(ip) is None:
+        await asyncio.sleep(0.01)
+
+
+async def run(depth, drop_pipelined=False, cycles=1):
+    server = await asyncio.start_server(make_server(drop_pipelined), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    connections = ConnectionManager(
+        ["127.0.0.1"],
+        port,
+        timeout=TIMEOUT,
+        reconnect_delay=0.01,
+        pipeline_depth=depth,
+    )
+    await connections.start()
+    results = []
+    try:
+        for _ in range(cycles):
+            await wait_connected(connections, "127.0.0.1")
+            results.append(await poll(connections, "127.0.0.1"))
+    finally:
+        connections.close()
+        await asyncio.sleep(0.1)  # Обработчики сервера видят закрытие соединений
+        server.close()
+        await server.wait_closed()
+    return results, connections.pipeline_depth["127.0.0.1"]
+
+
+async def main():
+    expected = {i * 200: list(range(i * 200, i * 200 + 10)) for i in range(BLOCKS)}
+    for name, depth in (("Последовательно", 0), (f"Конвейер {DEPTH}", DEPTH)):
+        (result,), _ = await run(depth)
+        registers, failed, elapsed = result
+        assert registers == expected and not failed, failed
+        print(f"{name:>16}: {BLOCKS} блоков за {elapsed * 1000:6.0f} мс")
+
+    # Сервер отвечает только на первый кадр конвейера
+    (first, second), depth = await run(4, drop_pipelined=True, cycles=2)
+    assert depth == 1, "Клиент не перешел в последовательный режим"
+    registers, failed, elapsed = second
+    assert registers == expected and not failed, failed
+    print(
+        f"Без поддержки конвейера: первый цикл {first[2]:.2f} с "
+        f"(не прочитано блоков {len(first[1])}), после перехода в "
+        f"последовательный режим {elapsed:.2f} с без ошибок"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
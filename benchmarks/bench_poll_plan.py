@@ -0,0 +1,98 @@
+"""Микробенчмарк разбора ответа устройства на 100 регистров за один цикл опроса.
+
+Сравнивает прежний путь (сборка addresses_to_read из конфигурации, литерал
+bit_labels и f-строка ключа на каждый регистр) с заранее собранным PollPlan.
+PollPlan оставляет значения числами; прежний строковый вид (to_wire) должен
+совпасть с результатом прежнего пути.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_poll_plan.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.poll_plan import PollPlan
+from utils.sample_types import to_wire
+
+# Устройство: два аварийных слова и 100 регистров данных в четырех диапазонах
+REQUEST_SETTINGS = [
+    {"address": 14, "count": 1},
+    {"address": 15, "count": 1},
+    {"address": 65, "count": 25},
+    {"address": 90, "count": 25},
+    {"address": 115, "count": 25},
+    {"address": 140, "count": 25},
+]
+BIT_LABELS = {
+    14: list(range(440, 424, -1)),
+    15: list(range(456, 440, -1)),
+}
+RESPONSES = {
+    req["address"]: [
+        (req["address"] * 37 + i * 911) & 0xFFFF for i in range(req["count"])
+    ]
+    for req in REQUEST_SETTINGS
+}
+CONFIG = {"request_settings": REQUEST_SETTINGS}
+
+
+def convert_to_signed(value):
+    return value if value < 32768 else value - 65536
+
+
+def legacy_cycle():
+    """Прежний путь из energycenter/main.py."""
+    collected_data = {}
+    collected_alarm = {}
+    addresses_to_read = [
+        (req["address"], req["count"]) for req in CONFIG["request_settings"]
+    ]
+    for address, count in addresses_to_read:
+        registers = RESPONSES[address]
+        if address == 14 or address == 15:
+            bit_labels = {
+                14: [440, 439, 438, 437, 436, 435, 434, 433]
+                + [432, 431, 430, 429, 428, 427, 426, 425],
+                15: [456, 455, 454, 453, 452, 451, 450, 449]
+                + [448, 447, 446, 445, 444, 443, 442, 441],
+            }
+            value = registers[0]
+            for i, bit_label in enumerate(bit_labels[address]):
+                bit_value = (value >> (15 - i)) & 0x01
+                collected_alarm[f"{bit_label}"] = "Сообщение" if bit_value else "ОК"
+        else:
+            for i, reg_value in enumerate(registers):
+                signed_value = convert_to_signed(reg_value)
+                register = f"R{address + i:03d}"
+                collected_data[register] = str(signed_value)
+    return collected_data, collected_alarm
+
+
+plan = PollPlan(REQUEST_SETTINGS, bit_labels=BIT_LABELS, bit_order="msb")
+
+
+def plan_cycle():
+    """Путь через PollPlan: только разрезать и разложить по готовым ключам."""
+    collected_data = {}
+    collected_alarm = {}
+    plan.apply(RESPONSES, collected_data, collected_alarm)
+    return collected_data, collected_alarm
+
+
+def main():
+    data, alarm = plan_cycle()
+    assert legacy_cycle() == (to_wire(data), alarm), "Результаты разбора не совпадают"
+
+    number = 20000
+    for name, func in (("Прежний путь", legacy_cycle), ("PollPlan", plan_cycle)):
+        best = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f"{name:>14}: {best * 1e6:8.2f} мкс на цикл")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Задержка save_to_db для цикла опроса при медленном диске.
+
+Поток, как поток отправки на медленной SD-карте, периодически держит
+соединение записи DataQueueManager (SLOW_HOLD секунд каждые SLOW_EVERY).
+Основной поток, как цикл опроса, ставит RECORDS записей каждые PERIOD секунд
+и замеряет время вызова save_to_db:
+  - прямая запись: INSERT и commit в вызывающем потоке (прежний путь);
+  - буфер: добавление в буфер, в базу пишет поток записи (group commit).
+В конце проверяется, что все записи буфера попали в базу после close().
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_queue_buffer.py
+"""
+
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.DataQueueManager import DataQueueManager
+
+RECORDS = 1000
+PERIOD = 0.002
+SLOW_HOLD = 0.05
+SLOW_EVERY = 0.2
+SAMPLE = {"IP": "192.168.1.204", **{f"R{i:03d}": str(i * 7) for i in range(65, 165)}}
+
+
+class BenchQueueManager(DataQueueManager):
+    """DataQueueManager без собственного потока отправки."""
+
+    def _start_sending_thread(self):
+        pass
+
+
+class DirectQueueManager(BenchQueueManager):
+    """Прежний путь: запись в базу в потоке, вызвавшем save_to_db."""
+
+    def save_to_db(self, data):
+        self._write_records([(self.default_topic, data, datetime.now().isoformat())])
+
+
+def run(queue):
+    stop = threading.Event()
+
+    def slow_disk():
+        while not stop.wait(SLOW_EVERY):
+            with queue.lock:
+                time.sleep(SLOW_HOLD)
+
+    holder = threading.Thread(target=slow_disk, daemon=True)
+    holder.start()
+    latencies = []
+    for _ in range(RECORDS):
+        t = time.perf_counter()
+        queue.save_to_db(SAMPLE)
+        latencies.append(time.perf_counter() - t)
+        time.sleep(PERIOD)
+    stop.set()
+    holder.join()
+    queue.close()
+
+    with sqlite3.connect(queue.db_name) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM data_queue").fetchone()[0]
+    assert stored == RECORDS, stored
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+        "max": latencies[-1] * 1000,
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, queue_class in (
+            ("Прямая запись", DirectQueueManager),
+            ("Буфер", BenchQueueManager),
+        ):
+            result = run(queue_class(db_name=f"{tmp}/{queue_class.__name__}.db"))
+            print(
+                f"{name:>14}: p50 {result['p50']:7.3f} мс, "
+                f"p99 {result['p99']:7.3f} мс, max {result['max']:7.3f} мс"
+            )
+
+
+if __name__ == "__main__":
+    main()
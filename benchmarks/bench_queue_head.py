@@ -0,0 +1,109 @@
+"""Скорость выборки из очереди DataQueueManager при большом накопленном объеме.
+
+Очередь заполняется ROWS записями (по умолчанию 1 000 000, как после долгого
+отсутствия связи), затем измеряется скорость "взять самую старую запись и
+подтвердить отправку":
+  - прежний путь: ORDER BY timestamp LIMIT 1 (полное сканирование без индекса)
+    и DELETE по id;
+  - курсор по id: выборка id > курсор по первичному ключу и подтверждение
+    через курсор с удалением диапазонами.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_queue_head.py [ROWS]
+"""
+
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.DataQueueManager import DataQueueManager
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+DURATION = 5  # Секунд на каждый путь
+DATA = '{"IP": "192.168.1.204", "R065": "895", "R066": "170", "R067": "783"}'
+
+
+class BenchQueueManager(DataQueueManager):
+    """DataQueueManager без собственного потока отправки."""
+
+    def _start_sending_thread(self):
+        pass
+
+
+def fill(db_name):
+    with sqlite3.connect(db_name) as conn:
+        conn.execute(
+            "CREATE TABLE data_queue (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "data TEXT NOT NULL, timestamp TEXT NOT NULL)"
+        )
+        conn.executemany(
+            "INSERT INTO data_queue (data, timestamp) VALUES (?, ?)",
+            ((DATA, f"2024-01-01T00:00:00.{i:09d}") for i in range(ROWS)),
+        )
+
+
+def measure(dequeue):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        if not dequeue():
+            break
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def legacy_path(db_name):
+    conn = sqlite3.connect(db_name)
+
+    def dequeue():
+        record = conn.execute(
+            "SELECT id, data, timestamp FROM data_queue ORDER BY timestamp ASC LIMIT 1"
+        ).fetchone()
+        if record is None:
+            return False
+        conn.execute("DELETE FROM data_queue WHERE id = ?", (record[0],))
+        conn.commit()
+        return True
+
+    rate = measure(dequeue)
+    conn.close()
+    return rate
+
+
+def cursor_path(db_name):
+    queue = BenchQueueManager(db_name=db_name)
+
+    def dequeue():
+        record = queue._get_oldest_record()
+        if record is None:
+            return False
+        queue._ack(record[0])
+        return True
+
+    rate = measure(dequeue)
+    queue.close()
+    return rate
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = f"{tmp}/source.db"
+        print(f"Заполнение очереди: {ROWS} записей...")
+        fill(source)
+        for name, path in (
+            ("ORDER BY timestamp", legacy_path),
+            ("Курсор по id", cursor_path),
+        ):
+            db_name = f"{tmp}/{path.__name__}.db"
+            shutil.copy(source, db_name)
+            print(f"{name:>20}: {path(db_name):10.1f} записей/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Объем очереди и время прореживания после длительного отсутствия связи.
+
+Имитирует DAYS суток без связи: DEVICES устройств раз в PERIOD секунд
+ставят в очередь изменившиеся регистры (как после ChangeFilter). Очередь с
+лимитом MAX_ROWS записей прореживается (RetentionPolicy), затем проверяется,
+что по каждому устройству и регистру в каждом интервале сохранились минимум,
+максимум и последнее значение исходных данных.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_queue_retention.py [DAYS]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.DataQueueManager import DataQueueManager
+from utils.retention import RetentionPolicy
+
+DAYS = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+DEVICES = 10
+PERIOD = 10
+MAX_ROWS = 100_000
+RETENTION = {"max_rows": MAX_ROWS, "bucket_seconds": 300}
+
+
+class BenchQueueManager(DataQueueManager):
+    """DataQueueManager без собственного потока отправки."""
+
+    def _start_sending_thread(self):
+        pass
+
+
+def make_records():
+    random.seed(1)
+    start = datetime(2024, 1, 1)
+    values = {
+        ip: {f"R{i:03d}": random.randint(0, 3000) for i in range(65, 165)}
+        for ip in (f"192.168.1.{200 + n}" for n in range(DEVICES))
+    }
+    for step in range(int(DAYS * 86400 / PERIOD)):
+        timestamp = (start + timedelta(seconds=step * PERIOD)).isoformat()
+        for ip, registers in values.items():
+            changed = {}
+            for key in random.sample(list(registers), 10):
+                registers[key] += random.randint(-5, 5)
+                changed[key] = str(registers[key])
+            yield {"IP": ip, **changed}, timestamp
+
+
+def extremes(records, bucket_seconds):
+    """(устройство, интервал, регистр) -> (min, max, last)."""
+    result = {}
+    for data, timestamp in records:
+        bucket = RetentionPolicy.bucket_of(timestamp, bucket_seconds)
+        for key, value in data.items():
+            if key == "IP":
+                continue
+            number = int(value)
+            low, high, _ = result.get((data["IP"], bucket, key), (number, number, 0))
+            result[(data["IP"], bucket, key)] = (
+                min(low, number),
+                max(high, number),
+                number,
+            )
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = BenchQueueManager(
+            db_name=f"{tmp}/queue.db",
+            topics={
+                "data": {"server_url": "http://localhost/", "retention": RETENTION}
+            },
+        )
+        source = list(make_records())
+        for i in range(0, len(source), 10000):
+            queue._write_records(
+                [(queue.default_topic, data, ts) for data, ts in source[i : i + 10000]]
+            )
+        with queue.lock:
+            rows, size = queue._queue_size()
+        print(f"До прореживания: {rows} записей, {size / 1024 / 1024:.1f} МБ")
+
+        start = time.perf_counter()
+        queue._enforce_retention()
+        elapsed = time.perf_counter() - start
+        with queue.lock:
+            rows, size = queue._queue_size()
+        print(
+            f"После прореживания: {rows} записей, {size / 1024 / 1024:.1f} МБ "
+            f"(лимит {MAX_ROWS} записей), за {elapsed:.1f} с"
+        )
+
+        conn = sqlite3.connect(queue.db_name)
+        stored = [
+            (queue.codec.decode(data), timestamp)
+            for data, timestamp in conn.execute(
+                "SELECT data, timestamp FROM data_queue ORDER BY id"
+            )
+        ]
+        conn.close()
+        assert [ts for _, ts in stored] == sorted(ts for _, ts in stored)
+        # Самый крупный интервал, до которого могло дойти прореживание
+        bucket_seconds = RETENTION["bucket_seconds"]
+        while extremes(stored, bucket_seconds) != extremes(source, bucket_seconds):
+            bucket_seconds *= 2
+            assert bucket_seconds <= 86400, "min/max/last не сохранились"
+        print(f"min/max/last сохранены для интервала {bucket_seconds} с")
+        queue.close()
+        os.remove(queue.db_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Скорость и задержка постановки в очередь DataQueueManager при одновременной выборке.
+
+Сравнивает прежнюю схему (новое соединение sqlite3 на каждую операцию,
+журнал отката) с долгоживущими соединениями в режиме WAL. Пока основной поток
+ставит записи в очередь, отдельный поток, как поток отправки, забирает самую
+старую запись и подтверждает ее отправку (без HTTP).
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_queue_sqlite.py
+"""
+
+import json
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.DataQueueManager import DataQueueManager
+
+RECORDS = 2000
+SAMPLE = {"IP": "192.168.1.204", **{f"R{i:03d}": str(i * 7) for i in range(65, 165)}}
+
+
+class LegacyQueue:
+    """Прежняя схема: соединение открывается на каждую операцию."""
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS data_queue (id INTEGER PRIMARY KEY "
+                "AUTOINCREMENT, data TEXT NOT NULL, timestamp TEXT NOT NULL)"
+            )
+
+    def save_to_db(self, data):
+        timestamp = datetime.now().isoformat()
+        data_json = json.dumps(data)
+        with self.lock:
+            with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
+                conn.execute(
+                    "INSERT INTO data_queue (data, timestamp) VALUES (?, ?)",
+                    (data_json, timestamp),
+                )
+                conn.commit()
+
+    def _get_oldest_record(self):
+        with self.lock:
+            with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
+                return conn.execute(
+                    "SELECT id, data, timestamp FROM data_queue "
+                    "ORDER BY timestamp ASC LIMIT 1"
+                ).fetchone()
+
+    def _ack(self, record_id):
+        with self.lock:
+            with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
+                conn.execute("DELETE FROM data_queue WHERE id = ?", (record_id,))
+                conn.commit()
+
+
+class BenchQueueManager(DataQueueManager):
+    """DataQueueManager без собственного потока отправки."""
+
+    def _start_sending_thread(self):
+        pass
+
+
+def run(queue):
+    stop = threading.Event()
+    drained = 0
+
+    def drain():
+        nonlocal drained
+        while not stop.is_set():
+            record = queue._get_oldest_record()
+            if record is None:
+                time.sleep(0.001)
+                continue
+            queue._ack(record[0])
+            drained += 1
+
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(RECORDS):
+        t = time.perf_counter()
+        queue.save_to_db(SAMPLE)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    # Ждем, пока поток отправки выберет все записи (буфер пишется в фоне)
+    deadline = time.monotonic() + 30
+    while drained < RECORDS and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop.set()
+    drainer.join()
+
+    latencies.sort()
+    return {
+        "rate": RECORDS / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+        "drained": drained,
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        queues = (
+            ("Соединение на операцию", LegacyQueue(f"{tmp}/legacy.db")),
+            ("WAL, постоянные", BenchQueueManager(db_name=f"{tmp}/wal.db")),
+        )
+        for name, queue in queues:
+            result = run(queue)
+            print(
+                f"{name:>24}: {result['rate']:8.0f} записей/с, "
+                f"p50 {result['p50']:6.3f} мс, p99 {result['p99']:6.3f} мс, "
+                f"выбрано потоком отправки {result['drained']}"
+            )
+            if isinstance(queue, DataQueueManager):
+                queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Число RTU-транзакций за цикл опроса RC/pr103 до и после объединения адресов.
+
+Прежний путь читает каждый адрес register_data отдельным запросом count=1,
+новый — блоками RequestPlanner. Оба пути выполняются на симуляторе pymodbus
+с RTU-кадрами (по TCP, чтобы не нужен был последовательный порт), результаты
+сравниваются. Кроме времени на симуляторе выводится оценка времени линии на
+9600 бод: байты запросов и ответов плюс пауза 3.5 символа между кадрами.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_rc_span_reads.py
+"""
+
+import asyncio
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавляем корень проекта и RC/pr103 (register_data) в PYTHONPATH
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "RC" / "pr103"))
+
+from pymodbus import FramerType
+from pymodbus.client import ModbusTcpClient
+from pymodbus.datastore import (
+    ModbusSequentialDataBlock,
+    ModbusServerContext,
+    ModbusSlaveContext,
+)
+from pymodbus.server import StartAsyncTcpServer
+
+from register_data import register_data
+from utils.request_planner import RequestPlanner, read_planned_sync
+
+SLAVE_ID = 16
+BAUD_RATE = 9600
+BITS_PER_CHAR = 10  # 8N1: старт + 8 бит + стоп
+
+
+class CountingClient:
+    """Обертка клиента: считает транзакции и байты RTU-кадров."""
+
+    def __init__(self, client):
+        self.client = client
+        self.transactions = 0
+        self.frame_bytes = 0
+
+    def read_holding_registers(self, address, count=1, slave=1):
+        self.transactions += 1
+        # Запрос: адрес, функция, адрес, количество, CRC — 8 байт;
+        # ответ: адрес, функция, счетчик байт, данные, CRC — 5 + 2*count байт
+        self.frame_bytes += 8 + 5 + 2 * count
+        return self.client.read_holding_registers(
+            address=address, count=count, slave=slave
+        )
+
+    def line_time(self):
+        """Оценка времени линии на BAUD_RATE, с."""
+        char_time = BITS_PER_CHAR / BAUD_RATE
+        return (self.frame_bytes + 2 * 3.5 * self.transactions) * char_time
+
+
+def start_simulator():
+    """Запуск RTU-симулятора в фоновом потоке. Возвращает порт."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    block = ModbusSequentialDataBlock(16384, [i * 7 for i in range(200)])
+    context = ModbusServerContext(
+        slaves={SLAVE_ID: ModbusSlaveContext(hr=block, zero_mode=True)}, single=False
+    )
+    threading.Thread(
+        target=lambda: asyncio.run(
+            StartAsyncTcpServer(
+                context, address=("127.0.0.1", port), framer=FramerType.RTU
+            )
+        ),
+        daemon=True,
+    ).start()
+    time.sleep(0.5)
+    return port
+
+
+def legacy_cycle(client):
+    """Прежний путь: отдельный запрос на каждую линию каждой группы."""
+    collected_data = {}
+    for group, lines in register_data.items():
+        collected_data[group] = {}
+        for line, address in lines.items():
+            response = client.read_holding_registers(
+                address=address, count=1, slave=SLAVE_ID
+            )
+            collected_data[group][line] = response.registers[0]
+    return collected_data
+
+
+planner = RequestPlanner(
+    [(address, 1) for lines in register_data.values() for address in lines.values()],
+    max_gap=16,
+)
+
+
+def span_cycle(client):
+    """Новый путь: блочные запросы и раскладка по группам и линиям."""
+    registers_by_address, _ = read_planned_sync(
+        client, planner, retries=1, slave=SLAVE_ID
+    )
+    return {
+        group: {
+            line: registers_by_address.get(address, [0])[0]
+            for line, address in lines.items()
+        }
+        for group, lines in register_data.items()
+    }
+
+
+def main():
+    port = start_simulator()
+    client = ModbusTcpClient("127.0.0.1", port=port, framer=FramerType.RTU)
+    client.connect()
+
+    results = []
+    for name, cycle in (("Прежний путь", legacy_cycle), ("Блоки", span_cycle)):
+        counter = CountingClient(client)
+        start = time.perf_counter()
+        results.append(cycle(counter))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>14}: {counter.transactions:3d} транзакций за цикл, "
+            f"{counter.frame_bytes:5d} байт, ~{counter.line_time():.2f} с на "
+            f"{BAUD_RATE} бод, на симуляторе {elapsed * 1000:.1f} мс"
+        )
+    client.close()
+
+    assert results[0] == results[1], "Результаты чтения не совпадают"
+
+
+if __name__ == "__main__":
+    main()
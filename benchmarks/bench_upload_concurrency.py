@@ -0,0 +1,101 @@
+"""Скорость выгрузки очереди при одновременной отправке на канале с задержкой.
+
+Локальный HTTP-сервер отвечает с задержкой RTT секунд (как сервер приема за
+мобильным каналом). Очередь из RECORDS записей выгружается целиком при разном
+"upload_concurrency", по одной записи и пачками по BATCH записей. Сервер
+проверяет, что каждая запись получена, а курсор очереди в конце указывает
+на последнюю запись.
+
+Запуск из корня проекта (нужен config.json для utils.overall_work):
+    python benchmarks/bench_upload_concurrency.py
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.overall_work import config
+
+RECORDS = 400
+BATCH = 20
+RTT = 0.1
+CONCURRENCY = (1, 2, 4, 8)
+
+# Пул соединений должен вмещать все одновременные отправки
+config["http_pool_maxsize"] = max(CONCURRENCY)
+
+from utils.DataQueueManager import DataQueueManager
+
+received = []
+received_lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(RTT)
+        with received_lock:
+            received.extend(body if isinstance(body, list) else [body])
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchQueueManager(DataQueueManager):
+    """DataQueueManager без собственного потока отправки."""
+
+    def _start_sending_thread(self):
+        pass
+
+
+def run(tmp, url, concurrency, batch_size):
+    config["upload_concurrency"] = concurrency
+    config["batch_size"] = batch_size
+    config["batch_latency_target"] = 10  # Пачка не уменьшается из-за RTT
+    queue = BenchQueueManager(
+        db_name=f"{tmp}/c{concurrency}_b{batch_size}.db", server_url=url
+    )
+    for i in range(RECORDS):
+        queue.save_to_db({"IP": "192.168.1.204", "N": str(i)})
+    time.sleep(0.5)  # Буфер записан в базу
+    received.clear()
+    topic = queue._topic()
+    topic.batch_size = max(1, batch_size)
+    start = time.perf_counter()
+    while queue._send_next():
+        pass
+    elapsed = time.perf_counter() - start
+    numbers = sorted(int(record[topic.name]["N"]) for record in received)
+    assert numbers == list(range(RECORDS)), "получены не все записи"
+    assert queue._get_oldest_record() is None
+    queue.close()
+    return RECORDS / elapsed
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size, name in ((0, "по одной"), (BATCH, f"пачки по {BATCH}")):
+            for concurrency in CONCURRENCY:
+                rate = run(tmp, url, concurrency, batch_size)
+                print(f"{name:>13}, одновременно {concurrency}: {rate:8.1f} записей/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,256 +1,181 @@
-from pymodbus.client import ModbusTcpClient
-from pymodbus.exceptions import ModbusException
-import time
+import asyncio
 
 from utils.tg_alarm import notify_server
-from utils.overall_work import config, logger
+from utils.overall_work import config, logger, get_device_setting
 from utils.DataQueueManager import DataQueueManager
+from utils.async_poller import AsyncModbusPoller
+from utils.request_planner import read_planned
+from utils.poll_plan import build_group_plans
+from utils.change_filter import ChangeFilter
 
 data_server = config["server_url"]
 alarm_server = config["server_url_alarm"]
 config_test = config["config_test"]
 
 
-# data.db и alarm.db обязательно называть таким образом для сервера приема
-qm_data = DataQueueManager(
-    db_name="data.db",
-    server_url=data_server,
+# Темы data и alarm обязательно называть таким образом для сервера приема.
+# Аварии уходят раньше накопленных данных и не прореживаются (без retention);
+# неотправленные записи прежних data.db и alarm.db переносятся при запуске.
+queue = DataQueueManager(
+    db_name="queue.db",
+    topics={
+        "alarm": {
+            "server_url": alarm_server,
+            "priority": 0,
+            "import_from": "alarm.db",
+        },
+        "data": {
+            "server_url": data_server,
+            "priority": 1,
+            "retention": config.get("retention"),
+            "import_from": "data.db",
+        },
+    },
 )
-qm_alarm = DataQueueManager(
-    db_name="alarm.db",
-    server_url=alarm_server,
+
+
+# Отправка по изменению: в очередь уходят только изменившиеся значения
+# (с зоной нечувствительности), раз в keyframe_minutes — полный снимок
+data_filter = ChangeFilter.from_config(config.get("report_by_exception"))
+# Аварийные биты сравниваются без зоны нечувствительности
+alarm_filter = ChangeFilter.from_config(
+    config.get("report_by_exception"), use_deadband=False
 )
 
 
-def convert_to_signed(value):
-    """Преобразует беззнаковое 16-битное значение в знаковое."""
-    return value if value < 32768 else value - 65536
+# Метки аварийных битов для адресов 14 и 15 (первая метка — старший бит)
+BIT_LABELS = {
+    14: [
+        440,
+        439,
+        438,
+        437,
+        436,
+        435,
+        434,
+        433,
+        432,
+        431,
+        430,
+        429,
+        428,
+        427,
+        426,
+        425,
+    ],
+    15: [
+        456,
+        455,
+        454,
+        453,
+        452,
+        451,
+        450,
+        449,
+        448,
+        447,
+        446,
+        445,
+        444,
+        443,
+        442,
+        441,
+    ],
+}
+
+# Планы опроса по группам запросов (поле "group") собираются один раз при запуске
+poll_plans = build_group_plans(
+    config["request_settings"],
+    bit_labels=BIT_LABELS,
+    bit_order="msb",
+    max_gap=config.get("max_register_gap", 8),
+)
 
 
-def read_modbus_data(client, addresses, retries=3, delay=5, ip=None):
+async def read_modbus_data(client, plan, retries=3, delay=5, ip=None):
     """Чтение данных Modbus с накоплением и отправкой в один пакет."""
     collected_data = {}  # Словарь для накопления данных
     collected_alarm = {}  # Словарь для накопления данных
-    error_flag = False  # Флаг ошибки для текущего клиента
-
-    for (
-        address,
-        count,
-    ) in addresses:  # Адреса и количество регистров в виде списка кортежей
-        for attempt in range(retries):
-            try:
-                response = client.read_holding_registers(address=address, count=count)
-
-                if response.isError():
-                    # logger.error(
-                    #     f"Ошибка при чтении регистров с адреса {address}: {response}"
-                    # )
-                    continue  # Попробуем снова, если была ошибка
-                else:
-                    if ip:
-                        collected_data["IP"] = ip
-                        collected_alarm["IP"] = ip
-
-                    if address == 14 or address == 15:
-                        # Определяем битовые метки для адресов 14 и 15
-                        bit_labels = {
-                            14: [
-                                440,
-                                439,
-                                438,
-                                437,
-                                436,
-                                435,
-                                434,
-                                433,
-                                432,
-                                431,
-                                430,
-                                429,
-                                428,
-                                427,
-                                426,
-                                425,
-                            ],
-                            15: [
-                                456,
-                                455,
-                                454,
-                                453,
-                                452,
-                                451,
-                                450,
-                                449,
-                                448,
-                                447,
-                                446,
-                                445,
-                                444,
-                                443,
-                                442,
-                                441,
-                            ],
-                        }
-
-                        value = response.registers[0]
-                        print(f"Значение регистра R{address:03d}: {value:016b}")
 
-                        # Парсинг битовых данных
-                        for i, bit_label in enumerate(bit_labels[address]):
-                            bit_value = (
-                                value >> (15 - i)
-                            ) & 0x01  # Сдвиг и маскирование
-                            collected_alarm[f"{bit_label}"] = (
-                                "Сообщение" if bit_value else "ОК"
-                            )
+    # Чтение объединенными блоками, ответы разрезаются по адресам из конфигурации
+    registers_by_address, failed = await read_planned(
+        client, plan.planner(ip), retries=retries, delay=delay
+    )
+    error_flag = bool(failed)  # Флаг ошибки для текущего клиента
 
-                    else:
-                        # Чтение регистров и добавление в словарь для остальных адресов
-                        for i, reg_value in enumerate(response.registers):
-                            signed_value = convert_to_signed(reg_value)
-                            register = f"R{address + i:03d}"
-                            collected_data[register] = str(
-                                signed_value
-                            )  # Добавляем значение регистра в collected_data
+    if ip and registers_by_address:
+        collected_data["IP"] = ip
+        collected_alarm["IP"] = ip
 
-                    break  # Успешное чтение завершено, выходим из цикла попыток
-
-            except ModbusException as e:
-                logger.error(f"Ошибка Modbus при чтении с адреса {address}: {e}")
-
-            # Если не получилось, подождем и сделаем еще одну попытку
-            if attempt < retries - 1:
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}...")
-                time.sleep(delay)
-
-        else:
-            # Если после всех попыток не получилось, сообщаем об ошибке
-            logger.error(
-                f"Не удалось получить данные с адреса {address} после {retries} попыток."
-            )
-            error_flag = True  # Устанавливаем флаг ошибки для клиента
+    # Раскладываем значения по заранее подготовленным ключам
+    plan.apply(registers_by_address, collected_data, collected_alarm)
 
     # После опроса всех адресов отправляем собранные данные
     if config_test:
         logger.info(f"Collected Data: {collected_data}")
         logger.info(f"Collected Alarm: {collected_alarm}")
     else:
-        # Отправка данных на сервер
-        qm_data.save_to_db(collected_data)
-        qm_alarm.save_to_db(collected_alarm)
+        # Отправка на сервер только изменившихся данных
+        changed_data = data_filter.filter(collected_data)
+        if changed_data:
+            queue.save_to_db(changed_data, topic="data")
+        changed_alarm = alarm_filter.filter(collected_alarm)
+        if changed_alarm:
+            queue.save_to_db(changed_alarm, topic="alarm")
 
     return error_flag  # Возвращаем флаг ошибки
 
 
-def connect_to_modbus_server(ip, port):
-    """
-    Попытка подключения к Modbus-серверу.
-    Возвращает клиент при успешном подключении или None в случае неудачи.
-    """
-    try:
-        client = ModbusTcpClient(ip, port=port, timeout=10)
-        if client.connect():
-            logger.info(f"Соединение с {ip} успешно установлено.")
-            return client
-        else:
-            logger.warning(f"Не удалось установить соединение с сервером {ip}.")
-    except Exception as e:
-        logger.error(f"Ошибка при подключении к {ip}: {e}", exc_info=True)
-    return None
+async def poll_device(client, ip, group):
+    """Опрос всех адресов одного Modbus-сервера. Возвращает флаг ошибки."""
+    plan = poll_plans[group]
+    logger.debug("Чтение данных группы %s с %s: %s", group, ip, plan.planner(ip).plan())
+
+    return await read_modbus_data(
+        client,
+        plan,
+        retries=config.get("retries", 3),
+        delay=config.get("retry_delay", 5),
+        ip=ip,
+    )
+
+
+def poll_groups():
+    """Период и фаза каждой группы запросов из config["poll_groups"]."""
+    return {group: config.get("poll_groups", {}).get(group, {}) for group in poll_plans}
 
 
 def process_modbus_data():
     """
     Основной цикл опроса Modbus-серверов.
-    Для каждого IP:
-      - Пытаемся установить соединение.
+    Все серверы опрашиваются параллельно (не более max_concurrency одновременно):
+      - Если соединения нет – попытка подключения.
       - Если соединение установлено – опрашиваем указанные адреса.
-      - При ошибках или отсутствии соединения – повторная попытка подключения.
+      - При ошибках соединение закрывается и восстанавливается в следующем цикле.
     """
-    # Инициализация словаря клиентов; ключи — IP-адреса, значения — объекты клиентов или None.
-    clients = {ip: None for ip in config["modbus_servers"]}
-
-    # Первоначальное подключение к каждому серверу
-    for ip in clients:
-        clients[ip] = connect_to_modbus_server(ip, config["modbus_port"])
-
+    poller = AsyncModbusPoller(
+        config["modbus_servers"],
+        config["modbus_port"],
+        poll_device,
+        max_concurrency=config.get("max_concurrency", 10),
+        breaker=config.get("circuit_breaker"),
+        # Конвейерная отправка запросов: общее значение или в device_settings
+        pipeline_depth={
+            ip: get_device_setting(ip, "pipeline_depth", 0)
+            for ip in config["modbus_servers"]
+        },
+        timeout=10,
+    )
     try:
-        while True:
-            for ip, client in clients.items():
-                if client is None:
-                    # Попытка повторного подключения
-                    logger.info(
-                        f"Проверка доступности сервера {ip} для повторного подключения..."
-                    )
-                    new_client = connect_to_modbus_server(ip, config["modbus_port"])
-                    if new_client is not None:
-                        logger.info(
-                            f"Соединение с сервером {ip} восстановлено, выполняем опрос."
-                        )
-                        clients[ip] = new_client
-                        client = (
-                            new_client  # сразу используем восстановленное соединение
-                        )
-                    else:
-                        logger.warning(f"Сервер {ip} по-прежнему недоступен.")
-                        continue  # переходим к следующему серверу
-
-                # Если соединение установлено, выполняем опрос
-                try:
-                    # Формирование списка адресов и количества регистров для опроса
-                    addresses_to_read = [
-                        (req["address"], req["count"])
-                        for req in config["request_settings"]
-                    ]
-                    logger.info(f"Чтение данных с {ip}: {addresses_to_read}")
-
-                    error_flag = read_modbus_data(
-                        client,
-                        addresses=addresses_to_read,
-                        retries=config.get("retries", 3),
-                        delay=config.get("retry_delay", 5),
-                        ip=ip,
-                    )
-
-                    if error_flag:
-                        logger.warning(
-                            f"Ошибки при работе с сервером {ip}. Переподключение..."
-                        )
-                        client.close()
-                        clients[ip] = None
-
-                    # Задержка между опросами одного устройства
-                    time.sleep(config["machine_interval"])
-
-                except Exception as e:
-                    logger.error(f"Ошибка при опросе {ip}: {e}", exc_info=True)
-                    if client:
-                        client.close()
-                        logger.info(f"Соединение с {ip} закрыто из-за ошибки.")
-                    clients[ip] = None
-
-            logger.info("Ожидание следующего цикла опроса...")
-            try:
-                notify_server()
-            except Exception as e:
-                logger.error(
-                    f"Ошибка при уведомлении сервера: {e}. Повторная попытка не будет выполнена.",
-                    exc_info=True,
-                )
-            time.sleep(config["polling_interval"])
-
+        asyncio.run(
+            poller.run(
+                config["polling_interval"],
+                on_cycle=notify_server,
+                groups=poll_groups(),
+            )
+        )
     except KeyboardInterrupt:
         logger.info("Опрос остановлен пользователем.")
-    finally:
-        for ip, client in clients.items():
-            if client:
-                try:
-                    client.close()
-                    logger.info(f"Закрыто соединение для клиента {ip}.")
-                except Exception as e:
-                    logger.error(
-                        f"Ошибка при закрытии клиента {ip}: {e}", exc_info=True
-                    )
 
 
 # Основная функция
@@ -1,3 +1,4 @@
+import os
 import sqlite3
 import requests
 import time
@@ -5,9 +6,51 @@ import socket
 import json
 from datetime import datetime
 import threading
-from typing import Dict, Optional, Any
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any
 
-from utils.overall_work import config, logger
+from utils import http_session
+from utils.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN
+from utils.overall_work import config, get_logger
+from utils.payload_codec import PayloadCodec
+from utils.retention import RetentionPolicy
+from utils.sample_types import wire_encoder
+
+logger = get_logger("queue")
+
+
+class QueueTopic:
+    """Тема единой очереди: сервер приема, приоритет и состояние отправки.
+
+    Записи темы уходят на сервер в виде {"timestamp": ..., "<имя темы>": данные}.
+    Меньшее значение priority — более высокий приоритет. concurrency — число
+    одновременных отправок темы (по умолчанию config "upload_concurrency").
+    """
+
+    def __init__(
+        self,
+        name: str,
+        server_url: str,
+        priority: int = 1,
+        retention: Optional[Dict[str, Any]] = None,
+        import_from: Optional[str] = None,
+        concurrency: Optional[int] = None,
+    ):
+        self.name = name
+        self.server_url = server_url
+        self.priority = priority
+        self.retention = RetentionPolicy.from_config(retention)
+        self.import_from = import_from
+        self.concurrency = max(
+            1, int(concurrency or config.get("upload_concurrency", 1))
+        )
+        self.cursor = 0  # id последней отправленной записи темы
+        self.acked_since_purge = 0
+        self.batch_size = 1
+        self.link: Optional[CircuitBreaker] = None  # Общий для тем с одним сервером
+        self.retention_checked = time.monotonic()
 
 
 class DataQueueManager:
@@ -23,115 +66,658 @@ class DataQueueManager:
     3. Отправка:
         Отправка происходит автоматически в фоновом потоке.
         Ничего дополнительно вызывать не нужно.
+
+    Несколько потоков данных (данные и аварии) хранятся в одной базе и
+    отправляются одним потоком: у каждой темы свой сервер приема и приоритет.
+        queue = DataQueueManager(
+            db_name="queue.db",
+            topics={
+                "alarm": {"server_url": alarm_server, "priority": 0},
+                "data": {"server_url": data_server, "priority": 1},
+            },
+        )
+        queue.save_to_db(alarm, topic="alarm")
+    Поток отправки каждый раз берет пачку темы с наивысшим приоритетом, в
+    которой есть записи, поэтому аварии уходят раньше накопленных данных.
+    Параметры темы — см. QueueTopic; "import_from": "alarm.db" переносит
+    неотправленные записи из базы прежнего формата (одна тема на файл) при
+    запуске. Без topics очередь содержит одну тему с именем базы ("data" для
+    data.db) и ведет себя как раньше.
+
+    База открывается один раз в режиме WAL: соединение записи (save_to_db,
+    удаление отправленных записей) и соединение чтения для потока отправки.
+    Запись не блокирует чтение, а подготовленные запросы берутся из кэша
+    sqlite3. Настройки в config.json:
+        "db_synchronous": "NORMAL"      — PRAGMA synchronous (OFF/NORMAL/FULL)
+        "db_wal_autocheckpoint": 1000   — автоматический checkpoint, страниц
+        "db_checkpoint_interval": 300   — checkpoint(TRUNCATE) из потока
+                                          отправки, секунд (0 — выключено)
+
+    Пакетная отправка (если сервер принимает массив записей):
+        "batch_size": 500               — максимальный размер пачки
+                                          (0 или 1 — по одной записи, как раньше)
+        "batch_format": "json"          — "json" (массив) или "ndjson"
+        "batch_latency_target": 2       — время отправки пачки, секунд, выше
+                                          которого пачка уменьшается вдвое
+    Пачка берется в порядке id и удаляется одной транзакцией после ответа 200.
+
+    Очередь упорядочена по монотонному id (AUTOINCREMENT, id не переиспользуются).
+    id последней отправленной записи хранится в таблице queue_cursor, поэтому
+    выборка головы очереди не зависит от ее длины. Отправленные записи
+    удаляются диапазоном id <= курсор раз в "db_purge_every" подтвержденных
+    записей (по умолчанию 1000) и при checkpoint.
+
+    Записи хранятся в компактном двоичном виде (см. PayloadCodec): словарь
+    ключей потока и числа вместо строк. "db_compression": "zlib" включает
+    сжатие со словарем, обученным на первых записях. На сервер уходит тот же
+    JSON, что был передан в save_to_db: числа (int, float, bool) остаются
+    числами. "string_values": true — отправка значений строками в прежнем
+    формате ("895", "23.50", "1"), см. sample_types.wire_encoder.
+
+    save_to_db не обращается к базе: запись с отметкой времени добавляется в
+    ограниченный буфер в памяти, а отдельный поток записи сохраняет буфер
+    одной транзакцией (group commit). Настройки в config.json:
+        "db_flush_interval_ms": 200     — сохранение буфера не реже, мс
+        "db_flush_records": 100         — сохранение раньше, если в буфере
+                                          набралось столько записей
+        "db_buffer_size": 10000         — емкость буфера, записей
+        "db_buffer_overflow": "block"   — при заполненном буфере: "block"
+                                          (ждать записи на диск), "drop_oldest"
+                                          (вытеснить самую старую запись),
+                                          "drop_new" (отбросить новую запись)
+        "db_flush_on_shutdown": true    — при выходе из программы (atexit)
+                                          и в close() сохранить остаток буфера
+
+    Одновременная отправка (для каналов с большой задержкой, например мобильной
+    связи): "upload_concurrency": 4 — до 4 пачек (или записей) темы в пути
+    одновременно; пул соединений "http_pool_maxsize" должен быть не меньше.
+    Подтверждение идет строго по порядку id: курсор сдвигается только за
+    непрерывно отправленное начало очереди, поэтому удаление отправленного
+    корректно, а после сбоя отправка продолжается с курсора в порядке записи.
+    Пачки, отправленные после неудачной, будут отправлены повторно.
+
+    Состояние связи определяется по результатам отправки (CircuitBreaker):
+    пока сервер отвечает, отправка идет без дополнительных проверок сети.
+    После неудачной отправки (все повторы исчерпаны) отправка приостанавливается
+    с экспоненциально растущей задержкой со случайным разбросом; по ее
+    истечении делается одна попытка без повторов. Настройки в config.json:
+        "upload_backoff": {"base_delay": 5, "max_delay": 300, "jitter": 0.2}
+        "upload_probe": "host:port"     — необязательная проверка доступности
+                                          (TCP-подключение) перед пробной
+                                          отправкой; только после ошибок
+
+    retention (секция config["retention"], см. RetentionPolicy) ограничивает
+    объем неотправленной очереди темы: при превышении лимита старые данные
+    прореживаются до min/max/last по регистру за интервал. Проверка идет в
+    потоке записи. Тема аварий создается без retention.
     """
 
+    # Запросы постоянные, поэтому выполняются как подготовленные из кэша sqlite3
+    SQL_INSERT = "INSERT INTO data_queue (topic, data, timestamp) VALUES (?, ?, ?)"
+    # Голова очереди темы — записи после курсора по индексу (topic, id)
+    SQL_HEAD = (
+        "SELECT id, data, timestamp FROM data_queue "
+        "WHERE topic = ? AND id > ? ORDER BY id LIMIT ?"
+    )
+    SQL_ACK = "UPDATE queue_cursor SET last_id = ? WHERE name = ?"
+    SQL_PURGE = "DELETE FROM data_queue WHERE topic = ? AND id <= ?"
+    SQL_PENDING = "SELECT COUNT(*) FROM data_queue WHERE topic = ? AND id > ?"
+    # id записи темы, стоящей через OFFSET записей после курсора
+    SQL_NTH = (
+        "SELECT id FROM data_queue WHERE topic = ? AND id > ? "
+        "ORDER BY id LIMIT 1 OFFSET ?"
+    )
+
     def __init__(
         self,
         db_name: str = "data.db",
         server_url: str = None,
         send_interval: int = 1,
+        retention: Optional[Dict[str, Any]] = None,
+        topics: Optional[Dict[str, Dict[str, Any]]] = None,
     ):
         self.db_name = db_name
-        self.server_url = server_url or config["server_url"]
+        if topics is None:
+            # Одна тема на базу: имя темы — имя базы, как ждет сервер приема
+            topics = {
+                db_name.replace(".db", ""): {
+                    "server_url": server_url or config["server_url"],
+                    "retention": retention,
+                }
+            }
+        self.topics: Dict[str, QueueTopic] = {
+            name: QueueTopic(name, **settings) for name, settings in topics.items()
+        }
+        self.default_topic = next(iter(self.topics))
+        # Порядок обхода тем потоком отправки
+        self.by_priority = sorted(self.topics.values(), key=lambda t: t.priority)
         self.send_interval = send_interval
         self.headers = config.get("headers", {})
-        self.lock = threading.Lock()
+        self.synchronous = config.get("db_synchronous", "NORMAL")
+        self.wal_autocheckpoint = config.get("db_wal_autocheckpoint", 1000)
+        self.checkpoint_interval = config.get("db_checkpoint_interval", 300)
+        self.purge_every = config.get("db_purge_every", 1000)
+        self.max_batch_size = max(1, int(config.get("batch_size", 0)))
+        self.batch_format = config.get("batch_format", "json")
+        self.batch_latency_target = config.get("batch_latency_target", 2)
+        self.compression = config.get("db_compression")
+        self.to_wire = wire_encoder()  # Преобразование данных перед отправкой
+        self.flush_interval = config.get("db_flush_interval_ms", 200) / 1000
+        self.buffer_size = max(1, int(config.get("db_buffer_size", 10000)))
+        # Полный буфер сохраняется сразу, не дожидаясь flush_interval
+        self.flush_records = min(
+            max(1, int(config.get("db_flush_records", 100))), self.buffer_size
+        )
+        self.buffer_overflow = config.get("db_buffer_overflow", "block")
+        self.flush_on_shutdown = config.get("db_flush_on_shutdown", True)
+        if self.buffer_overflow not in ("block", "drop_oldest", "drop_new"):
+            raise ValueError(
+                f"Неизвестное значение db_buffer_overflow: {self.buffer_overflow}"
+            )
+        self.probe = config.get("upload_probe")
+        workers = max(topic.concurrency for topic in self.topics.values())
+        self.executor = ThreadPoolExecutor(workers) if workers > 1 else None
+        links: Dict[str, CircuitBreaker] = {}
+        for topic in self.topics.values():
+            # Текущий размер пачки, подстраивается под задержку и ошибки
+            topic.batch_size = max(1, self.max_batch_size // 4)
+            if topic.server_url not in links:
+                links[topic.server_url] = CircuitBreaker(
+                    name=f"Сервер {topic.server_url}",
+                    **{
+                        "failure_threshold": 1,
+                        "base_delay": 5,
+                        "max_delay": 300,
+                        **config.get("upload_backoff", {}),
+                    },
+                )
+            topic.link = links[topic.server_url]
+        self.lock = threading.Lock()  # Соединение записи
+        self.read_lock = threading.Lock()  # Соединение чтения
+        # Буфер записей (тема, data, timestamp) перед базой и условие потока записи
+        self.buffer = deque()
+        self.buffer_cond = threading.Condition()
+        self.dropped = 0  # Записи, потерянные при переполнении буфера
+        self._closing = False
+        self._closed = False
         self._init_db()
+        self._start_writer_thread()
         self._start_sending_thread()
+        if self.flush_on_shutdown:
+            atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открытие долгоживущего соединения с настройками журнала."""
+        conn = sqlite3.connect(
+            self.db_name, check_same_thread=False, cached_statements=16
+        )
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA wal_autocheckpoint={int(self.wal_autocheckpoint)}")
+        return conn
 
     def _init_db(self) -> None:
         """Инициализация базы данных SQLite."""
         try:
-            with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS data_queue (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        data TEXT NOT NULL,
-                        timestamp TEXT NOT NULL
-                    )
+            self.conn = self._connect()
+            # Режим WAL сохраняется в файле базы и действует для всех соединений
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS data_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    topic TEXT NOT NULL
+                )
+            """
+            )
+            self.conn.execute(
                 """
+                CREATE TABLE IF NOT EXISTS queue_cursor (
+                    name TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL
                 )
-                conn.commit()
-                logger.info(f"База данных: {self.db_name} успешно инициализирована.")
+            """
+            )
+            self._migrate_single_topic()
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS data_queue_topic ON data_queue (topic, id)"
+            )
+            for topic in self.topics.values():
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO queue_cursor (name, last_id) VALUES (?, 0)",
+                    (topic.name,),
+                )
+                topic.cursor = self.conn.execute(
+                    "SELECT last_id FROM queue_cursor WHERE name = ?", (topic.name,)
+                ).fetchone()[0]
+            self.conn.commit()
+            self.codec = PayloadCodec(self.conn, compression=self.compression)
+            for topic in self.topics.values():
+                if topic.import_from:
+                    self._import_legacy(topic)
+            self.read_conn = self._connect()
+            logger.info(f"База данных: {self.db_name} успешно инициализирована.")
         except sqlite3.Error as e:
             logger.error(f"Ошибка при инициализации базы данных: {e}")
             raise
 
-    def _check_network(self) -> bool:
-        """Проверка наличия сети."""
+    def _migrate_single_topic(self) -> None:
+        """Перевод базы прежнего формата (без темы) на единую очередь.
+
+        Записи и курсор 'sent' такой базы относятся к теме по умолчанию.
+        """
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(data_queue)")]
+        if "topic" in columns:
+            return
+        default = self.default_topic.replace("'", "''")
+        self.conn.execute(
+            f"ALTER TABLE data_queue ADD COLUMN topic TEXT NOT NULL DEFAULT '{default}'"
+        )
+        self.conn.execute(
+            "UPDATE queue_cursor SET name = ? WHERE name = 'sent'",
+            (self.default_topic,),
+        )
+        logger.info(
+            f"База {self.db_name}: записи отнесены к теме {self.default_topic}."
+        )
+
+    def _import_legacy(self, topic: QueueTopic) -> None:
+        """Перенос неотправленных записей из базы прежнего формата в тему.
+
+        После переноса файл переименовывается в <имя>.imported.
+        """
+        path = topic.import_from
+        if not os.path.exists(path) or os.path.abspath(path) == os.path.abspath(
+            self.db_name
+        ):
+            return
         try:
-            socket.create_connection(("8.8.8.8", 53), timeout=3)
+            legacy = sqlite3.connect(path)
+            tables = {
+                row[0] for row in legacy.execute("SELECT name FROM sqlite_master")
+            }
+            cursor = 0
+            if "queue_cursor" in tables:
+                row = legacy.execute(
+                    "SELECT last_id FROM queue_cursor WHERE name = 'sent'"
+                ).fetchone()
+                cursor = row[0] if row else 0
+            count = 0
+            if "data_queue" in tables:
+                legacy_codec = PayloadCodec(legacy)
+                rows = legacy.execute(
+                    "SELECT data, timestamp FROM data_queue WHERE id > ? ORDER BY id",
+                    (cursor,),
+                )
+                with self.conn:
+                    for data, timestamp in rows:
+                        self.conn.execute(
+                            self.SQL_INSERT,
+                            (
+                                topic.name,
+                                self.codec.encode(legacy_codec.decode(data)),
+                                timestamp,
+                            ),
+                        )
+                        count += 1
+            legacy.close()
+            os.replace(path, f"{path}.imported")
+            logger.info(f"Из {path} в тему {topic.name} перенесено записей: {count}")
+        except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+            logger.error(f"Ошибка при переносе записей из {path}: {e}")
+            self.codec.reload()
+
+    def _topic(self, name: Optional[str] = None) -> QueueTopic:
+        """Тема по имени (по умолчанию — первая тема очереди)."""
+        return self.topics[name or self.default_topic]
+
+    def _checkpoint(self) -> None:
+        """Удаление отправленных записей, перенос WAL в базу и усечение журнала."""
+        try:
+            with self.lock:
+                with self.conn:
+                    for topic in self.topics.values():
+                        self._purge(topic)
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при checkpoint базы {self.db_name}: {e}")
+
+    def close(self) -> None:
+        """Сохранение буфера (если "db_flush_on_shutdown") и закрытие базы."""
+        with self.buffer_cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._closing = True
+            if not self.flush_on_shutdown and self.buffer:
+                logger.warning(
+                    f"Не сохранены записи из буфера очереди: {len(self.buffer)}"
+                )
+                self.buffer.clear()
+            self.buffer_cond.notify_all()
+        self.writer_thread.join()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        self._checkpoint()
+        with self.read_lock:
+            self.read_conn.close()
+        with self.lock:
+            self.conn.close()
+
+    def _check_probe(self) -> bool:
+        """Проверка доступности upload_probe ("host:port") TCP-подключением."""
+        host, _, port = self.probe.rpartition(":")
+        try:
+            socket.create_connection((host, int(port)), timeout=3).close()
             return True
-        except OSError:
-            logger.debug("Сеть недоступна.")
+        except (OSError, ValueError):
+            logger.debug(f"{self.probe} недоступен.")
+            return False
+
+    def _link_ready(self, link: CircuitBreaker) -> bool:
+        """Можно ли отправлять: связь исправна или наступил срок пробной отправки."""
+        if link.state == HALF_OPEN:
+            return True  # Пробная отправка еще не состоялась (очередь была пуста)
+        if not link.allow():
+            return False
+        if link.state == HALF_OPEN and self.probe and not self._check_probe():
+            link.record_failure()
             return False
+        return True
+
+    def save_to_db(self, data: Dict[str, Any], topic: Optional[str] = None) -> None:
+        """Постановка записи темы в буфер; в базу ее сохраняет поток записи."""
+        topic = self._topic(topic).name
+        timestamp = datetime.now().isoformat()
+        with self.buffer_cond:
+            if self._closing:
+                logger.warning("Очередь закрыта, запись не сохранена.")
+                return
+            if len(self.buffer) >= self.buffer_size:
+                if self.buffer_overflow == "drop_new":
+                    self.dropped += 1
+                    return
+                if self.buffer_overflow == "drop_oldest":
+                    self.buffer.popleft()
+                    self.dropped += 1
+                else:
+                    self.buffer_cond.wait_for(
+                        lambda: len(self.buffer) < self.buffer_size or self._closing
+                    )
+                    if self._closing:
+                        logger.warning("Очередь закрыта, запись не сохранена.")
+                        return
+            self.buffer.append((topic, data, timestamp))
+            if len(self.buffer) >= self.flush_records:
+                self.buffer_cond.notify_all()
 
-    def save_to_db(self, data: Dict[str, Any]) -> None:
-        """Сохранение данных в локальную базу (сериализация в JSON)."""
+    def _write_records(self, records: List[tuple]) -> None:
+        """Сохранение записей из буфера одной транзакцией."""
         try:
-            timestamp = datetime.now().isoformat()
-            data_json = json.dumps(data)
             with self.lock:
-                with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "INSERT INTO data_queue (data, timestamp) VALUES (?, ?)",
-                        (data_json, timestamp),
-                    )
-                    conn.commit()
-            # logger.debug(f"Данные сохранены в базу: {data_json[:50]}...")
-        except (sqlite3.Error, json.JSONEncodeError) as e:
-            logger.error(f"Ошибка при сохранении данных в базу: {e}")
+                with self.conn:
+                    rows = []
+                    for topic, data, timestamp in records:
+                        try:
+                            rows.append((topic, self.codec.encode(data), timestamp))
+                        except (TypeError, ValueError) as e:
+                            logger.error(f"Ошибка при кодировании записи: {e}")
+                    self.conn.executemany(self.SQL_INSERT, rows)
+        except sqlite3.Error as e:
+            logger.error(
+                f"Ошибка при сохранении данных в базу ({len(records)} записей): {e}"
+            )
+            with self.lock:
+                self.codec.reload()  # Новые ключи могли не попасть в базу
 
-    def _get_oldest_record(self) -> Optional[tuple]:
-        """Получение самой старой записи из базы."""
+    def _write_data_thread(self) -> None:
+        """Сохранение буфера в базу каждые flush_interval или flush_records записей."""
+        while True:
+            with self.buffer_cond:
+                self.buffer_cond.wait_for(
+                    lambda: len(self.buffer) >= self.flush_records or self._closing,
+                    timeout=self.flush_interval,
+                )
+                records = list(self.buffer)
+                self.buffer.clear()
+                dropped, self.dropped = self.dropped, 0
+                closing = self._closing
+                self.buffer_cond.notify_all()  # Освободить ожидающих в save_to_db
+            if dropped:
+                logger.warning(f"Буфер очереди переполнен, потеряно записей: {dropped}")
+            if records:
+                self._write_records(records)
+            for topic in self.topics.values():
+                if (
+                    topic.retention
+                    and time.monotonic() - topic.retention_checked
+                    >= topic.retention.check_interval
+                ):
+                    self._enforce_retention(topic)
+                    topic.retention_checked = time.monotonic()
+            if closing:
+                break
+
+    def _queue_size(self, topic: Optional[QueueTopic] = None) -> tuple:
+        """Число неотправленных записей темы и объем занятых страниц базы, байт."""
+        topic = topic or self._topic()
+        rows = self.conn.execute(
+            self.SQL_PENDING, (topic.name, topic.cursor)
+        ).fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return rows, (pages - free_pages) * page_size
+
+    def _replace_bucket(self, topic: QueueTopic, rows: List[tuple]) -> int:
+        """Замена записей одного интервала прореженными (с теми же id по порядку).
+
+        Возвращает число удаленных записей.
+        """
+        try:
+            records = [(self.codec.decode(data), ts) for _, data, ts in rows]
+        except (ValueError, KeyError) as e:
+            logger.error(f"Ошибка при декодировании записи: {e}")
+            return 0
+        reduced = topic.retention.downsample(records)
+        if len(reduced) >= len(rows):
+            return 0
+        # Записи интервала идут подряд по id темы, новые занимают первые из их id
+        self.conn.execute(
+            "DELETE FROM data_queue WHERE topic = ? AND id >= ? AND id <= ?",
+            (topic.name, rows[0][0], rows[-1][0]),
+        )
+        self.conn.executemany(
+            "INSERT INTO data_queue (id, topic, data, timestamp) VALUES (?, ?, ?, ?)",
+            [
+                (row[0], topic.name, self.codec.encode(data), timestamp)
+                for row, (data, timestamp) in zip(rows, reduced)
+            ],
+        )
+        return len(rows) - len(reduced)
+
+    def _in_flight_id(self, topic: QueueTopic) -> Optional[int]:
+        """id последней записи темы, которую может отправлять поток отправки.
+
+        В пути бывает до concurrency пачек по max_batch_size записей после
+        курсора. id тем в общей таблице чередуются, поэтому граница считается
+        по числу записей темы, а не прибавлением к id курсора.
+        Возвращает None, если все неотправленные записи темы могут быть в пути.
+        """
+        row = self.conn.execute(
+            self.SQL_NTH,
+            (topic.name, topic.cursor, topic.concurrency * self.max_batch_size - 1),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _downsample(
+        self, topic: QueueTopic, limit: int, bucket_seconds: int, chunk: int = 5000
+    ) -> int:
+        """Прореживание limit самых старых неотправленных записей темы по интервалам.
+
+        Записи, которые может отправлять поток отправки (см. _in_flight_id),
+        не трогаются. Возвращает число удаленных записей.
+        """
+        last_id = self._in_flight_id(topic)
+        if last_id is None:
+            return 0
+        removed = 0
+        pending: List[tuple] = []  # Записи текущего (незавершенного) интервала
+        while limit > 0:
+            rows = self.conn.execute(
+                self.SQL_HEAD, (topic.name, last_id, min(chunk, limit))
+            ).fetchall()
+            if not rows:
+                break
+            limit -= len(rows)
+            last_id = rows[-1][0]
+            with self.conn:
+                for row in rows:
+                    bucket = RetentionPolicy.bucket_of(row[2], bucket_seconds)
+                    if pending and bucket != pending[0][0]:
+                        removed += self._replace_bucket(topic, [r for _, r in pending])
+                        pending = []
+                    pending.append((bucket, row))
+        if pending:
+            with self.conn:
+                removed += self._replace_bucket(topic, [r for _, r in pending])
+        return removed
+
+    def _enforce_retention(self, topic: Optional[QueueTopic] = None) -> None:
+        """Проверка лимита темы и прореживание (или удаление) старых данных."""
+        topic = topic or self._topic()
+        policy = topic.retention
+        name = f"{self.db_name}/{topic.name}"
         try:
             with self.lock:
-                with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "SELECT id, data, timestamp FROM data_queue ORDER BY timestamp ASC LIMIT 1"
+                with self.conn:
+                    self._purge(topic)
+                rows, size = self._queue_size(topic)
+                if not policy.over_limit(rows, size):
+                    return
+                logger.warning(
+                    f"Очередь {name} достигла лимита: {rows} записей, "
+                    f"{size / 1024 / 1024:.1f} МБ. Прореживание старых данных."
+                )
+                bucket_seconds = policy.bucket_seconds
+                while bucket_seconds <= policy.max_bucket_seconds:
+                    removed = self._downsample(
+                        topic, int(rows * policy.downsample_fraction), bucket_seconds
+                    )
+                    rows, size = self._queue_size(topic)
+                    logger.info(
+                        f"Очередь {name}: прорежено по {bucket_seconds} с, "
+                        f"удалено {removed} записей, осталось {rows}."
                     )
-                    record = cursor.fetchone()
-            return record
+                    if not policy.over_limit(rows, size, policy.low_watermark):
+                        return
+                    bucket_seconds *= 2
+                last_id = self._in_flight_id(topic)
+                if last_id is None:
+                    return
+                with self.conn:
+                    excess = self.conn.execute(
+                        "DELETE FROM data_queue WHERE id IN (SELECT id FROM data_queue "
+                        "WHERE topic = ? AND id > ? ORDER BY id LIMIT ?)",
+                        (topic.name, last_id, policy.excess_rows(rows, size)),
+                    ).rowcount
+                logger.warning(
+                    f"Очередь {name}: прореживания недостаточно, "
+                    f"удалено {excess} самых старых записей."
+                )
         except sqlite3.Error as e:
-            logger.error(f"Ошибка при получении записи из базы: {e}")
-            return None
+            logger.error(f"Ошибка при ограничении объема очереди {name}: {e}")
+            with self.lock:
+                self.codec.reload()
+
+    def _start_writer_thread(self) -> None:
+        """Запуск потока записи буфера в базу."""
+        self.writer_thread = threading.Thread(target=self._write_data_thread)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def _get_oldest_record(self, topic: Optional[str] = None) -> Optional[tuple]:
+        """Получение самой старой неотправленной записи темы."""
+        records = self._get_oldest_records(1, topic)
+        return records[0] if records else None
+
+    def _get_oldest_records(
+        self, limit: int, topic: Optional[str] = None, after_id: Optional[int] = None
+    ) -> List[tuple]:
+        """Получение до limit самых старых неотправленных записей темы в порядке id.
+
+        after_id — начать после этой записи, а не после курсора (записи в пути).
+        """
+        topic = self._topic(topic)
+        if after_id is None:
+            after_id = topic.cursor
+        try:
+            with self.read_lock:
+                return self.read_conn.execute(
+                    self.SQL_HEAD, (topic.name, after_id, limit)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при получении записей из базы: {e}")
+            return []
+
+    def _purge(self, topic: QueueTopic) -> None:
+        """Удаление отправленных записей темы диапазоном (под self.lock)."""
+        self.conn.execute(self.SQL_PURGE, (topic.name, topic.cursor))
+        topic.acked_since_purge = 0
 
-    def _delete_record(self, record_id: int) -> None:
-        """Удаление записи из базы по ID."""
+    def _ack(self, last_id: int, count: int = 1, topic: Optional[str] = None) -> None:
+        """Подтверждение отправки всех записей темы с id <= last_id."""
+        topic = self._topic(topic)
         try:
             with self.lock:
-                with sqlite3.connect(self.db_name, check_same_thread=False) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM data_queue WHERE id = ?", (record_id,))
-                    conn.commit()
-            logger.debug(f"Запись с ID {record_id} удалена из базы.")
+                with self.conn:
+                    self.conn.execute(self.SQL_ACK, (last_id, topic.name))
+                    topic.cursor = last_id
+                    topic.acked_since_purge += count
+                    if topic.acked_since_purge >= self.purge_every:
+                        self._purge(topic)
+            logger.debug("Отправлены записи %s до ID %d.", topic.name, last_id)
         except sqlite3.Error as e:
-            logger.error(f"Ошибка при удалении записи из базы: {e}")
+            logger.error(f"Ошибка при сохранении курсора очереди: {e}")
+
+    def _make_payload(
+        self, record_data: bytes, timestamp: str, topic: str
+    ) -> Dict[str, Any]:
+        """Формат записи для сервера: {"timestamp": ..., "<имя темы>": данные}."""
+        return {
+            "timestamp": timestamp,
+            topic: self.to_wire(self.codec.decode(record_data)),
+        }
+
+    def _post(
+        self,
+        topic: QueueTopic,
+        body: str,
+        headers: Dict[str, str],
+        payloads: List[Dict[str, Any]],
+    ) -> bool:
+        """POST на сервер темы с retry-логикой; результат обновляет состояние связи.
 
-    def _send_to_server(self, data_json: str, timestamp: str) -> bool:
-        """Отправка данных на сервер с retry-логикой."""
-        max_retries = 5
+        После успешной отправки каждая запись из payloads пишется в лог
+        отдельной строкой: по ним parser_log восстанавливает данные.
+        """
+        # Пробная отправка после ошибок — одна попытка, дальше решает topic.link
+        max_retries = 5 if topic.link.state == CLOSED else 1
         delay = 3
 
         for attempt in range(1, max_retries + 1):
             try:
-                data = json.loads(data_json)
-                payload = {
-                    "timestamp": timestamp,
-                    f"{self.db_name.replace('.db', '')}": data,
-                }
-                response = requests.post(
-                    self.server_url,
-                    data=json.dumps(payload),
-                    headers=self.headers,
+                response = http_session.post(
+                    topic.server_url,
+                    data=body,
+                    headers=headers,
                     timeout=5,
                 )
                 if response.status_code == 200:
-                    logger.info(f"Данные успешно отправлены: {payload}")
+                    for payload in payloads:
+                        logger.info("Данные успешно отправлены: %s", payload)
+                    topic.link.record_success()
                     return True
                 else:
                     logger.error(
@@ -142,38 +728,189 @@ class DataQueueManager:
                 logger.error("Тайм-аут при отправке запроса.")
             except requests.exceptions.RequestException as e:
                 logger.error(f"Ошибка при отправке запроса: {e}")
-            except json.JSONDecodeError as e:
-                logger.error(f"Ошибка при декодировании JSON: {e}")
 
             if attempt < max_retries:
                 logger.info(
-                    f"Повторная попытка отправки ({attempt}/{max_retries}) через {delay} секунд..."
+                    "Повторная попытка отправки (%d/%d) через %d секунд...",
+                    attempt,
+                    max_retries,
+                    delay,
                 )
                 time.sleep(delay)
                 delay *= 2  # Увеличиваем задержку в 2 раза
             else:
                 logger.error("Превышено максимальное количество попыток отправки.")
 
+        topic.link.record_failure()
         return False
 
-    def _send_data_thread(self) -> None:
-        """Функция для параллельной отправки данных."""
+    def _send_to_server(
+        self, topic: QueueTopic, record_data: bytes, timestamp: str
+    ) -> bool:
+        """Отправка одной записи темы на сервер."""
+        try:
+            payload = self._make_payload(record_data, timestamp, topic.name)
+        except (ValueError, KeyError) as e:
+            logger.error(f"Ошибка при декодировании записи: {e}")
+            return False
+        return self._post(topic, json.dumps(payload), self.headers, [payload])
+
+    def _send_batch_to_server(self, topic: QueueTopic, records: List[tuple]) -> bool:
+        """Отправка пачки записей темы одним запросом (JSON-массив или NDJSON)."""
+        try:
+            payloads = [
+                self._make_payload(record_data, timestamp, topic.name)
+                for _, record_data, timestamp in records
+            ]
+        except (ValueError, KeyError) as e:
+            logger.error(f"Ошибка при декодировании записи: {e}")
+            return False
+        headers = dict(self.headers)
+        if self.batch_format == "ndjson":
+            body = "\n".join(json.dumps(payload) for payload in payloads)
+            headers["Content-Type"] = "application/x-ndjson"
+        else:
+            body = json.dumps(payloads)
+        return self._post(topic, body, headers, payloads)
+
+    def _adapt_batch_size(self, topic: QueueTopic, ok: bool, elapsed: float) -> None:
+        """Подстройка размера пачки темы: растет при быстрых успешных отправках,
+        уменьшается вдвое при ошибке или превышении batch_latency_target."""
+        if ok and elapsed <= self.batch_latency_target:
+            new_size = min(self.max_batch_size, topic.batch_size * 2)
+        else:
+            new_size = max(1, topic.batch_size // 2)
+        if new_size != topic.batch_size:
+            logger.debug("Размер пачки %s/%s: %d", self.db_name, topic.name, new_size)
+            topic.batch_size = new_size
+
+    def _send_records(self, topic: QueueTopic, records: List[tuple]) -> tuple:
+        """Отправка записей (одной записи или пачки) из пула; (успех, время, с)."""
+        start_time = time.monotonic()
+        if self.max_batch_size <= 1:
+            _, record_data, record_timestamp = records[0]
+            ok = self._send_to_server(topic, record_data, record_timestamp)
+        else:
+            ok = self._send_batch_to_server(topic, records)
+        return ok, time.monotonic() - start_time
+
+    def _higher_priority_pending(self, topic: QueueTopic) -> bool:
+        """Есть ли записи в темах выше по приоритету с исправной связью."""
+        for other in self.by_priority:
+            if other is topic:
+                return False
+            if other.link.state == CLOSED and self._get_oldest_records(1, other.name):
+                return True
+        return False
+
+    def _send_window(self, topic: QueueTopic) -> Optional[bool]:
+        """Отправка темы окном из topic.concurrency одновременных запросов.
+
+        Новые пачки добавляются по мере освобождения окна, результаты
+        подтверждаются по порядку id. После ошибки окно больше не пополняется,
+        а курсор останавливается перед неудачной пачкой. Окно не пополняется и
+        при появлении записей в темах выше по приоритету.
+        Возвращает None, если в теме нет записей, иначе результат отправки.
+        """
+        size = 1 if self.max_batch_size <= 1 else topic.batch_size
+        inflight = deque()  # (записи, future) в порядке id
+        after_id = topic.cursor
+        result = None
+        refill = True
         while True:
-            if self._check_network():
-                while True:
-                    record = self._get_oldest_record()
-                    if not record:
-                        break
-                    record_id, record_data, record_timestamp = record
-                    if self._send_to_server(record_data, record_timestamp):
-                        self._delete_record(record_id)
-                    else:
-                        logger.warning(
-                            "Не удалось отправить данные, остаются в очереди"
-                        )
-                        break
-                    time.sleep(self.send_interval)
-            time.sleep(1)  # Пауза перед следующей проверкой сети
+            # Пробная отправка после ошибок — одним запросом
+            window = topic.concurrency if topic.link.state == CLOSED else 1
+            while refill and len(inflight) < window and not self._closed:
+                if inflight and self._higher_priority_pending(topic):
+                    refill = False
+                    break
+                records = self._get_oldest_records(size, topic.name, after_id)
+                if not records:
+                    refill = False
+                    break
+                try:
+                    future = self.executor.submit(self._send_records, topic, records)
+                except RuntimeError:  # Пул остановлен в close()
+                    refill = False
+                    break
+                inflight.append((records, future))
+                after_id = records[-1][0]
+            if not inflight:
+                return result
+            records, future = inflight.popleft()
+            ok, elapsed = future.result()
+            if result is False:
+                continue  # После ошибки только дожидаемся запросов в пути
+            if self.max_batch_size > 1:
+                self._adapt_batch_size(topic, ok, elapsed)
+                size = topic.batch_size
+            if ok:
+                self._ack(records[-1][0], len(records), topic.name)
+                result = True
+            else:
+                result = False
+                refill = False
+
+    def _send_topic(self, topic: QueueTopic) -> Optional[bool]:
+        """Отправка следующей записи или пачки темы.
+
+        Возвращает None, если в теме нет записей, иначе результат отправки.
+        """
+        if topic.concurrency > 1:
+            return self._send_window(topic)
+        if self.max_batch_size <= 1:
+            record = self._get_oldest_record(topic.name)
+            if not record:
+                return None
+            record_id, record_data, record_timestamp = record
+            if self._send_to_server(topic, record_data, record_timestamp):
+                self._ack(record_id, topic=topic.name)
+                return True
+            return False
+
+        records = self._get_oldest_records(topic.batch_size, topic.name)
+        if not records:
+            return None
+        start_time = time.monotonic()
+        ok = self._send_batch_to_server(topic, records)
+        self._adapt_batch_size(topic, ok, time.monotonic() - start_time)
+        if ok:
+            self._ack(records[-1][0], len(records), topic.name)
+        return ok
+
+    def _send_next(self) -> Optional[bool]:
+        """Отправка следующей пачки темы с наивысшим приоритетом.
+
+        Темы с недоступным сервером пропускаются. Возвращает None, если
+        отправлять нечего, иначе результат отправки.
+        """
+        for topic in self.by_priority:
+            if not self._link_ready(topic.link):
+                continue
+            sent = self._send_topic(topic)
+            if sent is not None:
+                return sent
+        return None
+
+    def _send_data_thread(self) -> None:
+        """Функция для параллельной отправки данных (до закрытия очереди)."""
+        last_checkpoint = time.monotonic()
+        while not self._closed:
+            if (
+                self.checkpoint_interval
+                and time.monotonic() - last_checkpoint >= self.checkpoint_interval
+            ):
+                self._checkpoint()
+                last_checkpoint = time.monotonic()
+            while not self._closed:
+                sent = self._send_next()
+                if sent is None:
+                    break
+                if not sent:
+                    logger.warning("Не удалось отправить данные, остаются в очереди")
+                    break
+                time.sleep(self.send_interval)
+            time.sleep(1)  # Пауза перед следующей проверкой очереди
 
     def _start_sending_thread(self) -> None:
         """Запуск потока для отправки данных."""
@@ -0,0 +1,150 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Union
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from .overall_work import get_logger
+from .pipelined_client import PipelinedModbusTcpClient
+
+logger = get_logger("poller")
+
+
+class ConnectionManager:
+    """Владелец постоянных соединений с Modbus TCP серверами.
+
+    Держит по одному клиенту на сервер. При запуске все соединения
+    открываются параллельно, поэтому холодный старт занимает не больше одного
+    таймаута подключения. Потерянные соединения восстанавливаются в фоновых
+    задачах с нарастающей задержкой (от reconnect_delay до
+    max_reconnect_delay), а опрос получает либо готовый клиент, либо сразу
+    None ("недоступен") без ожидания подключения.
+
+    pipeline_depth — число запросов в полете для конвейерной отправки
+    (общее или {ip: число}). При значении больше 1 для сервера создается
+    PipelinedModbusTcpClient, иначе обычный AsyncModbusTcpClient. Если клиент
+    перешел в последовательный режим, при переподключении он остается в нем.
+
+    Использование:
+        connections = ConnectionManager(config["modbus_servers"], 502)
+        await connections.start()
+        client = connections.get(ip)
+        if client is None:
+            ...  # Сервер недоступен, пропускаем
+        elif error:
+            connections.mark_broken(ip)
+        connections.close()
+    """
+
+    def __init__(
+        self,
+        servers: Iterable[str],
+        port: int,
+        timeout: float = 10,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        pipeline_depth: Union[int, Dict[str, int]] = 0,
+    ):
+        self.servers = list(servers)
+        self.port = port
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        if isinstance(pipeline_depth, dict):
+            self.pipeline_depth = {ip: pipeline_depth.get(ip, 0) for ip in self.servers}
+        else:
+            self.pipeline_depth = {ip: pipeline_depth for ip in self.servers}
+        self.clients: Dict[str, Optional[AsyncModbusTcpClient]] = {
+            ip: None for ip in self.servers
+        }
+        self._reconnect_tasks: Dict[str, asyncio.Task] = {}
+
+    async def _connect(self, ip: str) -> Optional[AsyncModbusTcpClient]:
+        """Подключение к серверу. Возвращает клиент или None при неудаче."""
+        if self.pipeline_depth[ip] > 1:
+            client = PipelinedModbusTcpClient(
+                ip,
+                self.port,
+                timeout=self.timeout,
+                max_in_flight=self.pipeline_depth[ip],
+            )
+            if await client.connect():
+                logger.info(
+                    f"Соединение с {ip} успешно установлено "
+                    f"(конвейер до {self.pipeline_depth[ip]} запросов)."
+                )
+                return client
+            return None
+        try:
+            # reconnect_delay=0 отключает встроенное переподключение pymodbus,
+            # переподключением управляет сам менеджер
+            client = AsyncModbusTcpClient(
+                ip, port=self.port, timeout=self.timeout, reconnect_delay=0
+            )
+            if await client.connect():
+                logger.info(f"Соединение с {ip} успешно установлено.")
+                return client
+            logger.warning(f"Не удалось установить соединение с сервером {ip}.")
+            client.close()
+        except Exception as e:
+            logger.error(f"Ошибка при подключении к {ip}: {e}", exc_info=True)
+        return None
+
+    def _close_client(self, ip: str) -> None:
+        client = self.clients.get(ip)
+        self.clients[ip] = None
+        if isinstance(client, PipelinedModbusTcpClient):
+            # Запоминаем переход в последовательный режим
+            self.pipeline_depth[ip] = client.max_in_flight
+        if client is not None:
+            try:
+                client.close()
+                logger.info(f"Соединение с {ip} закрыто.")
+            except Exception as e:
+                logger.error(f"Ошибка при закрытии клиента {ip}: {e}", exc_info=True)
+
+    async def _reconnect_loop(self, ip: str) -> None:
+        """Фоновое восстановление соединения до успеха."""
+        delay = self.reconnect_delay
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                client = await self._connect(ip)
+                if client is not None:
+                    self.clients[ip] = client
+                    return
+                delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            self._reconnect_tasks.pop(ip, None)
+
+    def _schedule_reconnect(self, ip: str) -> None:
+        if ip not in self._reconnect_tasks:
+            self._reconnect_tasks[ip] = asyncio.create_task(self._reconnect_loop(ip))
+
+    async def start(self) -> None:
+        """Параллельное подключение ко всем серверам при запуске."""
+        clients = await asyncio.gather(*(self._connect(ip) for ip in self.servers))
+        for ip, client in zip(self.servers, clients):
+            self.clients[ip] = client
+            if client is None:
+                self._schedule_reconnect(ip)
+
+    def get(self, ip: str) -> Optional[AsyncModbusTcpClient]:
+        """Готовый клиент или None, если сервер сейчас недоступен."""
+        client = self.clients.get(ip)
+        if client is not None and not client.connected:
+            self.mark_broken(ip)
+            return None
+        return client
+
+    def mark_broken(self, ip: str) -> None:
+        """Закрытие неисправного соединения и запуск фонового переподключения."""
+        self._close_client(ip)
+        self._schedule_reconnect(ip)
+
+    def close(self) -> None:
+        """Остановка переподключений и закрытие всех соединений."""
+        for task in list(self._reconnect_tasks.values()):
+            task.cancel()
+        self._reconnect_tasks.clear()
+        for ip in self.servers:
+            self._close_client(ip)
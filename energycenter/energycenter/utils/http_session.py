@@ -0,0 +1,42 @@
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .overall_work import config
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Общая для всего процесса сессия requests с пулом keep-alive соединений.
+
+    Все отправители (DataQueueManager, send_request, notify_server) используют
+    одну сессию, поэтому TCP и TLS соединение с сервером открывается один раз
+    и переиспользуется. Размеры пула из config.json:
+        "http_pool_connections": 4  — число серверов, для которых хранится пул
+        "http_pool_maxsize": 4      — соединений на один сервер; при нехватке
+                                      поток ждет освобождения соединения
+    Пул urllib3 потокобезопасен, сессию можно использовать из любых потоков.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.get("http_pool_connections", 4),
+                    pool_maxsize=config.get("http_pool_maxsize", 4),
+                    pool_block=True,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """requests.post через общую сессию."""
+    return get_session().post(url, **kwargs)
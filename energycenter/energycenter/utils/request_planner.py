@@ -0,0 +1,220 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+from pymodbus.exceptions import ModbusException
+
+from .overall_work import get_logger
+
+logger = get_logger("poller")
+
+
+# Максимальное количество регистров в одном запросе по протоколу Modbus
+MAX_REGISTERS_PER_REQUEST = 125
+# Код исключения Modbus "Illegal Data Address"
+ILLEGAL_DATA_ADDRESS = 0x02
+
+
+class RequestBlock:
+    """Один запрос read_holding_registers, покрывающий несколько диапазонов из конфигурации."""
+
+    def __init__(self, ranges: List[Tuple[int, int]]):
+        self.ranges = tuple(ranges)
+        self.address = ranges[0][0]
+        self.count = max(address + count for address, count in ranges) - self.address
+
+    @property
+    def merged(self) -> bool:
+        return len(self.ranges) > 1
+
+    def slice(self, registers: List[int]) -> Dict[int, List[int]]:
+        """Разрезает ответ на блок обратно по исходным диапазонам: {адрес: регистры}."""
+        return {
+            address: registers[address - self.address : address - self.address + count]
+            for address, count in self.ranges
+        }
+
+    def __repr__(self):
+        return f"RequestBlock({self.address}, {self.count}, ranges={list(self.ranges)})"
+
+
+class RequestPlanner:
+    """Планировщик объединения диапазонов регистров в минимальное число запросов.
+
+    Соседние диапазоны из request_settings объединяются в один запрос, если
+    разрыв между ними не больше max_gap регистров, а длина запроса не превышает
+    max_count (125 по протоколу). Если объединенный запрос завершился исключением
+    "Illegal Data Address", он делится на части, а точки деления запоминаются:
+    через них планировщик больше никогда не объединяет.
+
+    Использование:
+        planner = RequestPlanner([(14, 1), (15, 1), (65, 4)], max_gap=8)
+        for block in planner.plan():
+            ...
+    """
+
+    def __init__(
+        self,
+        ranges: Iterable[Tuple[int, int]],
+        max_gap: int = 0,
+        max_count: int = MAX_REGISTERS_PER_REQUEST,
+    ):
+        self.ranges = sorted(set((int(a), int(c)) for a, c in ranges))
+        self.max_gap = max(0, int(max_gap))
+        self.max_count = min(int(max_count), MAX_REGISTERS_PER_REQUEST)
+        # Адреса, с которых всегда начинается новый запрос
+        self.barriers: Set[int] = set()
+        self._blocks = self._build()
+
+    def _build(self) -> List[RequestBlock]:
+        blocks = []
+        current: List[Tuple[int, int]] = []
+        end = 0  # Адрес, следующий за последним регистром текущего блока
+        for address, count in self.ranges:
+            if current:
+                start = current[0][0]
+                if (
+                    address - end <= self.max_gap
+                    and max(end, address + count) - start <= self.max_count
+                    and address not in self.barriers
+                ):
+                    current.append((address, count))
+                    end = max(end, address + count)
+                    continue
+                blocks.append(RequestBlock(current))
+            current = [(address, count)]
+            end = address + count
+        if current:
+            blocks.append(RequestBlock(current))
+        return blocks
+
+    def plan(self) -> List[RequestBlock]:
+        """Текущий список запросов."""
+        return self._blocks
+
+    def split(self, block: RequestBlock) -> List[RequestBlock]:
+        """Делит блок пополам и запрещает объединение через точку деления.
+
+        Повторное деление половин, на которых снова возникает исключение,
+        находит разрыв с недопустимым адресом за log2(N) запросов, а остальные
+        диапазоны блока остаются объединенными.
+        """
+        middle = len(block.ranges) // 2
+        self.barriers.add(block.ranges[middle][0])
+        self._blocks = self._build()
+        return [
+            RequestBlock(list(block.ranges[:middle])),
+            RequestBlock(list(block.ranges[middle:])),
+        ]
+
+
+async def read_planned(client, planner: RequestPlanner, retries=3, delay=5, **kwargs):
+    """Чтение всех блоков планировщика с повторными попытками.
+
+    Если клиент поддерживает конвейерную отправку (атрибут pipelined, см.
+    PipelinedModbusTcpClient), все блоки запрашиваются одновременно.
+
+    Возвращает кортеж ({адрес диапазона: регистры}, [адреса, которые не удалось прочитать]).
+    """
+    registers: Dict[int, List[int]] = {}
+    failed: List[int] = []
+
+    async def read_block(block: RequestBlock) -> List[RequestBlock]:
+        """Чтение блока. Возвращает части блока, которые нужно прочитать отдельно."""
+        for attempt in range(retries):
+            try:
+                response = await client.read_holding_registers(
+                    address=block.address, count=block.count, **kwargs
+                )
+                if not response.isError():
+                    registers.update(block.slice(response.registers))
+                    return []
+                if (
+                    block.merged
+                    and getattr(response, "exception_code", None)
+                    == ILLEGAL_DATA_ADDRESS
+                ):
+                    # Внутри объединенного блока есть недопустимый адрес: читаем по частям
+                    logger.warning(
+                        f"Недопустимый адрес в блоке с адреса {block.address}, "
+                        f"запрос будет разделен."
+                    )
+                    return planner.split(block)
+                logger.error(
+                    f"Ошибка при чтении регистров с адреса {block.address}: {response}"
+                )
+            except ModbusException as e:
+                logger.error(f"Ошибка Modbus при чтении с адреса {block.address}: {e}")
+
+            # Если не получилось, подождем и сделаем еще одну попытку
+            if attempt < retries - 1:
+                logger.info("Повторная попытка %d из %d...", attempt + 1, retries)
+                await asyncio.sleep(delay)
+
+        logger.error(
+            f"Не удалось получить данные с адреса {block.address} после {retries} попыток."
+        )
+        failed.extend(address for address, _ in block.ranges)
+        return []
+
+    pending = planner.plan()
+    while pending:
+        if getattr(client, "pipelined", False):
+            parts = await asyncio.gather(*(read_block(block) for block in pending))
+        else:
+            parts = [await read_block(block) for block in pending]
+        pending = [block for blocks in parts for block in blocks]
+
+    return registers, failed
+
+
+def read_planned_sync(
+    client, planner: RequestPlanner, retries=3, delay=5, **kwargs
+) -> Tuple[Dict[int, List[int]], List[int]]:
+    """Синхронный вариант read_planned для клиентов pymodbus без asyncio (RTU).
+
+    Возвращает кортеж ({адрес диапазона: регистры}, [адреса, которые не удалось прочитать]).
+    """
+    registers: Dict[int, List[int]] = {}
+    failed: List[int] = []
+    pending = list(planner.plan())
+
+    while pending:
+        block = pending.pop(0)
+        for attempt in range(retries):
+            try:
+                response = client.read_holding_registers(
+                    address=block.address, count=block.count, **kwargs
+                )
+                if not response.isError():
+                    registers.update(block.slice(response.registers))
+                    break
+                if (
+                    block.merged
+                    and getattr(response, "exception_code", None)
+                    == ILLEGAL_DATA_ADDRESS
+                ):
+                    # Внутри объединенного блока есть недопустимый адрес: читаем по частям
+                    logger.warning(
+                        f"Недопустимый адрес в блоке с адреса {block.address}, "
+                        f"запрос будет разделен."
+                    )
+                    pending[:0] = planner.split(block)
+                    break
+                logger.error(
+                    f"Ошибка при чтении регистров с адреса {block.address}: {response}"
+                )
+            except ModbusException as e:
+                logger.error(f"Ошибка Modbus при чтении с адреса {block.address}: {e}")
+
+            # Если не получилось, подождем и сделаем еще одну попытку
+            if attempt < retries - 1:
+                logger.info("Повторная попытка %d из %d...", attempt + 1, retries)
+                time.sleep(delay)
+        else:
+            logger.error(
+                f"Не удалось получить данные с адреса {block.address} после {retries} попыток."
+            )
+            failed.extend(address for address, _ in block.ranges)
+
+    return registers, failed
@@ -1,13 +1,18 @@
 import logging
 from logging.handlers import TimedRotatingFileHandler
 import csv
-from pymodbus.client import ModbusTcpClient
-from pymodbus.exceptions import ModbusException
+import asyncio
 import time
 from datetime import datetime
 import requests
 import json
 
+from utils import http_session
+from utils.async_poller import AsyncModbusPoller
+from utils.request_planner import read_planned
+from utils.poll_plan import build_group_plans
+from utils.sample_types import wire_encoder
+
 
 CSV_FILE = "modbus_data.csv"
 # "127.0.0.1"
@@ -71,6 +76,10 @@ data_server = config["server_url"]
 alarm_server = config["server_url_alarm"]
 
 
+# Значения опроса — числа; строками отправляются только при "string_values"
+to_wire = wire_encoder()
+
+
 # Функция отправки запроса на сервер для данных
 def send_request(url, data):
     max_retries = 5
@@ -78,12 +87,12 @@ def send_request(url, data):
 
     for attempt in range(1, max_retries + 1):
         try:
-            response = requests.post(
-                url, data=json.dumps(data), headers=config["headers"]
+            response = http_session.post(
+                url, data=json.dumps(to_wire(data)), headers=config["headers"]
             )
 
             if response.status_code == 200:
-                logger.info(f"Данные успешно отправлены: {data}")
+                logger.info("Данные успешно отправлены: %s", data)
                 return True
             else:
                 logger.error(
@@ -122,111 +131,72 @@ def write_to_csv(register, value):
         logger.error(f"Ошибка при записи в CSV: {e}")
 
 
-def convert_to_signed(value):
-    """Преобразует беззнаковое 16-битное значение в знаковое."""
-    return value if value < 32768 else value - 65536
-
-
-def read_modbus_data(client, addresses, retries=3, delay=5, ip=None):
+# Метки аварийных битов для адресов 14 и 15 (первая метка — старший бит)
+BIT_LABELS = {
+    14: [
+        440,
+        439,
+        438,
+        437,
+        436,
+        435,
+        434,
+        433,
+        432,
+        431,
+        430,
+        429,
+        428,
+        427,
+        426,
+        425,
+    ],
+    15: [
+        456,
+        455,
+        454,
+        453,
+        452,
+        451,
+        450,
+        449,
+        448,
+        447,
+        446,
+        445,
+        444,
+        443,
+        442,
+        441,
+    ],
+}
+
+# Планы опроса по группам запросов (поле "group") собираются один раз при запуске
+poll_plans = build_group_plans(
+    config["request_settings"],
+    bit_labels=BIT_LABELS,
+    bit_order="msb",
+    max_gap=config.get("max_register_gap", 8),
+)
+
+
+async def read_modbus_data(client, plan, retries=3, delay=5, ip=None):
     """Чтение данных Modbus с накоплением и отправкой в один пакет."""
     collected_data = {}  # Словарь для накопления данных
     collected_alarm = {}  # Словарь для накопления данных
 
-    for (
-        address,
-        count,
-    ) in addresses:  # Адреса и количество регистров в виде списка кортежей
-        for attempt in range(retries):
-            try:
-                response = client.read_holding_registers(address=address, count=count)
-
-                if response.isError():
-                    logger.error(
-                        f"Ошибка при чтении регистров с адреса {address}: {response}"
-                    )
-                    continue  # Попробуем снова, если была ошибка
-                else:
-                    if ip:
-                        collected_data["IP"] = ip
-                        collected_alarm["IP"] = ip
-
-                    if address == 14 or address == 15:
-                        # Определяем битовые метки для адресов 14 и 15
-                        bit_labels = {
-                            14: [
-                                440,
-                                439,
-                                438,
-                                437,
-                                436,
-                                435,
-                                434,
-                                433,
-                                432,
-                                431,
-                                430,
-                                429,
-                                428,
-                                427,
-                                426,
-                                425,
-                            ],
-                            15: [
-                                456,
-                                455,
-                                454,
-                                453,
-                                452,
-                                451,
-                                450,
-                                449,
-                                448,
-                                447,
-                                446,
-                                445,
-                                444,
-                                443,
-                                442,
-                                441,
-                            ],
-                        }
-
-                        value = response.registers[0]
-                        print(f"Значение регистра R{address:03d}: {value:016b}")
-
-                        # Парсинг битовых данных
-                        for i, bit_label in enumerate(bit_labels[address]):
-                            bit_value = (
-                                value >> (15 - i)
-                            ) & 0x01  # Сдвиг и маскирование
-                            collected_alarm[f"{bit_label}"] = (
-                                "Сообщение" if bit_value else "ОК"
-                            )
-
-                    else:
-                        # Чтение регистров и добавление в словарь для остальных адресов
-                        for i, reg_value in enumerate(response.registers):
-                            signed_value = convert_to_signed(reg_value)
-                            register = f"R{address + i:03d}"
-                            collected_data[register] = str(
-                                signed_value
-                            )  # Добавляем значение регистра в collected_data
-
-                    break  # Успешное чтение завершено, выходим из цикла попыток
-
-            except ModbusException as e:
-                logger.error(f"Ошибка Modbus при чтении с адреса {address}: {e}")
-
-            # Если не получилось, подождем и сделаем еще одну попытку
-            if attempt < retries - 1:
-                logger.info(f"Повторная попытка {attempt + 1} из {retries}...")
-                time.sleep(delay)
+    # Чтение объединенными блоками, ответы разрезаются по адресам из конфигурации
+    registers_by_address, failed = await read_planned(
+        client, plan.planner(ip), retries=retries, delay=delay
+    )
+    error_flag = bool(failed)  # Флаг ошибки для текущего клиента
 
-        else:
-            # Если после всех попыток не получилось, сообщаем об ошибке
-            logger.error(
-                f"Не удалось получить данные с адреса {address} после {retries} попыток."
-            )
+    if ip and registers_by_address:
+        collected_data["IP"] = ip
+        collected_alarm["IP"] = ip
+
+    # Раскладываем значения по заранее подготовленным ключам
+    plan.apply(registers_by_address, collected_data, collected_alarm)
 
     # После опроса всех адресов отправляем собранные данные
     print("Collected Data: ", collected_data)
@@ -235,86 +205,43 @@ def read_modbus_data(client, addresses, retries=3, delay=5, ip=None):
     # send_request(data_server, collected_data)
     # send_request(alarm_server, collected_alarm)
 
+    return error_flag  # Возвращаем флаг ошибки
 
-# Функция для работы с каждым IP-адресом
-def process_modbus_data():
-    clients = {}  # Словарь для хранения подключений
 
-    # Создаем подключение для каждого IP и сохраняем в словарь
-    for ip in config["modbus_servers"]:
-        client = ModbusTcpClient(ip, port=config["modbus_port"])
-        try:
-            # Подключаемся к серверу
-            connection = client.connect()
-            if connection:
-                logger.info(f"Подключение к {ip} успешно.")
-                clients[ip] = client  # Сохраняем подключение в словарь
-            else:
-                logger.error(
-                    f"Не удалось установить соединение с сервером {ip}. Пропуск."
-                )
-                clients[ip] = None  # Если не удалось подключиться, помечаем как None
-        except Exception as e:
-            logger.error(f"Ошибка при подключении к {ip}: {e}. Пропуск.")
-            clients[ip] = None  # Если ошибка подключения, помечаем как None
+async def poll_device(client, ip, group):
+    """Опрос всех адресов одного Modbus-сервера. Возвращает флаг ошибки."""
+    plan = poll_plans[group]
+    logger.debug("Чтение данных группы %s с %s: %s", group, ip, plan.planner(ip).plan())
+
+    # Опрос всех адресов за раз
+    return await read_modbus_data(
+        client,
+        plan,
+        retries=config.get("retries", 3),
+        delay=config.get("retry_delay", 5),
+        ip=ip,
+    )
 
-    try:
-        while True:
-            for ip, client in clients.items():
-                if client is None:  # Если клиент не был подключен
-                    try:
-                        logger.info(f"Проверка доступности сервера {ip}...")
-                        new_client = ModbusTcpClient(ip, port=config["modbus_port"])
-                        connection = new_client.connect()
-                        if connection:
-                            logger.info(f"Соединение с сервером {ip} восстановлено.")
-                            clients[ip] = new_client  # Обновляем клиента
-                        else:
-                            logger.warning(f"Сервер {ip} по-прежнему недоступен.")
-                    except Exception as e:
-                        logger.error(f"Ошибка при повторном подключении к {ip}: {e}.")
-                else:  # Если клиент подключен
-                    try:
-                        # Список адресов и количества регистров для опроса
-                        addresses_to_read = []
-
-                        for request in config["request_settings"]:
-                            address = request["address"]
-                            count = request["count"]
-                            addresses_to_read.append((address, count))
-                            logger.info(
-                                f"Запланировано чтение {count} регистров с адреса {address} с {ip}"
-                            )
-
-                        # Опрос всех адресов за раз
-                        read_modbus_data(
-                            client,
-                            addresses=addresses_to_read,
-                            retries=config.get("retries", 3),
-                            delay=config.get("retry_delay", 5),
-                            ip=ip,
-                        )
-
-                        # Задержка между опросами одного устройства
-                        time.sleep(config["machine_interval"])
-
-                    except Exception as e:
-                        logger.error(f"Ошибка при опросе {ip}: {e}.")
-                        logger.info(f"Попробуем переподключиться в следующий цикл.")
-                        clients[ip] = None  # Помечаем клиент как недоступный
-
-            # Пауза между полными циклами опроса
-            logger.info("Ожидание следующего цикла...")
-            time.sleep(config["polling_interval"])  # Задержка между циклами
 
+def poll_groups():
+    """Период и фаза каждой группы запросов из config["poll_groups"]."""
+    return {group: config.get("poll_groups", {}).get(group, {}) for group in poll_plans}
+
+
+# Параллельный опрос всех IP-адресов
+def process_modbus_data():
+    poller = AsyncModbusPoller(
+        config["modbus_servers"],
+        config["modbus_port"],
+        poll_device,
+        max_concurrency=config.get("max_concurrency", 10),
+        breaker=config.get("circuit_breaker"),
+        pipeline_depth=config.get("pipeline_depth", 0),
+    )
+    try:
+        asyncio.run(poller.run(config["polling_interval"], groups=poll_groups()))
     except KeyboardInterrupt:
         logger.info("Опрос остановлен пользователем.")
-    finally:
-        # Закрытие всех подключений
-        for ip, client in clients.items():
-            if client:
-                client.close()
-                logger.info(f"Соединение с {ip} закрыто.")
 
 
 # Основная функция
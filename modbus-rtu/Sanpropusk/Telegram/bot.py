@@ -75,12 +75,14 @@ def parse_payload(payloads, states):
 
 def check_state(mc_name, current_state, states):
     prev_state = states.get(mc_name)
-    if prev_state != current_state:
+    current_state = int(current_state)
+    # Состояние из прежних версий сохранено строкой ("1")
+    if prev_state is None or int(prev_state) != current_state:
         states[mc_name] = current_state
-        if int(current_state) == 0:
+        if current_state == 0:
             send_telegram_message_to_all(f"{mc_name}:  ❗ Бак пустой")
             logger.info(f"Сообщение в Telegram отправлено: {mc_name}:  ❗ Бак пустой")
-        elif int(current_state) == 1:
+        elif current_state == 1:
             send_telegram_message_to_all(f"{mc_name}:  ✅ Бак наполнен")
             logger.info(f"Сообщение в Telegram отправлено: {mc_name}:  ✅ Бак наполнен")
 
@@ -16,6 +16,7 @@ alarm_server = config["server_url_alarm"]
 qm_data = DataQueueManager(
     db_name="data.db",
     server_url=data_server,
+    retention=config.get("retention"),
 )
 
 # Настройки Modbus по последовательному интерфейсу
@@ -46,9 +47,7 @@ def read_modbus_data(client, addresses, slave_id):
                 continue
 
             for i, reg_value in enumerate(response.registers):
-                collected_data[f"R{address + i:03d}"] = str(
-                    convert_to_signed(reg_value)
-                )
+                collected_data[f"R{address + i:03d}"] = convert_to_signed(reg_value)
 
         except ModbusException as e:
             logger.error(f"Modbus-ошибка при чтении {address} (slave {slave_id}): {e}")
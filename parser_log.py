@@ -1,39 +1,172 @@
+import argparse
+import ast
+import gzip
+import io
 import json
+import lzma
+import os
 import re
 import sqlite3
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import ast
 
 
 LOG_FILE = "modbus_data.log"
+LOG_DIR = "logs"
 DB_FILE = "modbus_clean_data.db"
+# База очереди DataQueueManager: неотправленные записи из нее не восстанавливаются.
+# В проектах Modbus TCP — queue.db (data.db переносится в нее и переименовывается
+# в data.db.imported), в проектах RTU с одной темой — data.db (--queue-db)
+QUEUE_DB_FILE = "queue.db"
+
+MARKER = "Данные успешно отправлены: "
+# Начало записи очереди в логе: {'timestamp': '2025-03-25T16:02:34.123456', ...
+TIMESTAMP_PREFIX = "{'timestamp': '"
+# Записей в одном executemany
+BATCH_SIZE = 5000
+
+# True/False/None, которых нет в JSON
+_PY_LITERALS = re.compile(r"\b(True|False|None)\b")
+
+
+def parse_payload(text):
+    """Словарь из repr в строке лога.
+
+    Быстрый путь: repr словаря из строк и чисел превращается в JSON заменой
+    одинарных кавычек на двойные и читается json.loads. Замена безопасна, только
+    если в тексте нет двойных кавычек (то есть ни одна строка не содержит
+    кавычек) и слов True/False/None. Остальное, как и все, что ломает JSON,
+    разбирается ast.literal_eval.
+    """
+    if '"' in text or _PY_LITERALS.search(text):
+        return ast.literal_eval(text)
+    try:
+        return json.loads(text.replace("'", '"'))
+    except ValueError:
+        return ast.literal_eval(text)
+
+
+def open_log(path):
+    """Текстовые потоки лога: обычный файл или архив (zip, gz, xz) без распаковки на диск."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                with archive.open(name) as member:
+                    yield io.TextIOWrapper(member, encoding="utf-8", errors="replace")
+    elif path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            yield f
+    elif path.endswith(".xz"):
+        with lzma.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            yield f
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield f
+
+
+def iter_payloads(path, since=None, until=None):
+    """Потоково извлекает словари после 'Данные успешно отправлены:' из файла лога.
+
+    since/until — границы отметки времени записи (ISO, until не включается);
+    записи вне диапазона отбрасываются до разбора словаря.
+    Возвращает (словарь, None) или (None, ошибка) для каждой найденной строки.
+    """
+    for stream in open_log(path):
+        for line in stream:
+            position = line.find(MARKER)
+            if position < 0:
+                continue
+            text = line[position + len(MARKER) :].rstrip()
+            if (since or until) and text.startswith(TIMESTAMP_PREFIX):
+                end = text.find("'", len(TIMESTAMP_PREFIX))
+                timestamp = text[len(TIMESTAMP_PREFIX) : end]
+                if (since and timestamp < since) or (until and timestamp >= until):
+                    continue
+            try:
+                # Преобразуем строку в Python-словарь
+                yield parse_payload(text), None
+            except Exception as e:
+                yield None, e
 
 
 def extract_data_from_log(file_path):
     """Извлекает все словари после 'Данные успешно отправлены:' и безопасно конвертирует их."""
-    pattern = re.compile(r"Данные успешно отправлены: ({.*})")
     entries = []
-
-    with open(file_path, encoding="utf-8") as f:
-        for line in f:
-            match = pattern.search(line)
-            if match:
-                try:
-                    # Преобразуем строку в Python-словарь
-                    data_dict = ast.literal_eval(match.group(1))
-                    entries.append(data_dict)
-                except Exception as e:
-                    print(f"Ошибка при парсинге строки: {e}")
+    for entry, error in iter_payloads(file_path):
+        if error is not None:
+            print(f"Ошибка при парсинге строки: {error}")
+        else:
+            entries.append(entry)
     return entries
 
 
+# Значения-заглушки датчиков (нет измерения): строками в старых логах, числами в новых
+SENTINEL_STRINGS = ("-9999.00", "-9999999.00")
+SENTINEL_NUMBERS = (-9999.0, -9999999.0)
+SENTINELS = frozenset(SENTINEL_STRINGS + SENTINEL_NUMBERS)
+
+
+def clean_value(value):
+    if type(value) is str:
+        return "0.00" if value in SENTINEL_STRINGS else value
+    if type(value) is float and value in SENTINEL_NUMBERS:
+        return 0.0
+    return value
+
+
 def clean_data(data_dict):
     """Заменяет все значения -9999.00 и -9999999.00 на 0.00"""
-    cleaned = {
-        k: ("0.00" if v in ("-9999.00", "-9999999.00") else v)
-        for k, v in data_dict.items()
-    }
-    return cleaned
+    try:
+        # Большинство записей без заглушек: проверка всех значений разом
+        if SENTINELS.isdisjoint(data_dict.values()):
+            return dict(data_dict)
+    except TypeError:
+        pass  # Среди значений есть словари или списки
+    return {k: clean_value(v) for k, v in data_dict.items()}
+
+
+def parse_file(path, since=None, until=None):
+    """Разбор одного файла (в процессе пула): строки (timestamp, data) для базы."""
+    rows = []
+    errors = 0
+    for entry, error in iter_payloads(path, since, until):
+        if error is not None or not isinstance(entry, dict):
+            errors += 1
+            continue
+        timestamp = entry.get("timestamp")
+        data = entry.get("data")
+        if not timestamp or not isinstance(data, dict):
+            continue  # пропуск записей без отметки времени и аварий
+        if (since and timestamp < since) or (until and timestamp >= until):
+            continue
+        cleaned_data = clean_data(data)
+        if not cleaned_data:
+            continue  # пропуск пустых записей
+        rows.append((timestamp, json.dumps(cleaned_data)))
+    return path, rows, errors
+
+
+def find_logs(paths):
+    """Файлы логов и архивов: файлы как есть, каталоги — рекурсивно, от старых к новым."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for candidate in Path(path).rglob("*"):
+                name = candidate.name
+                if (
+                    candidate.is_file()
+                    and ".log" in name
+                    and not name.endswith(".part")
+                ):
+                    files.append(str(candidate))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"Файл {path} не найден.")
+    # Один файл может быть указан и сам, и через каталог
+    files = list(dict.fromkeys(os.path.normpath(f) for f in files))
+    return sorted(files, key=os.path.getmtime)
 
 
 def init_db(db_path):
@@ -53,38 +186,142 @@ def init_db(db_path):
     conn.close()
 
 
-def save_to_db(entries, db_path):
-    """Сохраняет список записей в БД"""
+def load_existing(conn, queue_db_path):
+    """Ключи уже имеющихся записей для отсева повторов.
+
+    Возвращает (ключи (timestamp, hash(data)) записей целевой базы, отметки
+    времени неотправленных записей очереди DataQueueManager). В базе очереди
+    данные хранятся в компактном виде, поэтому запись узнается по отметке
+    времени — она уникальна для каждой записи очереди. Записи до курсора
+    отправлены и лишь ждут удаления, поэтому не учитываются.
+    """
+    existing = {
+        (timestamp, hash(data))
+        for timestamp, data in conn.execute("SELECT timestamp, data FROM data_queue")
+    }
+    queued = set()
+    if queue_db_path and os.path.exists(queue_db_path):
+        queue_conn = sqlite3.connect(f"file:{queue_db_path}?mode=ro", uri=True)
+        try:
+            tables = {
+                row[0] for row in queue_conn.execute("SELECT name FROM sqlite_master")
+            }
+            columns = [
+                row[1] for row in queue_conn.execute("PRAGMA table_info(data_queue)")
+            ]
+            # Курсор темы data; в базе прежнего формата (без тем) — курсор 'sent'
+            cursor_name = "data" if "topic" in columns else "sent"
+            cursor = 0
+            if "queue_cursor" in tables:
+                row = queue_conn.execute(
+                    "SELECT last_id FROM queue_cursor WHERE name = ?", (cursor_name,)
+                ).fetchone()
+                cursor = row[0] if row else 0
+            query = "SELECT timestamp FROM data_queue WHERE id > ?"
+            if "topic" in columns:
+                query += " AND topic = 'data'"
+            queued = {
+                timestamp for (timestamp,) in queue_conn.execute(query, (cursor,))
+            }
+        except sqlite3.Error as e:
+            print(f"Не удалось прочитать {queue_db_path}: {e}")
+        finally:
+            queue_conn.close()
+    return existing, queued
+
+
+def save_to_db(
+    files, db_path, since=None, until=None, queue_db_path=None, workers=None
+):
+    """Разбор файлов в пуле процессов и запись в БД одной транзакцией.
+
+    Возвращает (добавлено, повторов, ошибок разбора).
+    """
     conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    for entry in entries:
-        timestamp = entry.get("timestamp")
-        cleaned_data = clean_data(entry.get("data", {}))
-        if not cleaned_data:
-            continue  # пропуск пустых записей
-        cur.execute(
-            "INSERT INTO data_queue (timestamp, data) VALUES (?, ?)",
-            (timestamp, json.dumps(cleaned_data)),
-        )
-    conn.commit()
-    conn.close()
+    existing, queued = load_existing(conn, queue_db_path)
+    inserted = duplicates = errors = 0
+    batch = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool, conn:
+            results = pool.map(
+                parse_file,
+                files,
+                [since] * len(files),
+                [until] * len(files),
+            )
+            # Результаты идут в порядке файлов (от старых к новым)
+            for path, rows, file_errors in results:
+                errors += file_errors
+                added = 0
+                for timestamp, data in rows:
+                    key = (timestamp, hash(data))
+                    if key in existing or timestamp in queued:
+                        duplicates += 1
+                        continue
+                    existing.add(key)
+                    batch.append((timestamp, data))
+                    added += 1
+                    if len(batch) >= BATCH_SIZE:
+                        conn.executemany(
+                            "INSERT INTO data_queue (timestamp, data) VALUES (?, ?)",
+                            batch,
+                        )
+                        batch.clear()
+                inserted += added
+                print(f"[*] {path}: записей {added}, ошибок разбора {file_errors}")
+            if batch:
+                conn.executemany(
+                    "INSERT INTO data_queue (timestamp, data) VALUES (?, ?)", batch
+                )
+    finally:
+        conn.close()
+    return inserted, duplicates, errors
 
 
 def main():
-    if not Path(LOG_FILE).exists():
-        print(f"Файл {LOG_FILE} не найден.")
-        return
+    parser = argparse.ArgumentParser(
+        description="Восстановление отправленных данных из логов (в том числе архивов) в БД."
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[LOG_FILE, LOG_DIR],
+        help=f"файлы и каталоги логов (по умолчанию {LOG_FILE} и {LOG_DIR}/)",
+    )
+    parser.add_argument("--db", default=DB_FILE, help="база для восстановленных данных")
+    parser.add_argument("--since", help="с отметки времени (ISO), включительно")
+    parser.add_argument("--until", help="до отметки времени (ISO), не включая")
+    parser.add_argument(
+        "--queue-db",
+        default=QUEUE_DB_FILE,
+        help=(
+            f"база очереди (по умолчанию {QUEUE_DB_FILE}, в проектах RTU — data.db): "
+            "ее неотправленные записи пропускаются"
+        ),
+    )
+    parser.add_argument("--workers", type=int, help="число процессов разбора")
+    args = parser.parse_args()
 
-    print("[*] Чтение и парсинг логов...")
-    extracted = extract_data_from_log(LOG_FILE)
+    files = find_logs(
+        [p for p in args.paths if os.path.exists(p) or p not in (LOG_FILE, LOG_DIR)]
+    )
+    if not files:
+        print("Файлы логов не найдены.")
+        return
 
-    print(f"[*] Извлечено записей: {len(extracted)}")
+    print(f"[*] Чтение и парсинг логов: {len(files)} файлов...")
     print("[*] Инициализация базы...")
-    init_db(DB_FILE)
+    init_db(args.db)
 
     print("[*] Сохраняем в базу данных...")
-    save_to_db(extracted, DB_FILE)
-    print("[+] Готово! База: modbus_clean_data.db")
+    inserted, duplicates, errors = save_to_db(
+        files, args.db, args.since, args.until, args.queue_db, args.workers
+    )
+    print(
+        f"[*] Добавлено записей: {inserted}, пропущено повторов: {duplicates}, "
+        f"ошибок разбора: {errors}"
+    )
+    print(f"[+] Готово! База: {args.db}")
 
 
 if __name__ == "__main__":
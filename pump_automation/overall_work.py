@@ -64,12 +64,15 @@ def send_request(url, data):
 
     for attempt in range(1, max_retries + 1):
         try:
-            response = requests.post(
-                url, data=json.dumps(data), headers=config["headers"], timeout=5
+            response = http_session.post(
+                url,
+                data=json.dumps(to_wire(data)),
+                headers=config["headers"],
+                timeout=5,
             )
 
             if response.status_code == 200:
-                logger.info(f"Данные успешно отправлены: {data}")
+                logger.info("Данные успешно отправлены: %s", data)
                 return True
             else:
                 logger.error(
@@ -94,3 +97,11 @@ def send_request(url, data):
 
 config = load_config()
 logger = setup_logging(config["log_file"], config["log_level"])
+
+# Модули utils пишут в этот логгер (см. utils/overall_work.py), поэтому
+# импортируются только после его настройки
+from utils import http_session
+from utils.sample_types import wire_encoder
+
+# Значения опроса — числа; строками отправляются только при "string_values"
+to_wire = wire_encoder()
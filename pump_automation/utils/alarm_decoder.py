@@ -0,0 +1,72 @@
+from typing import Dict, Iterable, List, Optional
+
+
+# Значения, которые сервер ожидает для аварийных битов
+ALARM_ACTIVE = "Сообщение"
+ALARM_OK = "ОК"
+
+
+def _byte_table(msb_first: bool) -> List[tuple]:
+    """Таблица состояний 8 битов для каждого из 256 значений байта."""
+    order = range(7, -1, -1) if msb_first else range(8)
+    return [
+        tuple(ALARM_ACTIVE if (value >> bit) & 1 else ALARM_OK for bit in order)
+        for value in range(256)
+    ]
+
+
+_LSB_TABLE = _byte_table(msb_first=False)
+_MSB_TABLE = _byte_table(msb_first=True)
+
+
+def bits_to_word(bits: Iterable[bool]) -> int:
+    """Собирает 16-битное слово из списка битов (бит 0 — первый элемент)."""
+    word = 0
+    for i, bit in enumerate(bits):
+        if i >= 16:
+            break
+        if bit:
+            word |= 1 << i
+    return word
+
+
+class AlarmDecoder:
+    """Декодер аварийных слов в словарь {метка: "Сообщение"/"ОК"}.
+
+    Метки берутся из register_bit_labels ({адрес: [метка бита 0, метка бита 1, ...]}).
+    Слово раскладывается на биты по таблицам байтов, поэтому на каждое слово
+    приходится два обращения к таблице вместо 16 сдвигов и сравнений.
+
+    bit_order:
+        "lsb" — первая метка соответствует младшему биту (как у read_coils);
+        "msb" — первая метка соответствует старшему биту.
+
+    Использование:
+        decoder = AlarmDecoder(register_bit_labels)
+        collected_alarm.update(decoder.decode({10: 0x0003, 12: 0}))
+    """
+
+    def __init__(self, register_bit_labels: Dict[int, List], bit_order: str = "lsb"):
+        if bit_order not in ("lsb", "msb"):
+            raise ValueError(f"Некорректный порядок битов: {bit_order}")
+        self.msb_first = bit_order == "msb"
+        self.labels = {
+            address: tuple(str(label) for label in labels[:16])
+            for address, labels in register_bit_labels.items()
+        }
+
+    def decode(
+        self, words: Dict[int, int], out: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """Декодирует все слова {адрес: значение} за один проход."""
+        if out is None:
+            out = {}
+        if self.msb_first:
+            for address, word in words.items():
+                states = _MSB_TABLE[(word >> 8) & 0xFF] + _MSB_TABLE[word & 0xFF]
+                out.update(zip(self.labels[address], states))
+        else:
+            for address, word in words.items():
+                states = _LSB_TABLE[word & 0xFF] + _LSB_TABLE[(word >> 8) & 0xFF]
+                out.update(zip(self.labels[address], states))
+        return out
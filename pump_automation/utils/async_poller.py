@@ -0,0 +1,219 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Union
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from .circuit_breaker import CircuitBreaker
+from .connection_manager import ConnectionManager
+from .overall_work import get_logger
+from .poll_plan import DEFAULT_GROUP
+from .scheduler import DeadlineScheduler
+
+logger = get_logger("poller")
+
+
+class AsyncModbusPoller:
+    """Параллельный опрос Modbus TCP серверов на asyncio.
+
+    Все устройства опрашиваются одновременно, число одновременных опросов
+    ограничено max_concurrency. Время цикла определяется самым медленным
+    устройством, а не суммой времени опроса всех устройств.
+
+    Опрос выполняется по группам запросов, у каждой группы свой период и фаза
+    (см. DeadlineScheduler). Без настройки групп все запросы входят в группу
+    "default" с периодом polling_interval. Каждое устройство опрашивается по
+    расписанию группы отдельной задачей планировщика ("группа/ip"), поэтому
+    медленное или повторяющее попытки устройство пропускает только свои сроки
+    и не задерживает остальные устройства группы.
+
+    У каждого устройства свой CircuitBreaker: устройство с повторяющимися
+    ошибками пропускается до срока пробного опроса и не занимает слоты
+    одновременного опроса. Настройки автомата передаются в
+    breaker (например, config["circuit_breaker"]).
+
+    Соединениями владеет ConnectionManager: опрос получает готовое соединение
+    или сразу пропускает недоступный сервер, переподключение идет в фоне.
+    pipeline_depth включает конвейерную отправку запросов (см.
+    PipelinedModbusTcpClient).
+
+    Использование:
+        async def poll_device(client, ip, group):
+            # Чтение регистров группы; вернуть True, если были ошибки
+            ...
+
+        poller = AsyncModbusPoller(config["modbus_servers"], 502, poll_device)
+        asyncio.run(poller.run(config["polling_interval"]))
+    """
+
+    def __init__(
+        self,
+        servers: Iterable[str],
+        port: int,
+        poll_device: Callable[
+            [AsyncModbusTcpClient, str, str], Awaitable[Optional[bool]]
+        ],
+        max_concurrency: int = 10,
+        timeout: float = 10,
+        breaker: Optional[dict] = None,
+        pipeline_depth: Union[int, Dict[str, int]] = 0,
+    ):
+        self.servers = list(servers)
+        self.port = port
+        self.poll_device = poll_device
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = timeout
+        self.connections = ConnectionManager(
+            self.servers, port, timeout=timeout, pipeline_depth=pipeline_depth
+        )
+        self.breakers: Dict[str, CircuitBreaker] = {
+            ip: CircuitBreaker(name=f"Устройство {ip}", **(breaker or {}))
+            for ip in self.servers
+        }
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _poll_one(
+        self, ip: str, group: str, deadline: Optional[float] = None
+    ) -> bool:
+        """Опрос одного сервера с учетом автомата отключения.
+
+        deadline — предельное время опроса, с: опрос дольше прерывается и
+        считается ошибкой, поэтому пробный опрос или повторные попытки одного
+        устройства не затягивают цикл.
+        """
+        breaker = self.breakers[ip]
+        if not breaker.allow():
+            return False
+        ok = await self._poll_connected(ip, group, deadline)
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return ok
+
+    async def _poll_connected(
+        self, ip: str, group: str, deadline: Optional[float] = None
+    ) -> bool:
+        """Опрос одного сервера через готовое соединение."""
+        client = self.connections.get(ip)
+        if client is None:
+            logger.warning(f"Сервер {ip} недоступен, ожидается переподключение.")
+            return False
+
+        async with self._semaphore:
+            try:
+                error_flag = await asyncio.wait_for(
+                    self.poll_device(client, ip, group), deadline
+                )
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Опрос %s (группа %s) не уложился в %.2f секунд и прерван.",
+                    ip,
+                    group,
+                    deadline,
+                )
+                error_flag = True
+            except Exception as e:
+                logger.error(f"Ошибка при опросе {ip}: {e}", exc_info=True)
+                error_flag = True
+
+        if error_flag:
+            logger.warning(f"Ошибки при работе с сервером {ip}. Переподключение...")
+            self.connections.mark_broken(ip)
+            return False
+        return True
+
+    async def poll_cycle(
+        self, group: str = DEFAULT_GROUP, deadline: Optional[float] = None
+    ) -> Dict[str, bool]:
+        """Один цикл опроса группы на всех серверах. Возвращает {ip: успех}.
+
+        deadline ограничивает опрос каждого сервера (см. _poll_one).
+        """
+        start_time = time.monotonic()
+        results = await asyncio.gather(
+            *(self._poll_one(ip, group, deadline) for ip in self.servers)
+        )
+        logger.info(
+            "Опрос группы %s на %d устройствах завершен за %.2f секунд.",
+            group,
+            len(self.servers),
+            time.monotonic() - start_time,
+        )
+        return dict(zip(self.servers, results))
+
+    async def run(
+        self,
+        polling_interval: float,
+        on_cycle: Optional[Callable[[], object]] = None,
+        max_cycle_time: Optional[float] = None,
+        groups: Optional[Dict[str, dict]] = None,
+    ) -> None:
+        """Основной цикл: опрос групп по расписанию и периодический вызов on_cycle.
+
+        groups — {имя группы: {"period": с, "phase": с}}; группа без "period"
+        опрашивается раз в polling_interval. Задача планировщика заводится на
+        каждую пару (группа, устройство), опрос устройства прерывается, если не
+        уложился в 0.9 периода группы. on_cycle (например, notify_server)
+        вызывается раз в polling_interval в отдельном потоке, чтобы не
+        блокировать цикл событий. Если задан max_cycle_time и опрос устройства
+        длился дольше, работа прерывается.
+        """
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        scheduler = DeadlineScheduler()
+
+        def make_poll_job(group, ip, period):
+            async def job():
+                cycle_start_time = time.monotonic()
+                # Опрос короче периода группы (с запасом на переключение задач),
+                # поэтому к следующему сроку он уже завершен
+                await self._poll_one(ip, group, 0.9 * period)
+                elapsed = time.monotonic() - cycle_start_time
+                logger.debug(
+                    "Опрос группы %s на %s завершен за %.2f секунд.", group, ip, elapsed
+                )
+                if max_cycle_time is not None and elapsed > max_cycle_time:
+                    logger.error(
+                        "Превышено максимальное время выполнения цикла. Прерывание."
+                    )
+                    scheduler.stop()
+
+            return job
+
+        for group, settings in (groups or {DEFAULT_GROUP: {}}).items():
+            period = settings.get("period", polling_interval)
+            for ip in self.servers:
+                scheduler.add(
+                    f"{group}/{ip}",
+                    period,
+                    make_poll_job(group, ip, period),
+                    phase=settings.get("phase", 0),
+                )
+
+        if on_cycle is not None:
+            notify_task = None
+
+            async def call_on_cycle():
+                try:
+                    await asyncio.to_thread(on_cycle)
+                except Exception as e:
+                    logger.error(f"Ошибка при уведомлении сервера: {e}", exc_info=True)
+
+            async def notify():
+                # Уведомление идет в фоне, чтобы не задерживать опрос групп
+                nonlocal notify_task
+                logger.info("Ожидание следующего цикла опроса...")
+                if notify_task is None or notify_task.done():
+                    notify_task = asyncio.create_task(call_on_cycle())
+
+            scheduler.add("notify", polling_interval, notify)
+
+        await self.connections.start()
+        try:
+            await scheduler.run()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Закрытие всех соединений."""
+        self.connections.close()
@@ -0,0 +1,25 @@
+from typing import Optional
+import logging
+
+# pump_automation настраивает логирование в своем overall_work.py, поэтому
+# модули utils берут оттуда конфигурацию и пишут в тот же логгер, а не
+# запускают второй setup_logging со вторым файлом лога. overall_work проекта
+# должен быть импортирован раньше модулей utils (он импортирует их сам после
+# настройки логгера).
+from overall_work import config, logger
+
+
+def get_logger(subsystem: Optional[str] = None) -> logging.Logger:
+    """Логгер подсистемы ("queue", "poller", ...): дочерний к логгеру
+    pump_automation, вывод — общий с ним."""
+    if not subsystem:
+        return logger
+    return logger.getChild(subsystem)
+
+
+def get_device_setting(ip, key, default=None):
+    """Настройка устройства: сначала device_settings[ip][key], затем config[key]."""
+    device_settings = config.get("device_settings", {}).get(ip, {})
+    if key in device_settings:
+        return device_settings[key]
+    return config.get(key, default)
@@ -0,0 +1,223 @@
+import asyncio
+import itertools
+import struct
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from .overall_work import get_logger
+
+logger = get_logger("poller")
+
+READ_COILS = 0x01
+READ_HOLDING_REGISTERS = 0x03
+
+_MBAP = struct.Struct(">HHHB")  # transaction id, protocol id, длина, unit id
+
+
+class ModbusReply:
+    """Ответ устройства с тем же интерфейсом, что и ответы pymodbus."""
+
+    def __init__(
+        self,
+        function_code: int,
+        registers: Optional[List[int]] = None,
+        bits: Optional[List[bool]] = None,
+        exception_code: Optional[int] = None,
+    ):
+        self.function_code = function_code
+        self.registers = registers or []
+        self.bits = bits or []
+        self.exception_code = exception_code
+
+    def isError(self) -> bool:
+        return self.exception_code is not None
+
+    def __repr__(self):
+        if self.isError():
+            return (
+                f"ModbusReply(function_code={self.function_code:#04x}, "
+                f"exception_code={self.exception_code})"
+            )
+        return f"ModbusReply(function_code={self.function_code:#04x})"
+
+
+class PipelinedModbusTcpClient:
+    """Modbus TCP клиент с конвейерной отправкой запросов по одному соединению.
+
+    Держит до max_in_flight запросов без ответа и сопоставляет ответы по
+    transaction id, поэтому на канале с большой задержкой (VPN до удаленной
+    площадки) цикл из многих запросов занимает около одного RTT. Если
+    устройство ведет себя некорректно (таймаут при нескольких запросах в
+    полете, чужой transaction id, разрыв соединения), клиент переходит в
+    последовательный режим: один запрос за раз. После таймаута соединение
+    закрывается, так как ответы могли рассинхронизироваться с запросами.
+
+    Поддерживает подмножество интерфейса AsyncModbusTcpClient, которое
+    используют опросчики: connect(), connected, close(),
+    read_holding_registers() и read_coils().
+
+    Использование:
+        client = PipelinedModbusTcpClient("40.0.6.51", 502, max_in_flight=8)
+        if await client.connect():
+            registers, failed = await read_planned(client, planner)
+    """
+
+    pipelined = True
+
+    def __init__(
+        self, host: str, port: int = 502, timeout: float = 10, max_in_flight: int = 8
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._abandoned: Set[int] = set()  # id запросов, по которым истек таймаут
+        self._tids = itertools.cycle(range(1, 0x10000))
+        self._window: Optional[asyncio.Condition] = None
+        self._in_flight = 0
+
+    @property
+    def connected(self) -> bool:
+        return (
+            self._writer is not None
+            and not self._writer.is_closing()
+            and self._read_task is not None
+            and not self._read_task.done()
+        )
+
+    async def connect(self) -> bool:
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Не удалось подключиться к {self.host}:{self.port}: {e}")
+            return False
+        self._window = asyncio.Condition()
+        self._read_task = asyncio.create_task(self._read_loop())
+        return True
+
+    def close(self) -> None:
+        if self._read_task is not None:
+            self._read_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._fail_pending(ConnectionException(f"Соединение с {self.host} закрыто"))
+
+    def _fail_pending(self, exc: Exception) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self._pending.clear()
+
+    def _fallback(self, reason: str, reset: bool = False) -> None:
+        """Переход в последовательный режим.
+
+        reset=True закрывает соединение: поток ответов мог рассинхронизироваться,
+        и переподключение начнется уже в последовательном режиме.
+        """
+        if self.max_in_flight > 1:
+            logger.warning(
+                f"{self.host}: {reason}, переход в последовательный режим запросов."
+            )
+            self.max_in_flight = 1
+            if reset and self._writer is not None:
+                self._writer.close()
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                header = await self._reader.readexactly(_MBAP.size)
+                tid, _, length, _ = _MBAP.unpack(header)
+                pdu = await self._reader.readexactly(length - 1)
+                future = self._pending.pop(tid, None)
+                if tid in self._abandoned:
+                    self._abandoned.discard(tid)  # Опоздавший ответ
+                    continue
+                if future is None and len(self._pending) == 1:
+                    # Один запрос в полете: ответ с чужим id относится к нему
+                    self._fallback(f"ответ с неизвестным transaction id {tid}")
+                    future = self._pending.popitem()[1]
+                if future is not None and not future.done():
+                    future.set_result(pdu)
+        except (asyncio.IncompleteReadError, OSError) as e:
+            if len(self._pending) > 1:
+                self._fallback("разрыв соединения при конвейерной отправке")
+            self._fail_pending(ConnectionException(f"{self.host}: {e}"))
+            if self._writer is not None:
+                self._writer.close()
+
+    async def _execute(self, slave: int, pdu: bytes) -> bytes:
+        if not self.connected:
+            raise ConnectionException(f"Нет соединения с {self.host}")
+        async with self._window:
+            await self._window.wait_for(lambda: self._in_flight < self.max_in_flight)
+            self._in_flight += 1
+            # Запрос ушел не один: к таймауту остальные могут успеть завершиться,
+            # а устройство — ответить только на первый из конвейера
+            concurrent = self._in_flight > 1
+        try:
+            # Пока запрос ждал места в окне, соединение могли закрыть
+            if not self.connected:
+                raise ConnectionException(f"Нет соединения с {self.host}")
+            tid = next(self._tids)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[tid] = future
+            try:
+                self._writer.write(_MBAP.pack(tid, 0, len(pdu) + 1, slave) + pdu)
+                await self._writer.drain()
+            except OSError as e:
+                self._pending.pop(tid, None)
+                raise ConnectionException(f"{self.host}: {e}") from e
+            try:
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                if self._pending.pop(tid, None) is not None:
+                    self._abandoned.add(tid)
+                if concurrent or self._in_flight > 1:
+                    self._fallback(
+                        "нет ответа при нескольких запросах в полете", reset=True
+                    )
+                raise ModbusIOException(f"{self.host}: нет ответа за {self.timeout} с")
+        finally:
+            async with self._window:
+                self._in_flight -= 1
+                self._window.notify_all()
+
+    async def _read(
+        self, function_code: int, address: int, count: int, slave: int
+    ) -> Tuple[Optional[bytes], Optional[int]]:
+        """Отправка запроса чтения. Возвращает (данные ответа, код исключения)."""
+        reply = await self._execute(
+            slave, struct.pack(">BHH", function_code, address, count)
+        )
+        if reply[0] & 0x80:
+            return None, reply[1]
+        return reply[2 : 2 + reply[1]], None
+
+    async def read_holding_registers(
+        self, address: int, count: int = 1, slave: int = 1
+    ) -> ModbusReply:
+        data, exception_code = await self._read(
+            READ_HOLDING_REGISTERS, address, count, slave
+        )
+        if data is None:
+            return ModbusReply(READ_HOLDING_REGISTERS, exception_code=exception_code)
+        return ModbusReply(
+            READ_HOLDING_REGISTERS,
+            registers=list(struct.unpack(f">{len(data) // 2}H", data)),
+        )
+
+    async def read_coils(self, address: int, count: int = 1, slave: int = 1):
+        data, exception_code = await self._read(READ_COILS, address, count, slave)
+        if data is None:
+            return ModbusReply(READ_COILS, exception_code=exception_code)
+        return ModbusReply(
+            READ_COILS,
+            bits=[bool(byte >> bit & 1) for byte in data for bit in range(8)],
+        )
@@ -0,0 +1,110 @@
+import sys
+from typing import Dict, List, Optional
+
+from .alarm_decoder import AlarmDecoder
+from .overall_work import get_logger
+from .request_planner import RequestPlanner
+from .sample_types import BlockDecoder
+
+logger = get_logger("poller")
+
+# Группа запросов по умолчанию (запросы без поля "group" в request_settings)
+DEFAULT_GROUP = "default"
+
+
+class PollPlan:
+    """План опроса, собранный один раз из конфигурации.
+
+    Содержит список запросов (через RequestPlanner), заранее подготовленные
+    ключи R### для каждого значения, декодеры блоков по типу значений (поля
+    "type", "word_order", "scale" и др. — см. sample_types.BlockDecoder) и
+    таблицы меток
+    аварийных битов. Значения остаются числами (int, float, bool) до отправки
+    на сервер. В цикле опроса остается только разрезать ответы и
+    разложить значения по готовым ключам.
+
+    Использование:
+        plan = PollPlan(config["request_settings"], bit_labels={14: [...]})
+        registers, failed = await read_planned(client, plan.planner(ip))
+        plan.apply(registers, collected_data, collected_alarm)
+    """
+
+    def __init__(
+        self,
+        request_settings: List[Dict],
+        bit_labels: Optional[Dict[int, List]] = None,
+        bit_order: str = "lsb",
+        max_gap: int = 0,
+    ):
+        bit_labels = bit_labels or {}
+        self.max_gap = max_gap
+        self.ranges = []
+        # {адрес диапазона: (ключи значений, декодер)} для обычных регистров
+        self.data_ranges = {}
+        for request in request_settings:
+            address = request.get("address")
+            count = request.get("count")
+            if address is None or count is None:
+                logger.error(f"Некорректный запрос: {request}")
+                continue
+            try:
+                decoder = BlockDecoder.from_settings(request)
+            except ValueError as e:
+                logger.error(f"Некорректный запрос: {request}: {e}")
+                continue
+            self.ranges.append((address, count))
+            if address in bit_labels:
+                continue
+            # Значение из нескольких регистров — под ключом первого из них
+            keys = tuple(
+                sys.intern(f"R{address + i:03d}")
+                for i in range(0, count, decoder.width)
+            )
+            self.data_ranges[address] = (keys, decoder)
+
+        # Адреса аварийных слов, которые есть в request_settings
+        self.alarm_addresses = frozenset(a for a, _ in self.ranges if a in bit_labels)
+        self.alarm_decoder = AlarmDecoder(bit_labels, bit_order=bit_order)
+        self._planners: Dict[str, RequestPlanner] = {}
+
+    def planner(self, ip: str) -> RequestPlanner:
+        """Планировщик запросов устройства (помнит недопустимые адреса этого устройства)."""
+        planner = self._planners.get(ip)
+        if planner is None:
+            planner = RequestPlanner(self.ranges, max_gap=self.max_gap)
+            self._planners[ip] = planner
+        return planner
+
+    def apply(
+        self,
+        registers_by_address: Dict[int, List[int]],
+        collected_data: Dict,
+        collected_alarm: Dict,
+    ) -> None:
+        """Раскладывает прочитанные регистры по словарям данных и аварий."""
+        alarm_words = {}
+        data_ranges = self.data_ranges
+        for address, registers in registers_by_address.items():
+            data_range = data_ranges.get(address)
+            if data_range is None:
+                alarm_words[address] = registers[0]
+                continue
+            keys, decoder = data_range
+            if decoder.sentinels:
+                # Заглушки "нет измерения" (None) в данные не попадают
+                collected_data.update(
+                    item
+                    for item in zip(keys, decoder(registers))
+                    if item[1] is not None
+                )
+            else:
+                collected_data.update(zip(keys, decoder(registers)))
+        self.alarm_decoder.decode(alarm_words, collected_alarm)
+
+
+def build_group_plans(request_settings: List[Dict], **kwargs) -> Dict[str, PollPlan]:
+    """Разбивает request_settings по полю "group" и собирает план для каждой группы."""
+    grouped: Dict[str, List[Dict]] = {}
+    for request in request_settings:
+        grouped.setdefault(request.get("group", DEFAULT_GROUP), []).append(request)
+    return {group: PollPlan(requests, **kwargs) for group, requests in grouped.items()}
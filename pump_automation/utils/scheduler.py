@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+import itertools
+from typing import Awaitable, Callable, Dict
+
+from .overall_work import get_logger
+
+logger = get_logger("poller")
+
+
+class DeadlineScheduler:
+    """Планировщик периодических задач по абсолютным срокам (куча сроков).
+
+    Каждая задача имеет свой период и фазу. Следующий срок считается от
+    предыдущего срока, а не от момента окончания работы, поэтому период не
+    "уплывает" на время выполнения. Если задача не успела к своему сроку,
+    пропущенные сроки не наверстываются, а учитываются в missed и пишутся в лог.
+
+    Каждый запуск задачи выполняется отдельной asyncio.Task, поэтому медленная
+    задача не задерживает остальные. Если к очередному сроку предыдущий запуск
+    той же задачи еще не закончился, срок пропускается (учитывается в missed),
+    а не ставится в очередь за ним.
+
+    Использование:
+        scheduler = DeadlineScheduler()
+        scheduler.add("alarms", 1, poll_alarms)
+        scheduler.add("counters", 180, poll_counters, phase=5)
+        await scheduler.run()
+    """
+
+    def __init__(self):
+        self._jobs = []
+        self._heap = []
+        self._counter = itertools.count()
+        self._running = False
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.missed: Dict[str, int] = {}
+
+    def add(
+        self,
+        name: str,
+        period: float,
+        callback: Callable[[], Awaitable[object]],
+        phase: float = 0.0,
+    ) -> None:
+        """Добавление задачи. phase — сдвиг первого запуска относительно старта."""
+        if period <= 0:
+            raise ValueError(f"Некорректный период задачи {name}: {period}")
+        self._jobs.append((name, float(period), callback, float(phase)))
+        self.missed[name] = 0
+
+    def stop(self) -> None:
+        """Остановка: новые запуски не начинаются, run() дожидается текущих."""
+        self._running = False
+
+    async def run(self) -> None:
+        """Выполнение задач по срокам до вызова stop()."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self._heap = [
+            (start + phase, next(self._counter), name, period, callback)
+            for name, period, callback, phase in self._jobs
+        ]
+        heapq.heapify(self._heap)
+        self._running = True
+
+        try:
+            while self._running and self._heap:
+                deadline, _, name, period, callback = self._heap[0]
+                delay = deadline - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue  # За время ожидания могли остановить или добавить сроки
+                heapq.heappop(self._heap)
+
+                task = self._tasks.get(name)
+                if task is not None and not task.done():
+                    # Предыдущий запуск еще идет: срок пропускается
+                    self._miss(name, 1, loop.time() - deadline)
+                else:
+                    task = asyncio.create_task(callback(), name=f"job-{name}")
+                    task.add_done_callback(self._job_done)
+                    self._tasks[name] = task
+
+                # Следующий срок — от предыдущего срока, а не от текущего времени
+                next_deadline = deadline + period
+                now = loop.time()
+                if next_deadline <= now:
+                    skipped = int((now - next_deadline) // period) + 1
+                    next_deadline += skipped * period
+                    self._miss(name, skipped, now - deadline)
+                heapq.heappush(
+                    self._heap,
+                    (next_deadline, next(self._counter), name, period, callback),
+                )
+        except asyncio.CancelledError:
+            # Остановка извне: текущие запуски отменяются вместе с планировщиком
+            for task in self._tasks.values():
+                task.cancel()
+            raise
+        finally:
+            running = [task for task in self._tasks.values() if not task.done()]
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def _miss(self, name: str, skipped: int, lag: float) -> None:
+        self.missed[name] += skipped
+        logger.warning(
+            "Задача %s: пропущено сроков %d (всего %d), отставание %.2f секунд.",
+            name,
+            skipped,
+            self.missed[name],
+            lag,
+        )
+
+    @staticmethod
+    def _job_done(task: asyncio.Task) -> None:
+        """Ошибка задачи пишется в лог и не останавливает остальные задачи."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Ошибка в задаче %s: %s",
+                task.get_name(),
+                task.exception(),
+                exc_info=task.exception(),
+            )
@@ -102,7 +102,7 @@ def check_temperatures(data):
         if value >= TEMPERATURE_LIMIT_OVERHEAT:
             if status != "overheat" and can_send:
                 send_telegram_message_to_all(
-                    f"🔥 Перегрев: {format_sensor_name(reg)} = {value}°C"
+                    f"🔥 Перегрев: {format_sensor_name(reg)} = {value:.2f}°C"
                 )
                 logger.info(f"🔥 Перегрев: {reg} = {value}")
                 temp_state[reg] = {"status": "overheat", "last_notify": now}
@@ -110,14 +110,14 @@ def check_temperatures(data):
                 REMINDER_INTERVAL, MIN_INTERVAL_BETWEEN_MESSAGES
             ):
                 send_telegram_message_to_all(
-                    f"⏰ Напоминание: {format_sensor_name(reg)} по-прежнему {value}°C"
+                    f"⏰ Напоминание: {format_sensor_name(reg)} по-прежнему {value:.2f}°C"
                 )
                 logger.info(f"⏰ Напоминание: {reg} = {value}")
                 temp_state[reg]["last_notify"] = now
 
         elif value <= TEMPERATURE_LIMIT_NORMAL and status == "overheat" and can_send:
             send_telegram_message_to_all(
-                f"✅ Норма: {format_sensor_name(reg)} = {value}°C"
+                f"✅ Норма: {format_sensor_name(reg)} = {value:.2f}°C"
             )
             logger.info(f"✅ Температура нормализовалась: {reg} = {value}")
             temp_state[reg] = {"status": "normal", "last_notify": now}
@@ -1,12 +1,12 @@
 from pymodbus.client import ModbusSerialClient
 from pymodbus.exceptions import ModbusException
 import time
-import struct
 import threading
 
 from utils.tg_alarm import notify_server
 from utils.overall_work import config, logger
 from utils.DataQueueManager import DataQueueManager
+from utils.sample_types import BlockDecoder
 from Telegram.bot import check_temperatures, bot_start
 
 data_server = config["server_url"]
@@ -15,6 +15,7 @@ data_server = config["server_url"]
 qm_data = DataQueueManager(
     db_name="data.db",
     server_url=data_server,
+    retention=config.get("retention"),
 )
 
 # Настройки Modbus по последовательному интерфейсу
@@ -24,17 +25,12 @@ serial_client = ModbusSerialClient(
 )
 
 
-def convert_registers_to_float(registers):
-    """
-    Преобразует два 16-битных регистра в число с плавающей точкой (float).
-    """
-    # Объединенное 32-битное значение
-    value = (registers[1] << 16) | registers[0]
-    # Преобразуем в байты (big-endian)
-    bytes_value = value.to_bytes(4, byteorder="big")
-    # Интерпретируем байты как float
-    float_value = struct.unpack(">f", bytes_value)[0]
-    return float_value
+# Декодеры ответов по адресу запроса: температуры — блок float32 младшим словом
+# вперед, заглушки -9999 и -9999999 означают отсутствие измерения
+decoders = {
+    req["address"]: BlockDecoder.from_settings(req)
+    for req in config["request_settings"]
+}
 
 
 def read_modbus_data(client, addresses, slave_id):
@@ -51,16 +47,12 @@ def read_modbus_data(client, addresses, slave_id):
                 logger.error(f"Ошибка при чтении {address}: {response}")
                 continue
 
-            # Если данные — это float (два регистра)
-            if count == 2:
-                float_value = convert_registers_to_float(response.registers)
-                if float_value in (-9999.00, -9999999.00):
-                    float_value = 0.0
-                collected_data[f"R{address:03d}"] = f"{float_value:.2f}"
-            else:
-                # Обработка обычных 16-битных значений
-                for i, reg_value in enumerate(response.registers):
-                    collected_data[f"R{address + i:03d}"] = reg_value
+            # Весь блок раскодируется за один проход; значение из двух
+            # регистров — под ключом первого из них
+            decoder = decoders[address]
+            for i, value in enumerate(decoder(response.registers)):
+                if value is not None:
+                    collected_data[f"R{address + i * decoder.width:03d}"] = value
         except ModbusException as e:
             logger.error(f"Ошибка Modbus при чтении {address}: {e}")
         except ValueError as e:
@@ -0,0 +1,87 @@
+import random
+import time
+from typing import Callable
+
+from .overall_work import get_logger
+
+logger = get_logger("poller")
+
+CLOSED = "closed"  # Связь исправна, обращения идут по расписанию
+OPEN = "open"  # Обращения пропускаются до срока пробного обращения
+HALF_OPEN = "half_open"  # Идет пробное обращение
+
+
+class CircuitBreaker:
+    """Автомат отключения обращений к неисправному устройству или серверу.
+
+    После failure_threshold ошибок подряд автомат размыкается, и устройство
+    пропускается без подключения и повторов (проверка allow() — O(1)). Через
+    задержку выполняется один пробный опрос: успех замыкает автомат, ошибка
+    снова размыкает его с удвоенной задержкой (не более max_delay). К задержке
+    добавляется случайный разброс jitter, чтобы пробы разных устройств не
+    совпадали по времени.
+
+    Используется для опроса устройств (AsyncModbusPoller) и для отправки
+    очереди на сервер (DataQueueManager). name попадает в сообщения журнала.
+
+    Использование:
+        breaker = CircuitBreaker(name=f"Устройство {ip}")
+        if breaker.allow():
+            ok = await poll(...)
+            breaker.record_success() if ok else breaker.record_failure()
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        failure_threshold: int = 3,
+        base_delay: float = 5.0,
+        max_delay: float = 60.0,
+        jitter: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0  # Ошибок подряд
+        self.trips = 0  # Размыканий подряд (для экспоненциальной задержки)
+        self.next_probe = 0.0
+
+    def allow(self) -> bool:
+        """Можно ли обращаться к устройству (серверу) сейчас."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self._clock() >= self.next_probe:
+            self.state = HALF_OPEN
+            logger.info(f"{self.name}: пробное обращение.")
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"{self.name}: связь восстановлена, обращения возобновлены.")
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == OPEN:
+            return  # Ответ на запрос, начатый до размыкания (одновременная отправка)
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.trips += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.trips - 1))
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        self.next_probe = self._clock() + delay
+        self.state = OPEN
+        logger.warning(
+            f"{self.name}: ошибок подряд {self.failures}, "
+            f"обращения приостановлены на {delay:.1f} секунд."
+        )
@@ -1,6 +1,7 @@
 import requests
 import time
 
+from . import http_session
 from .overall_work import config, logger
 
 
@@ -26,7 +27,7 @@ def notify_server(max_retries: int = 3, backoff_factor: float = 0.5) -> bool:
 
     for attempt in range(max_retries):
         try:
-            response = requests.post(
+            response = http_session.post(
                 API_URL_ALARM,
                 json=payload,
                 timeout=5,
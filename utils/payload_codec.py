@@ -0,0 +1,223 @@
+import json
+import sqlite3
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Union
+
+from .overall_work import get_logger
+
+logger = get_logger("queue")
+
+# Первый байт записи — формат хранения
+FORMAT_COMPACT = 0x01  # Компактная запись без сжатия
+FORMAT_ZLIB = 0x02  # Компактная запись, сжатая zlib; второй байт — id словаря
+
+# Типы значений в компактной записи
+TAG_STR_INT = 0  # Строка с целым числом ("895"), хранится как число
+TAG_INT = 1
+TAG_STR = 2
+TAG_FLOAT = 3
+TAG_JSON = 4  # Все остальное (вложенные словари, списки, None)
+TAG_FALSE = 5  # bool хранится одним тегом, без значения
+TAG_TRUE = 6
+
+_DOUBLE = struct.Struct("<d")
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+class PayloadCodec:
+    """Компактное хранение записей очереди DataQueueManager.
+
+    Вместо JSON-текста запись хранится в двоичном виде: имена ключей
+    заменяются номерами из словаря ключей потока (таблица payload_keys в той же
+    базе), числа в строках ("895") хранятся как числа с пометкой о том, что на
+    сервер они уходят строкой. При compression="zlib" запись сжимается zlib со
+    словарем, обученным на первых train_samples записях потока (таблица
+    payload_dict). При отправке запись раскодируется в тот же словарь, что был
+    передан в save_to_db, включая порядок ключей и типы значений.
+
+    Записи, сохраненные раньше в виде JSON-текста, читаются как есть.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        compression: Optional[str] = None,
+        train_samples: int = 64,
+        dict_size: int = 16384,
+        level: int = 6,
+    ):
+        self.conn = conn
+        self.compression = compression
+        self.train_samples = train_samples
+        self.dict_size = dict_size
+        self.level = level
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS payload_keys "
+            "(id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS payload_dict "
+            "(id INTEGER PRIMARY KEY, zdict BLOB NOT NULL)"
+        )
+        conn.commit()
+        self._samples: List[bytes] = []
+        self.reload()
+
+    def reload(self) -> None:
+        """Загрузка словарей из базы (в том числе после отката транзакции записи)."""
+        self.key_ids: Dict[str, int] = {}
+        self.keys: Dict[int, str] = {}
+        for key_id, key in self.conn.execute("SELECT id, key FROM payload_keys"):
+            self.key_ids[key] = key_id
+            self.keys[key_id] = key
+        self.zdicts: Dict[int, bytes] = dict(
+            self.conn.execute("SELECT id, zdict FROM payload_dict")
+        )
+        self.zdict_id = max(self.zdicts, default=0)
+
+    def _key_id(self, key: str) -> int:
+        """Номер ключа; новый ключ записывается в payload_keys (в транзакции записи)."""
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            key_id = len(self.key_ids) + 1
+            self.conn.execute(
+                "INSERT INTO payload_keys (id, key) VALUES (?, ?)", (key_id, key)
+            )
+            self.keys[key_id] = key
+            self.key_ids[key] = key_id
+        return key_id
+
+    def _pack(self, data: Dict[str, Any]) -> bytes:
+        """Запись: число ключей, пары (номер ключа, тип), затем значения.
+
+        Пары (номер ключа, тип) у записей одного устройства совпадают байт в
+        байт, поэтому zlib со словарем сжимает их почти до нуля.
+        """
+        layout = bytearray()
+        values = bytearray()
+        _write_varint(layout, len(data))
+        for key, value in data.items():
+            _write_varint(layout, self._key_id(key))
+            if type(value) is str:
+                try:
+                    number = int(value)
+                except ValueError:
+                    number = None
+                if number is not None and str(number) == value:
+                    layout.append(TAG_STR_INT)
+                    _write_varint(values, _zigzag(number))
+                    continue
+                encoded = value.encode()
+                layout.append(TAG_STR)
+            elif type(value) is int:
+                layout.append(TAG_INT)
+                _write_varint(values, _zigzag(value))
+                continue
+            elif type(value) is float:
+                layout.append(TAG_FLOAT)
+                values += _DOUBLE.pack(value)
+                continue
+            elif type(value) is bool:
+                layout.append(TAG_TRUE if value else TAG_FALSE)
+                continue
+            else:
+                encoded = json.dumps(value).encode()
+                layout.append(TAG_JSON)
+            _write_varint(values, len(encoded))
+            values += encoded
+        return bytes(layout + values)
+
+    def _unpack(self, body: bytes) -> Dict[str, Any]:
+        count, pos = _read_varint(body, 0)
+        layout = []
+        for _ in range(count):
+            key_id, pos = _read_varint(body, pos)
+            layout.append((self.keys[key_id], body[pos]))
+            pos += 1
+        data = {}
+        for key, tag in layout:
+            if tag == TAG_STR_INT or tag == TAG_INT:
+                number, pos = _read_varint(body, pos)
+                number = _unzigzag(number)
+                value = str(number) if tag == TAG_STR_INT else number
+            elif tag == TAG_FLOAT:
+                value = _DOUBLE.unpack_from(body, pos)[0]
+                pos += _DOUBLE.size
+            elif tag == TAG_FALSE or tag == TAG_TRUE:
+                value = tag == TAG_TRUE
+            else:
+                length, pos = _read_varint(body, pos)
+                text = body[pos : pos + length].decode()
+                pos += length
+                value = text if tag == TAG_STR else json.loads(text)
+            data[key] = value
+        return data
+
+    def _train(self, body: bytes) -> None:
+        """Накопление образцов и обучение словаря zlib на первых записях."""
+        self._samples.append(body)
+        if len(self._samples) < self.train_samples:
+            return
+        # Наиболее вероятные подстроки zlib ищет в конце словаря
+        zdict = b"".join(self._samples)[-self.dict_size :]
+        self.zdict_id += 1
+        self.conn.execute(
+            "INSERT INTO payload_dict (id, zdict) VALUES (?, ?)",
+            (self.zdict_id, zdict),
+        )
+        self.zdicts[self.zdict_id] = zdict
+        self._samples = []
+        logger.info(f"Обучен словарь сжатия очереди ({len(zdict)} байт).")
+
+    def encode(self, data: Dict[str, Any]) -> bytes:
+        """Кодирование записи. Вызывается под блокировкой соединения записи."""
+        body = self._pack(data)
+        if self.compression != "zlib":
+            return bytes([FORMAT_COMPACT]) + body
+        if not self.zdict_id:
+            self._train(body)
+            return bytes([FORMAT_COMPACT]) + body
+        compressor = zlib.compressobj(self.level, zdict=self.zdicts[self.zdict_id])
+        packed = compressor.compress(body) + compressor.flush()
+        return bytes([FORMAT_ZLIB, self.zdict_id]) + packed
+
+    def decode(self, stored: Union[str, bytes]) -> Dict[str, Any]:
+        """Раскодирование записи из базы в исходный словарь."""
+        if isinstance(stored, str):
+            return json.loads(stored)  # Запись в прежнем формате (JSON-текст)
+        if stored[0] == FORMAT_COMPACT:
+            return self._unpack(stored[1:])
+        if stored[0] == FORMAT_ZLIB:
+            zdict_id = stored[1]
+            if zdict_id:
+                decompressor = zlib.decompressobj(zdict=self.zdicts[zdict_id])
+            else:
+                decompressor = zlib.decompressobj()
+            return self._unpack(decompressor.decompress(stored[2:]))
+        raise ValueError(f"Неизвестный формат записи: {stored[0]}")
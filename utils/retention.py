@@ -0,0 +1,137 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+Record = Tuple[Dict[str, Any], str]  # (данные, timestamp в ISO-формате)
+
+
+class RetentionPolicy:
+    """Ограничение объема неотправленной очереди DataQueueManager.
+
+    Пока нет связи, очередь растет. При превышении max_rows записей или
+    max_mb мегабайт старейшая часть очереди (downsample_fraction) прореживается:
+    по каждому устройству (поле id_key) и регистру в пределах интервала
+    bucket_seconds остаются только минимум, максимум и последнее значение
+    (не больше трех записей, см. downsample). Если этого мало, интервал
+    удваивается (до max_bucket_seconds), и лишь затем удаляются самые старые
+    записи. Очередь сокращается до low_watermark от лимита, чтобы не
+    прореживать ее на каждой проверке. Проверка — не чаще раза в check_interval
+    секунд.
+
+    Настройки в config.json (0 — без ограничения):
+        "retention": {
+            "max_rows": 1000000,
+            "max_mb": 500,
+            "bucket_seconds": 300
+        }
+    Очереди аварий создаются без retention: аварии не прореживаются.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 0,
+        max_bytes: int = 0,
+        bucket_seconds: int = 300,
+        max_bucket_seconds: int = 86400,
+        downsample_fraction: float = 0.5,
+        low_watermark: float = 0.9,
+        check_interval: float = 60.0,
+        id_key: str = "IP",
+    ):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.bucket_seconds = bucket_seconds
+        self.max_bucket_seconds = max(bucket_seconds, max_bucket_seconds)
+        self.downsample_fraction = downsample_fraction
+        self.low_watermark = low_watermark
+        self.check_interval = check_interval
+        self.id_key = id_key
+
+    @classmethod
+    def from_config(
+        cls, settings: Optional[Dict[str, Any]]
+    ) -> Optional["RetentionPolicy"]:
+        """Создание политики из секции retention (None — без ограничения)."""
+        if not settings:
+            return None
+        return cls(
+            max_rows=int(settings.get("max_rows", 0)),
+            max_bytes=int(settings.get("max_mb", 0) * 1024 * 1024),
+            bucket_seconds=settings.get("bucket_seconds", 300),
+            max_bucket_seconds=settings.get("max_bucket_seconds", 86400),
+            downsample_fraction=settings.get("downsample_fraction", 0.5),
+            check_interval=settings.get("check_interval", 60),
+        )
+
+    def over_limit(self, rows: int, size: int, ratio: float = 1.0) -> bool:
+        """Превышен ли лимит (ratio < 1 — порог сокращения)."""
+        return bool(
+            (self.max_rows and rows > self.max_rows * ratio)
+            or (self.max_bytes and size > self.max_bytes * ratio)
+        )
+
+    def excess_rows(self, rows: int, size: int) -> int:
+        """Сколько самых старых записей удалить, чтобы опуститься до low_watermark."""
+        excess = 0
+        if self.max_rows:
+            excess = rows - int(self.max_rows * self.low_watermark)
+        if self.max_bytes and rows:
+            row_size = size / rows
+            excess = max(
+                excess, int((size - self.max_bytes * self.low_watermark) / row_size) + 1
+            )
+        return max(0, min(rows, excess))
+
+    @staticmethod
+    def bucket_of(timestamp: str, bucket_seconds: int) -> int:
+        """Номер интервала для отметки времени записи."""
+        return int(datetime.fromisoformat(timestamp).timestamp() // bucket_seconds)
+
+    def downsample(self, records: List[Record]) -> List[Record]:
+        """Прореживание записей одного интервала до min/max/last по регистрам.
+
+        По каждому устройству остается не больше трех записей того же вида, что
+        и исходные (id_key и регистры): минимумы регистров с отметкой времени
+        первой записи устройства в интервале, максимумы — средней, последние
+        значения — последней. Нечисловые значения попадают только в последнюю.
+        Результат упорядочен по времени.
+        """
+        groups: Dict[Any, List[Record]] = {}
+        for record in records:
+            groups.setdefault(record[0].get(self.id_key), []).append(record)
+        result: List[Record] = []
+        for device, group in groups.items():
+            reduced = self._reduce(device, group)
+            result.extend(reduced if len(reduced) < len(group) else group)
+        result.sort(key=lambda record: record[1])
+        return result
+
+    def _reduce(self, device: Any, group: List[Record]) -> List[Record]:
+        lows: Dict[str, tuple] = {}  # Ключ -> (число, значение)
+        highs: Dict[str, tuple] = {}
+        lasts: Dict[str, Any] = {}
+        for data, _ in group:
+            for key, value in data.items():
+                if key == self.id_key:
+                    continue
+                lasts[key] = value
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    continue
+                if key not in lows or number < lows[key][0]:
+                    lows[key] = (number, value)
+                if key not in highs or number > highs[key][0]:
+                    highs[key] = (number, value)
+        head = {} if device is None else {self.id_key: device}
+        reduced = []
+        for values, index in (
+            (lows, 0),
+            (highs, len(group) // 2),
+            (lasts, len(group) - 1),
+        ):
+            if values:
+                data = dict(head)
+                for key, value in values.items():
+                    data[key] = value if values is lasts else value[1]
+                reduced.append((data, group[index][1]))
+        return reduced